@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+双语对齐基准
+默认使用仓库自带的 A Gentleman in Moscow 中英两个版本的提取结果，测量：
+
+- 各阶段耗时：读取版本、锚点与章节对应、段落动态规划（不同初始带宽以及全矩阵）
+- 带状动态规划与全矩阵结果的一致率（对齐单元边界相同的比例）和计算的单元格数
+- 数字一致率：两边都含有三位以上数字（年份、房间号等，中文数字换算后比较）的对齐单元中，数字有交集的比例
+- 对齐索引的大小和单次跳转查询的耗时
+
+--output 把结果追加到JSON Lines文件，便于跨版本跟踪。
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import bilingual_align  # noqa: E402
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_A = PACKAGE_DIR / 'extracted_html' / 'A Gentleman in Moscow'
+DEFAULT_B = PACKAGE_DIR / 'extracted_html' / 'a gentleman in moscow zh'
+
+
+def number_agreement(a, b, a_breaks, b_breaks):
+    """两边都含有三位以上数字的对齐单元中，数字有交集的比例：返回 (有交集, 总数)"""
+    def numbers(edition, start, end):
+        found = set()
+        for text in edition.texts[start:end]:
+            key = bilingual_align.anchor_key(text)
+            if key:
+                found.update(value for value in key[0] if value >= 100)
+        return found
+
+    agree = total = 0
+    for k in range(len(a_breaks) - 1):
+        left = numbers(a, a_breaks[k], a_breaks[k + 1])
+        right = numbers(b, b_breaks[k], b_breaks[k + 1])
+        if left and right:
+            total += 1
+            agree += bool(left & right)
+    return agree, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='双语对齐基准')
+    parser.add_argument('--a', default=str(DEFAULT_A), help='第一个版本的提取结果目录')
+    parser.add_argument('--b', default=str(DEFAULT_B), help='第二个版本的提取结果目录')
+    parser.add_argument('--bands', default='16,32,64,128', help='要测量的初始带宽（逗号分隔）')
+    parser.add_argument('--no-full', action='store_true', help='不运行全矩阵动态规划')
+    parser.add_argument('--lookups', type=int, default=10000, help='跳转查询次数')
+    parser.add_argument('--output', help='把结果追加到JSON Lines文件')
+    args = parser.parse_args()
+    if not bilingual_align.numpy_available():
+        print("❌ 双语对齐需要numpy: pip install numpy")
+        return
+
+    results = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0]}
+    start = time.perf_counter()
+    a, b = bilingual_align.Edition(Path(args.a)), bilingual_align.Edition(Path(args.b))
+    results['load_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    start = time.perf_counter()
+    anchors = bilingual_align.match_anchors(a, b)
+    xs, ys = bilingual_align.position_map(a, b, anchors)
+    links = bilingual_align.align_chapters(a, b, xs, ys)
+    results['chapters_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    results['editions'] = {'a': {'name': a.name, 'paragraphs': a.paragraph_count, 'chars': a.total_chars},
+                           'b': {'name': b.name, 'paragraphs': b.paragraph_count, 'chars': b.total_chars}}
+    results.update(anchors=len(anchors), chapter_links=len(links))
+    print(f"版本: {a.name} ({a.paragraph_count} 段) <-> {b.name} ({b.paragraph_count} 段)")
+    print(f"读取 {results['load_ms']:.1f} ms，锚点与章节 {results['chapters_ms']:.1f} ms"
+          f"（锚点 {len(anchors)} 个，章节对应 {len(links)} 组）\n")
+
+    bands = [int(value) for value in args.bands.split(',') if value]
+    if not args.no_full:
+        bands.append(max(a.paragraph_count, b.paragraph_count))
+    runs = {}
+    print(f"{'初始带宽':>10s} {'耗时(ms)':>10s} {'单元格':>12s} {'对齐单元':>8s}")
+    for band in bands:
+        start = time.perf_counter()
+        run = bilingual_align.align_paragraphs(a, b, xs, ys, band)
+        elapsed = (time.perf_counter() - start) * 1000
+        runs[band] = run
+        label = '全矩阵' if not args.no_full and band == bands[-1] else str(band)
+        print(f"{label:>10s} {elapsed:10.1f} {run['stats']['cells']:12d} {run['stats']['beads']:8d}")
+        results.setdefault('bands', {})[label] = {'ms': round(elapsed, 1), 'cells': run['stats']['cells'],
+                                                  'beads': run['stats']['beads']}
+
+    reference = runs[bands[-1]]
+    reference_breaks = set(zip(reference['a_breaks'], reference['b_breaks']))
+    print(f"\n与{'全矩阵' if not args.no_full else f'带宽 {bands[-1]} '}结果的一致率:")
+    for band in bands[:-1]:
+        run = runs[band]
+        agreement = len(set(zip(run['a_breaks'], run['b_breaks'])) & reference_breaks) / len(reference_breaks)
+        results['bands'][str(band)]['agreement'] = round(agreement, 4)
+        print(f"  带宽 {band:4d}: {agreement:.2%}")
+
+    default = runs.get(bilingual_align.DEFAULT_BAND, reference)
+    agree, total = number_agreement(a, b, default['a_breaks'], default['b_breaks'])
+    results['number_agreement'] = {'agree': agree, 'total': total}
+    print(f"\n对齐单元类型: {default['stats']['bead_types']}")
+    print(f"数字一致率: {agree}/{total} ({agree / max(total, 1):.1%})")
+
+    index = bilingual_align.build_alignment(Path(args.a), Path(args.b))
+    size = len(json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    rng = random.Random(0)
+    positions = [(chapter['index'], paragraph) for chapter in index['editions'][0]['chapters']
+                 for paragraph in range(chapter['paragraphs'])]
+    start = time.perf_counter()
+    for _ in range(args.lookups):
+        bilingual_align.locate(index, 0, *rng.choice(positions))
+    lookup_us = (time.perf_counter() - start) * 1e6 / max(args.lookups, 1)
+    results.update(index_bytes=size, lookup_us=round(lookup_us, 2))
+    print(f"对齐索引: {size / 1024:.1f} KB，单次跳转查询 {lookup_us:.1f} µs")
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(results, ensure_ascii=False) + "\n")
+        print(f"结果已追加到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
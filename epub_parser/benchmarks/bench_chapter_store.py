@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+章节存储并发基准
+对比多线程下 “逐文件 open().read()” 与 “mmap 章节存储 memoryview 切片” 的吞吐
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from chapter_store import ChapterStore, ChapterStoreWriter, STORE_INDEX_NAME
+
+DEFAULT_BOOK_DIR = Path(__file__).resolve().parent.parent / "extracted_html" / "A Gentleman in Moscow"
+
+
+def run_file_reads(paths, requests, threads):
+    """现状：每次请求打开文件并读成字符串"""
+    def serve(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return len(f.read())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total = sum(pool.map(serve, [paths[i] for i in requests]))
+    return time.perf_counter() - start, total
+
+
+def run_store_reads(store, requests, threads, paragraphs):
+    """章节存储：返回 memoryview 切片（不解码、不复制）"""
+    def serve(position):
+        if paragraphs and store.paragraph_count(position) > 0:
+            count = store.paragraph_count(position)
+            first = random.randrange(count)
+            view = store.get_paragraphs(position, first, min(count, first + paragraphs))
+        else:
+            view = store.get_chapter(position)
+        size = view.nbytes
+        view.release()
+        return size
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total = sum(pool.map(serve, requests))
+    return time.perf_counter() - start, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='章节存储并发基准')
+    parser.add_argument('book_dir', nargs='?', default=str(DEFAULT_BOOK_DIR), help='单本书的提取输出目录')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16], help='并发线程数')
+    parser.add_argument('--requests', type=int, default=5000, help='每轮请求数')
+    parser.add_argument('--paragraphs', type=int, default=0, help='按段落范围读取（每次读取的段落数，0表示整章）')
+    args = parser.parse_args()
+
+    book_dir = Path(args.book_dir)
+    with tempfile.TemporaryDirectory() as tmp:
+        store_dir = book_dir
+        if not (book_dir / STORE_INDEX_NAME).exists():
+            # 旧的提取结果没有章节存储，临时补建
+            store_dir = Path(tmp)
+            ChapterStoreWriter.from_extraction_output(book_dir).write(store_dir)
+
+        with ChapterStore(store_dir) as store:
+            paths = [book_dir / 'cleaned_html' / chapter['output_name'] for chapter in store.chapters]
+            random.seed(0)
+            requests = [random.randrange(len(paths)) for _ in range(args.requests)]
+
+            print(f"📚 {book_dir.name}: {len(paths)} 章, 存储大小 {store.index['size_bytes']} 字节")
+            print(f"{'线程':>6s} {'文件读取(req/s)':>18s} {'章节存储(req/s)':>18s} {'加速比':>8s}")
+            for threads in args.threads:
+                file_time, _ = run_file_reads(paths, requests, threads)
+                store_time, _ = run_store_reads(store, requests, threads, args.paragraphs)
+                print(f"{threads:6d} {len(requests) / file_time:18.0f} "
+                      f"{len(requests) / store_time:18.0f} {file_time / store_time:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EPUB输入源基准
+模拟上传服务已经把EPUB读入内存的场景，对比三种加载方式的耗时：
+先写临时文件再按路径加载、直接从 BytesIO 加载、以及通过 RangeReader 从（带固定延迟的）本地范围读取替身加载。
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from html_extractor import EPUBHTMLExtractor
+from epub_source import LocalRangeSource, DEFAULT_BLOCK_SIZE
+
+DEFAULT_EPUB = Path(__file__).resolve().parent.parent / "epub-files" / "A Gentleman in Moscow.epub"
+
+
+def load(source, book_name: str) -> EPUBHTMLExtractor:
+    extractor = EPUBHTMLExtractor(source, tempfile.gettempdir(), {'verbose': False}, book_name=book_name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if not extractor.load_epub():
+            raise RuntimeError("EPUB加载失败")
+    return extractor
+
+
+def via_temp_file(data: bytes, book_name: str):
+    """旧方式：落盘成临时文件后按路径加载"""
+    with tempfile.NamedTemporaryFile(suffix='.epub', delete=False) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    try:
+        load(f.name, book_name)
+    finally:
+        os.unlink(f.name)
+
+
+def via_bytes(data: bytes, book_name: str):
+    load(io.BytesIO(data), book_name)
+
+
+def measure(function, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EPUB输入源基准')
+    parser.add_argument('epub', nargs='?', default=str(DEFAULT_EPUB), help='EPUB文件')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='范围读取替身每次请求的延迟')
+    parser.add_argument('--block-kb', type=int, nargs='+', default=[64, DEFAULT_BLOCK_SIZE // 1024, 1024],
+                        help='RangeReader 的块大小（KB）')
+    parser.add_argument('--repeat', type=int, default=3, help='每组重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    epub_path = Path(args.epub)
+    data = epub_path.read_bytes()
+    book_name = epub_path.stem
+    print(f"📚 {epub_path.name} ({len(data) / 1024:.0f} KB)")
+    print(f"{'方式':28s} {'耗时(ms)':>10s} {'请求数':>8s}")
+
+    print(f"{'临时文件 + 路径':28s} {measure(lambda: via_temp_file(data, book_name), args.repeat) * 1000:10.1f} {'-':>8s}")
+    print(f"{'BytesIO':28s} {measure(lambda: via_bytes(data, book_name), args.repeat) * 1000:10.1f} {'-':>8s}")
+
+    for block_kb in args.block_kb:
+        source = LocalRangeSource(epub_path, latency_ms=args.latency_ms)
+        readers = []
+
+        def via_range():
+            reader = source.open(block_size=block_kb * 1024)
+            readers.append(reader)
+            load(reader, book_name)
+
+        elapsed = measure(via_range, args.repeat)
+        label = f"RangeReader {block_kb}KB +{args.latency_ms:.0f}ms"
+        print(f"{label:28s} {elapsed * 1000:10.1f} {readers[-1].stats['requests']:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片转码基准
+对一本书中的全部图片对比：主进程顺序转码、不同进程数并行转码，以及转码缓存命中时的耗时（需要Pillow）
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ebooklib import epub
+
+from image_assets import ImageExporter, collect_images, pillow_available
+
+DEFAULT_EPUB = Path(__file__).resolve().parent.parent / "epub-files" / "A Gentleman in Moscow.epub"
+
+
+def run_once(images, workers: int, cache_dir):
+    """引用全部图片并写出到内存，返回 (耗时, 摘要)"""
+    exporter = ImageExporter(images, cache_dir=cache_dir, workers=workers)
+    start = time.perf_counter()
+    html = "".join(f'<img src="{href}"/>' for href in images)
+    exporter.rewrite("index.html", html)
+    outputs = {}
+    summary = exporter.finish(lambda relative, data: outputs.__setitem__(relative, data))
+    return time.perf_counter() - start, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='图片转码基准')
+    parser.add_argument('epub', nargs='?', default=str(DEFAULT_EPUB), help='EPUB文件')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='转码进程数')
+    args = parser.parse_args()
+
+    if not pillow_available():
+        print("需要Pillow: pip install Pillow")
+        return
+
+    images = collect_images(epub.read_epub(args.epub))
+    unique = len({data for data, _ in images.values()})
+    total = sum(len(data) for data, _ in images.values())
+    print(f"📚 {Path(args.epub).name}: {len(images)} 张图片（{unique} 张不同内容），共 {total / 1024:.0f} KB")
+    print(f"{'方式':16s} {'耗时(ms)':>10s} {'转码':>6s} {'缓存命中':>8s}")
+
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cold, summary = run_once(images, workers, cache_dir)
+            print(f"{f'{workers} 进程':16s} {cold * 1000:10.0f} {summary['transcoded']:6d} {summary['cache_hits']:8d}")
+            warm, summary = run_once(images, workers, cache_dir)
+            print(f"{f'{workers} 进程 缓存':16s} {warm * 1000:10.0f} {summary['transcoded']:6d} {summary['cache_hits']:8d}")
+
+
+if __name__ == "__main__":
+    main()
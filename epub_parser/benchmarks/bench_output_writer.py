@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输出写入基准
+对比 “逐文件直接写入最终目录” 与 BookOutputWriter（暂存目录 + 批量写出 + 改名提交）在不同 fsync 策略下的耗时。
+用本地“限速文件系统”模拟 NFS 等网络文件系统：每次 open / fsync / 改名额外等待固定延迟。
+"""
+
+import argparse
+import builtins
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from output_writer import BookOutputWriter, FSYNC_POLICIES
+
+DEFAULT_BOOK_DIR = Path(__file__).resolve().parent.parent / "extracted_html" / "A Gentleman in Moscow"
+
+
+@contextlib.contextmanager
+def throttled_fs(open_ms: float, fsync_ms: float, rename_ms: float):
+    """在进程内给文件操作加上固定延迟（本地模拟慢速网络文件系统）"""
+    real_open, real_fsync, real_replace = builtins.open, os.fsync, os.replace
+
+    def slow_open(*args, **kwargs):
+        time.sleep(open_ms / 1000)
+        return real_open(*args, **kwargs)
+
+    def slow_fsync(fd):
+        time.sleep(fsync_ms / 1000)
+        return real_fsync(fd)
+
+    def slow_replace(src, dst):
+        time.sleep(rename_ms / 1000)
+        return real_replace(src, dst)
+
+    builtins.open, os.fsync, os.replace = slow_open, slow_fsync, slow_replace
+    try:
+        yield
+    finally:
+        builtins.open, os.fsync, os.replace = real_open, real_fsync, real_replace
+
+
+def load_workload(book_dir: Path):
+    """读取一本书已有的提取输出作为写入负载：[(相对路径, 文本)]"""
+    files = []
+    for sub in ('raw_html', 'cleaned_html'):
+        for path in sorted((book_dir / sub).glob('*.html')):
+            files.append((f"{sub}/{path.name}", path.read_text(encoding='utf-8')))
+    report_path = book_dir / 'extraction_report.json'
+    report = json.loads(report_path.read_text(encoding='utf-8')) if report_path.exists() else {}
+    return files, report
+
+
+def write_direct(target: Path, files, report):
+    """旧方式：每个文件单独写入最终目录，最后写报告"""
+    for sub in ('raw_html', 'cleaned_html'):
+        (target / sub).mkdir(parents=True, exist_ok=True)
+    for relative, text in files:
+        with open(target / relative, 'w', encoding='utf-8') as f:
+            f.write(text)
+    with open(target / 'extraction_report.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def write_staged(target: Path, files, report, fsync: str):
+    writer = BookOutputWriter(target, fsync=fsync)
+    for relative, text in files:
+        writer.write_text(relative, text)
+    writer.write_text('extraction_report.json', json.dumps(report, ensure_ascii=False, indent=2))
+    writer.commit()
+
+
+def measure(function, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            target = Path(tmp) / 'book'
+            start = time.perf_counter()
+            function(target)
+            best = min(best, time.perf_counter() - start)
+            shutil.rmtree(target, ignore_errors=True)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='输出写入基准')
+    parser.add_argument('book_dir', nargs='?', default=str(DEFAULT_BOOK_DIR), help='单本书的提取输出目录（作为写入负载）')
+    parser.add_argument('--open-ms', type=float, default=3.0, help='限速文件系统每次open的延迟')
+    parser.add_argument('--fsync-ms', type=float, default=10.0, help='限速文件系统每次fsync的延迟')
+    parser.add_argument('--rename-ms', type=float, default=3.0, help='限速文件系统每次改名的延迟')
+    parser.add_argument('--repeat', type=int, default=3, help='每组重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    files, report = load_workload(Path(args.book_dir))
+    if not files:
+        print(f"未找到HTML文件: {args.book_dir}")
+        return
+    total_bytes = sum(len(text.encode('utf-8')) for _, text in files)
+    print(f"📄 {len(files)} 个文件, 共 {total_bytes / 1024:.0f} KB")
+
+    cases = [('逐文件直接写入', lambda target: write_direct(target, files, report))]
+    for policy in FSYNC_POLICIES:
+        cases.append((f'暂存提交 fsync={policy}', lambda target, p=policy: write_staged(target, files, report, p)))
+
+    print(f"\n{'方式':24s} {'本地(ms)':>10s} {'限速(ms)':>10s}")
+    for label, function in cases:
+        local = measure(function, args.repeat)
+        with throttled_fs(args.open_ms, args.fsync_ms, args.rename_ms):
+            slow = measure(function, args.repeat)
+        print(f"{label:24s} {local * 1000:10.1f} {slow * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
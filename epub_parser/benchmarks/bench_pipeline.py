@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提取流水线基准
+对比单本书顺序提取与分阶段流水线（不同工作进程数）的总耗时，并输出各阶段的忙碌/等待时间
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from html_extractor import EPUBHTMLExtractor
+
+DEFAULT_EPUB = Path(__file__).resolve().parent.parent / "epub-files" / "A Gentleman in Moscow.epub"
+
+
+def run_once(epub_path, config):
+    """提取一次（输出写到临时目录），返回 (耗时, 流水线统计)"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        extractor = EPUBHTMLExtractor(str(epub_path), output_dir, config)
+        with contextlib.redirect_stdout(io.StringIO()):
+            extractor.load_epub()
+            extractor.extract_metadata()
+            extractor.extract_spine_info()
+            start = time.perf_counter()
+            extractor.extract_all_html_files()
+            elapsed = time.perf_counter() - start
+    return elapsed, extractor.pipeline_metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提取流水线基准')
+    parser.add_argument('epub', nargs='?', default=str(DEFAULT_EPUB), help='EPUB文件')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='流水线工作进程数')
+    parser.add_argument('--repeat', type=int, default=3, help='每组重复次数（取最快一次）')
+    args = parser.parse_args()
+
+    base = {'verbose': False}
+    runs = [('顺序执行', dict(base, pipeline=False))]
+    runs += [(f'流水线 x{w}', dict(base, pipeline=True, pipeline_workers=w)) for w in args.workers]
+
+    print(f"📚 {Path(args.epub).name}")
+    print(f"{'模式':12s} {'耗时(ms)':>10s} {'瓶颈':>8s}  各阶段 忙碌/饥饿/阻塞 (ms)")
+    baseline = None
+    for label, config in runs:
+        best, metrics = min((run_once(args.epub, config) for _ in range(args.repeat)), key=lambda r: r[0])
+        baseline = baseline or best
+        stages = ""
+        if metrics:
+            stages = "  ".join(f"{name}: {s['busy_ms']:.0f}/{s['starved_ms']:.0f}/{s['blocked_ms']:.0f}"
+                               for name, s in metrics['stages'].items())
+        bottleneck = metrics['bottleneck'] if metrics else '-'
+        print(f"{label:12s} {best * 1000:10.0f} {bottleneck:>8s}  {stages}  ({baseline / best:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告记录基准
+用合成的书（默认 2000 本 × 每本 60 个spine项目）对比两种报告记录模型：
+
+- 字典：每条 spine_info / extracted_files 记录一个 dict，extracted_files 中保存完整路径字符串
+- 记录类型：report_writer 中的 __slots__ 记录，完整路径由共享的输出目录按需拼出
+
+测量保留整个批次全部记录时的内存（tracemalloc），以及单本大书（默认 20000 章）的报告写出：
+json.dumps(indent=2) 一次写出 与 JSONObjectWriter 逐条写出 的峰值内存和耗时，两者输出逐字节比较。
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from report_writer import SpineRecord, ExtractedRecord, write_json_file  # noqa: E402
+
+
+def make_book(book: int, chapters: int, slots: bool):
+    """一本合成书的 spine_info 和 extracted_files"""
+    base = f"/data/extracted_html/Book {book:05d} - A Fairly Typical Title"
+    directories = (f"{base}/raw_html", f"{base}/cleaned_html")
+    spine, extracted = [], []
+    for index in range(chapters):
+        file_name = f"OEBPS/Text/chapter{index:04d}.xhtml"
+        output_name = f"chapter_{index:03d}_chapter{index:04d}.html"
+        fields = {'index': index, 'item_id': f"id{index:04d}", 'file_name': file_name,
+                  'linear': 'yes', 'media_type': 'application/xhtml+xml'}
+        if slots:
+            spine.append(SpineRecord(**fields))
+            extracted.append(ExtractedRecord(index=index, original_name=file_name, output_name=output_name,
+                                             directories=directories, raw_size_bytes=20000 + index,
+                                             cleaned_size_bytes=18000 + index))
+        else:
+            spine.append(fields)
+            extracted.append({'index': index, 'original_name': file_name, 'output_name': output_name,
+                              'raw_file_path': str(Path(directories[0]) / output_name),
+                              'cleaned_file_path': str(Path(directories[1]) / output_name),
+                              'raw_size_bytes': 20000 + index, 'cleaned_size_bytes': 18000 + index})
+    return spine, extracted
+
+
+def measure(function):
+    """返回 (结果, 当前占用字节, 峰值字节, 耗时ms)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = (time.perf_counter() - start) * 1000
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报告记录基准')
+    parser.add_argument('--books', type=int, default=2000, help='批次中的书数')
+    parser.add_argument('--chapters', type=int, default=60, help='每本书的spine项目数')
+    parser.add_argument('--big-chapters', type=int, default=20000, help='单本大书的章节数（报告写出）')
+    parser.add_argument('--output', help='把结果追加到JSON Lines文件')
+    args = parser.parse_args()
+
+    results = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+               'books': args.books, 'chapters': args.chapters}
+    print(f"批次: {args.books} 本 × {args.chapters} 个spine项目（保留全部 spine_info 和 extracted_files）\n")
+    print(f"{'记录模型':>8s} {'占用(MB)':>10s} {'每条(字节)':>10s} {'构建(ms)':>10s}")
+    records = args.books * args.chapters * 2
+    for label, slots in (('字典', False), ('记录类型', True)):
+        _, current, _, elapsed = measure(lambda: [make_book(book, args.chapters, slots) for book in range(args.books)])
+        results[f"{'slots' if slots else 'dict'}_bytes"] = current
+        print(f"{label:>8s} {current / 1e6:10.1f} {current / records:10.0f} {elapsed:10.0f}")
+
+    spine, extracted = make_book(0, args.big_chapters, True)
+    report = {'metadata': {'title': '合成大书'}, 'extraction_summary': {'status': 'complete'},
+              'spine_info': spine, 'toc_info': [], 'extracted_files': extracted, 'skipped_files': []}
+    print(f"\n单本大书报告写出（{args.big_chapters} 章）:")
+    print(f"{'方式':>12s} {'峰值(MB)':>10s} {'耗时(ms)':>10s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        dumped_path, streamed_path = Path(tmp) / 'dumped.json', Path(tmp) / 'streamed.json'
+
+        def dump():
+            plain = dict(report, spine_info=[record.to_dict() for record in spine],
+                         extracted_files=[record.to_dict() for record in extracted])
+            with open(dumped_path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps(plain, ensure_ascii=False, indent=2))
+
+        for label, key, function in (('json.dumps', 'dumps', dump),
+                                     ('逐条写出', 'streamed', lambda: write_json_file(streamed_path, report))):
+            _, _, peak, elapsed = measure(function)
+            results[f"{key}_peak_bytes"], results[f"{key}_ms"] = peak, round(elapsed, 1)
+            print(f"{label:>12s} {peak / 1e6:10.1f} {elapsed:10.0f}")
+        identical = dumped_path.read_bytes() == streamed_path.read_bytes()
+        results['identical'] = identical
+        print(f"输出逐字节相同: {'是' if identical else '否'} ({os.path.getsize(streamed_path) / 1e6:.1f} MB)")
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(results, ensure_ascii=False) + "\n")
+        print(f"结果已追加到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+清理规则引擎基准
+对比旧的逐规则多次遍历实现与单次遍历规则引擎：随规则数增加的遍历次数和耗时，并校验两者输出一致
+"""
+
+import argparse
+import glob
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup, Comment
+
+from config import (
+    NOISE_HTML_TAGS, NOISE_CSS_SELECTORS, NOISE_TITLES, COPYRIGHT_KEYWORDS,
+    TOC_TITLE_KEYWORDS, TOC_LINK_KEYWORDS, TOC_LINK_THRESHOLD
+)
+from rule_engine import CompiledRules, clean_soup
+
+DEFAULT_INPUTS = str(Path(__file__).resolve().parent.parent / "extracted_html" / "*" / "raw_html" / "*.html")
+
+
+def legacy_clean(content, noise_tags, css_selectors, remove_comments=False):
+    """旧实现：每条标签/选择器规则各遍历一次全树，之后再分别遍历关键字、链接和空段落"""
+    soup = BeautifulSoup(content, 'html.parser')
+    passes = 0
+
+    if remove_comments:
+        passes += 1
+        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+            comment.extract()
+
+    for tag_name in noise_tags:
+        passes += 1
+        for tag in soup.find_all(tag_name):
+            tag.decompose()
+
+    for selector in css_selectors:
+        passes += 1
+        for element in soup.select(selector):
+            element.decompose()
+
+    passes += 1
+    for p in soup.find_all(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        text = p.get_text(strip=True)
+        if text:
+            for noise_title in NOISE_TITLES:
+                if noise_title.lower() in text.lower():
+                    p.decompose()
+                    break
+            else:
+                if any(keyword in text.lower() for keyword in COPYRIGHT_KEYWORDS):
+                    p.decompose()
+                elif text.lower().strip() in TOC_TITLE_KEYWORDS or \
+                        (p.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6'] and 'contents' in text.lower()):
+                    p.decompose()
+
+    passes += 1
+    all_links = soup.find_all('a')
+    if len(all_links) > TOC_LINK_THRESHOLD:
+        passes += 1
+        for p in soup.find_all('p'):
+            links = p.find_all('a')
+            if len(links) >= 1:
+                link_texts = [a.get_text(strip=True) for a in links]
+                if any(any(keyword in link_text.lower() for keyword in TOC_LINK_KEYWORDS)
+                       for link_text in link_texts):
+                    p.decompose()
+
+    passes += 1
+    for tag in soup.find_all(['p', 'div']):
+        if not tag.get_text(strip=True) and not tag.find('img'):
+            tag.decompose()
+
+    return str(soup), passes
+
+
+def engine_clean(content, rules, remove_comments=False):
+    soup = BeautifulSoup(content, 'html.parser')
+    clean_soup(soup, rules, remove_comments=remove_comments)
+    return str(soup), 1
+
+
+def synthetic_rules(extra):
+    """在配置规则之外追加 extra 条不会命中的规则，模拟规则库增长"""
+    tags = list(NOISE_HTML_TAGS) + [f"x-noise-{i}" for i in range(extra // 2)]
+    selectors = list(NOISE_CSS_SELECTORS) + [f".noise-rule-{i}" for i in range(extra - extra // 2)]
+    return tags, selectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='清理规则引擎基准')
+    parser.add_argument('--inputs', default=DEFAULT_INPUTS, help='输入HTML文件的glob')
+    parser.add_argument('--extra-rules', type=int, nargs='+', default=[0, 20, 80, 320], help='额外追加的规则数')
+    parser.add_argument('--repeat', type=int, default=1, help='每组重复次数')
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(args.inputs))
+    if not files:
+        print(f"未找到输入文件: {args.inputs}")
+        return
+    contents = [open(path, 'r', encoding='utf-8').read() for path in files]
+    total_bytes = sum(len(c.encode('utf-8')) for c in contents)
+    print(f"📄 {len(files)} 个HTML文件, 共 {total_bytes / 1024:.0f} KB")
+
+    # 输出一致性校验（注释保留/移除两种配置）
+    rules = CompiledRules()
+    for remove_comments in (False, True):
+        for path, content in zip(files, contents):
+            legacy_html, _ = legacy_clean(content, NOISE_HTML_TAGS, NOISE_CSS_SELECTORS, remove_comments)
+            engine_html, _ = engine_clean(content, rules, remove_comments)
+            if legacy_html != engine_html:
+                print(f"❌ 输出不一致: {path} (remove_comments={remove_comments})")
+                return 1
+    print("✅ 输出与旧实现一致")
+
+    print(f"\n{'规则数':>6s} {'旧遍历次数':>10s} {'旧耗时(ms)':>12s} {'新遍历次数':>10s} {'新耗时(ms)':>12s} {'加速比':>8s}")
+    for extra in args.extra_rules:
+        tags, selectors = synthetic_rules(extra)
+        rules = CompiledRules(noise_tags=tags, css_selectors=selectors)
+
+        legacy_passes = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for content in contents:
+                _, passes = legacy_clean(content, tags, selectors)
+                legacy_passes = max(legacy_passes, passes)
+        legacy_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for content in contents:
+                engine_clean(content, rules)
+        engine_ms = (time.perf_counter() - start) * 1000 / args.repeat
+
+        print(f"{len(tags) + len(selectors):6d} {legacy_passes:10d} {legacy_ms:12.0f} "
+              f"{1:10d} {engine_ms:12.0f} {legacy_ms / engine_ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
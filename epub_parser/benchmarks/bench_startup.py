@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+命令行启动基准
+每次上传启动一个提取进程，启动开销会被放大成千上万倍。本基准在子进程中测量：
+
+- 各命令行入口（--help、空目录运行）的墙钟时间中位数
+- ``python -X importtime`` 下累计耗时最多的模块，以及重量级依赖（ebooklib、bs4、numpy 等）是否被导入
+- 新进程中首次编译清理规则的耗时
+
+--output 把结果追加到JSON Lines文件，便于跨版本跟踪。
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ('ebooklib', 'bs4', 'lxml', 'numpy', 'sqlite3', 'soupsieve', 'concurrent.futures.process')
+
+RULES_SNIPPET = (
+    "import time; start = time.perf_counter(); import rule_engine; imported = time.perf_counter(); "
+    "rule_engine.get_default_rules(); done = time.perf_counter(); "
+    "print((imported - start) * 1000, (done - imported) * 1000)"
+)
+
+
+def wall_ms(command, repeat: int) -> float:
+    """子进程墙钟时间的中位数（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=PACKAGE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def import_profile(command, top: int):
+    """解析 -X importtime 输出：返回 (累计耗时最多的顶层模块, 已导入的重量级模块)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + command[1:], cwd=PACKAGE_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        parts = line[len('import time:'):].split('|')
+        try:
+            cumulative = int(parts[1])
+        except ValueError:
+            continue
+        modules[parts[2].strip()] = cumulative
+    heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+    heavy = [name for name in HEAVY_MODULES if name in modules]
+    return [(name, round(us / 1000, 1)) for name, us in heaviest], heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description='命令行启动基准')
+    parser.add_argument('--repeat', type=int, default=10, help='每个入口运行次数（取中位数）')
+    parser.add_argument('--top', type=int, default=8, help='显示累计导入耗时最多的模块数')
+    parser.add_argument('--output', help='把结果追加到JSON Lines文件')
+    args = parser.parse_args()
+
+    empty_dir = tempfile.mkdtemp(prefix='bench_startup_')
+    entries = {
+        'python (空解释器)': [sys.executable, '-c', 'pass'],
+        'html_extractor --help': [sys.executable, 'html_extractor.py', '--help'],
+        'html_extractor 空目录': [sys.executable, 'html_extractor.py', empty_dir, '-o', empty_dir],
+        'analyzer --help': [sys.executable, 'epub_structure_analyzer.py', '--help'],
+        'import html_extractor': [sys.executable, '-c', 'import html_extractor'],
+    }
+
+    results = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0], 'entries': {}}
+    print(f"{'入口':24s} {'中位数(ms)':>10s}  已导入的重量级模块")
+    for label, command in entries.items():
+        median = wall_ms(command, args.repeat)
+        heaviest, heavy = import_profile(command, args.top)
+        results['entries'][label] = {'median_ms': round(median, 1), 'heavy_modules': heavy, 'top_imports': heaviest}
+        print(f"{label:24s} {median:10.1f}  {', '.join(heavy) or '-'}")
+
+    print(f"\n--help 累计导入耗时最多的模块 (ms):")
+    for name, ms in results['entries']['html_extractor --help']['top_imports']:
+        print(f"  {name:32s} {ms:8.1f}")
+
+    output = subprocess.run([sys.executable, '-c', RULES_SNIPPET], cwd=PACKAGE_DIR,
+                            capture_output=True, text=True).stdout.split()
+    if len(output) == 2:
+        import_ms, compile_ms = (float(value) for value in output)
+        results['rules'] = {'import_ms': round(import_ms, 1), 'compile_ms': round(compile_ms, 2)}
+        print(f"\n清理规则: 导入 rule_engine {import_ms:.1f} ms, 首次编译 {compile_ms:.2f} ms")
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(results, ensure_ascii=False) + "\n")
+        print(f"结果已追加到: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+双语版本对齐
+把同一本书两种语言版本的提取结果（如 A Gentleman in Moscow 与 a gentleman in moscow zh）对齐到段落级，
+阅读端可以在两种语言之间即时跳转：
+
+1. 锚点：目录项（报告的 toc_info）、h1-h3 标题和短段落中的数字（阿拉伯数字、中文数字、英文数词）与拉丁词，
+   两边一致且在书中相对位置相近的配成对，取加权最大的单调链
+2. 章节：锚点和累计字符数构成分段线性的位置映射，据此按重叠比例对应两边的spine章节
+3. 段落：Gale-Church 长度模型（1-1、1-0、0-1、2-1、1-2、2-2）的动态规划，只计算位置映射两侧的带状区域，
+   最优路径贴到带边时加宽重算；每一行用numpy向量化，耗时与段落数近似线性
+
+对齐索引按全书段落序号记录（章节内序号加上章节的段落偏移，段落划分与阅读端章节包的段落数组一致）：
+A 的段落 [a_breaks[k], a_breaks[k+1]) 对应 B 的段落 [b_breaks[k], b_breaks[k+1])，二分查找即可双向跳转。
+"""
+
+import argparse
+import bisect
+import json
+import math
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from paragraphs import find_paragraph_spans, split_into_paragraphs
+
+INDEX_FORMAT = "bilingual-alignment"
+INDEX_VERSION = 1
+
+# Gale-Church 对齐单元：(A段落数, B段落数, 先验概率)
+BEADS = ((1, 1, 0.89), (1, 0, 0.0099 / 2), (0, 1, 0.0099 / 2),
+         (2, 1, 0.089 / 2), (1, 2, 0.089 / 2), (2, 2, 0.011))
+BEAD_01 = 2  # 同一行内的 0-1 单元单独做前缀扫描
+DEFAULT_VARIANCE = 6.8  # 单位长度的方差（Gale & Church 1993，以A的字符为单位）
+DEFAULT_BAND = 64       # 带状区域的初始半宽（段落数）
+ANCHOR_MAX_CHARS = 40   # 作为锚点候选的短段落的最大长度
+ANCHOR_TOLERANCE = 0.08  # 锚点两边在书中相对位置之差的上限
+MIN_CHAPTER_SHARE = 0.1  # 章节对应关系的最小重叠比例
+
+_CN_DIGITS = {'〇': 0, '零': 0, '一': 1, '二': 2, '两': 2, '三': 3, '四': 4,
+              '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+_CN_UNITS = {'十': 10, '百': 100, '千': 1000}
+_EN_NUMBERS = {word: value for value, word in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen "
+    "sixteen seventeen eighteen nineteen twenty".split())}
+_STOPWORDS = frozenset({'a', 'an', 'the', 'of', 'and', 'in', 'to'})
+_FOOTNOTE_PATTERN = re.compile(r"[(（\[]\d+[)）\]]")
+_NOTE_PATTERN = re.compile(r"^\s*[(（\[]\d+[)）\]]")  # 以注号开头的段落是章末注释，原文中没有对应段落
+_ARABIC_PATTERN = re.compile(r"\d+")
+_CN_NUMBER_PATTERN = re.compile(r"[〇零一二两三四五六七八九十百千]+")
+_LATIN_PATTERN = re.compile(r"[a-z]+")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+# ---- 锚点文本 ----
+
+def _chinese_number(text: str) -> int:
+    """中文数字：逐位写法（一九二二）和带单位的写法（二十三）"""
+    if not any(ch in _CN_UNITS for ch in text):
+        return int("".join(str(_CN_DIGITS[ch]) for ch in text))
+    total, current = 0, 0
+    for ch in text:
+        if ch in _CN_UNITS:
+            total += (current or 1) * _CN_UNITS[ch]
+            current = 0
+        else:
+            current = _CN_DIGITS[ch]
+    return total + current
+
+
+def anchor_key(text: str) -> Optional[Tuple[frozenset, frozenset]]:
+    """锚点文本的语言无关特征：(数字集合, 拉丁词集合)；两者都为空时返回None"""
+    text = _FOOTNOTE_PATTERN.sub("", text).lower()
+    numbers = {int(value) for value in _ARABIC_PATTERN.findall(text)}
+    numbers.update(_chinese_number(value) for value in _CN_NUMBER_PATTERN.findall(text))
+    words = set()
+    for word in _LATIN_PATTERN.findall(text):
+        if word in _EN_NUMBERS:
+            numbers.add(_EN_NUMBERS[word])
+        elif word not in _STOPWORDS:
+            words.add(word)
+    if not numbers and not words:
+        return None
+    return frozenset(numbers), frozenset(words)
+
+
+def keys_match(a: Tuple[frozenset, frozenset], b: Tuple[frozenset, frozenset]) -> bool:
+    """两个锚点特征是否一致：数字相同；两边都有拉丁词时词也相同，否则只认年份这类三位以上的数字"""
+    if a[0] != b[0]:
+        return False
+    if a[1] and b[1]:
+        return a[1] == b[1]
+    return bool(a[0]) and max(a[0]) >= 100
+
+
+# ---- 版本 ----
+
+class Edition:
+    """一个版本的提取结果：按spine顺序拼接的全书段落、各段落长度和锚点候选"""
+
+    def __init__(self, output_dir: Path):
+        self.directory = Path(output_dir)
+        with open(self.directory / 'extraction_report.json', 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        self.name = self.directory.name
+        self.language = report.get('metadata', {}).get('language')
+        self.chapters: List[Dict[str, Any]] = []
+        self.texts: List[str] = []
+        self.tags: List[str] = []
+        fragments = {}  # (原始文件名, 片段id) -> 全书段落序号
+
+        for record in sorted(report.get('extracted_files', []), key=lambda r: r['index']):
+            html = (self.directory / 'cleaned_html' / record['output_name']).read_text(encoding='utf-8')
+            paragraphs = split_into_paragraphs(html)
+            offset = len(self.texts)
+            self.chapters.append({'index': record['index'], 'output_name': record['output_name'],
+                                  'original_name': record.get('original_name'),
+                                  'paragraph_offset': offset, 'paragraphs': len(paragraphs)})
+            self.texts.extend(paragraph['text'] for paragraph in paragraphs)
+            self.tags.extend(paragraph['tag'] for paragraph in paragraphs)
+            if record.get('original_name'):
+                fragments.update(_fragment_positions(html, record['original_name'], offset))
+
+        # 长度不计空白（中文没有词间空格，英文的空格不携带对齐信息）；注释段落记为0，不参与对齐，归入前一个对齐单元
+        self.lengths = [0 if _NOTE_PATTERN.match(text) else len(_SPACE_PATTERN.sub("", text)) for text in self.texts]
+        self.total_chars = sum(self.lengths)
+        self.starts = []  # 每个段落开始处的累计字符数
+        position = 0
+        for length in self.lengths:
+            self.starts.append(position)
+            position += length
+        self.toc_paragraphs = {}
+        for entry in report.get('toc_info', []):
+            file_name, _, fragment = entry.get('href', '').partition('#')
+            paragraph = fragments.get((file_name, fragment))
+            if paragraph is None:
+                chapter = next((c for c in self.chapters if c['original_name'] == file_name), None)
+                paragraph = chapter['paragraph_offset'] if chapter and chapter['paragraphs'] else None
+            if paragraph is not None:
+                self.toc_paragraphs.setdefault(paragraph, entry.get('title', ''))
+
+    @property
+    def paragraph_count(self) -> int:
+        return len(self.texts)
+
+    def anchor_candidates(self) -> List[Dict[str, Any]]:
+        """目录项、h1-h3 标题和短段落中可以跨语言比对的锚点"""
+        candidates = []
+        for paragraph, text in enumerate(self.texts):
+            toc_title = self.toc_paragraphs.get(paragraph)
+            structural = toc_title is not None or self.tags[paragraph] in ('h1', 'h2', 'h3')
+            if not self.lengths[paragraph]:
+                continue
+            if not structural and not 0 < len(text) <= ANCHOR_MAX_CHARS:
+                continue
+            for source in ([toc_title] if toc_title else []) + [text]:
+                key = anchor_key(source)
+                if key is not None:
+                    candidates.append({'paragraph': paragraph, 'key': key, 'structural': structural,
+                                       'position': self.starts[paragraph] / max(self.total_chars, 1)})
+                    break
+        return candidates
+
+
+def _fragment_positions(html: str, file_name: str, offset: int) -> Dict[Tuple[str, str], int]:
+    """章节中每个 id 所在（或紧随其后）的段落序号，用于定位目录项的 href 片段"""
+    data = html.encode('utf-8')
+    ends = [end for _, end in find_paragraph_spans(data)]
+    positions = {}
+    for match in re.finditer(rb"""\sid\s*=\s*["']([^"']+)["']""", data):
+        paragraph = bisect.bisect_right(ends, match.start())
+        if paragraph < len(ends):
+            positions.setdefault((file_name, match.group(1).decode('utf-8')), offset + paragraph)
+    return positions
+
+
+# ---- 锚点与章节 ----
+
+def match_anchors(a: Edition, b: Edition, tolerance: float = ANCHOR_TOLERANCE) -> List[Tuple[int, int]]:
+    """锚点配对后取加权最大的严格单调链，返回 [(A段落, B段落)]"""
+    by_numbers: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for candidate in b.anchor_candidates():
+        by_numbers.setdefault(candidate['key'][0], []).append(candidate)
+
+    pairs = []
+    for left in a.anchor_candidates():
+        for right in by_numbers.get(left['key'][0], ()):
+            distance = abs(left['position'] - right['position'])
+            if distance <= tolerance and keys_match(left['key'], right['key']):
+                weight = (1 - distance / tolerance) * (2 if left['structural'] and right['structural'] else 1)
+                pairs.append((left['paragraph'], right['paragraph'], weight))
+    if not pairs:
+        return []
+
+    # 带权最长严格递增子序列：按A排序，B的名次上用树状数组维护前缀最大值
+    pairs.sort(key=lambda pair: (pair[0], -pair[1]))
+    ranks = {value: rank + 1 for rank, value in enumerate(sorted({pair[1] for pair in pairs}))}
+    tree = [(0.0, -1)] * (len(ranks) + 1)
+    best, previous = [0.0] * len(pairs), [-1] * len(pairs)
+    group_start = 0
+    for index, (left, right, weight) in enumerate(pairs):
+        if index and left != pairs[index - 1][0]:
+            group_start = index
+        # 同一个A段落的多个候选互不相连：先全部查询，组结束时再写入树状数组
+        rank, value, link = ranks[right] - 1, 0.0, -1
+        while rank > 0:
+            if tree[rank][0] > value:
+                value, link = tree[rank]
+            rank -= rank & -rank
+        best[index], previous[index] = value + weight, link
+        if index + 1 == len(pairs) or pairs[index + 1][0] != left:
+            for member in range(group_start, index + 1):
+                rank = ranks[pairs[member][1]]
+                while rank <= len(ranks):
+                    if best[member] > tree[rank][0]:
+                        tree[rank] = (best[member], member)
+                    rank += rank & -rank
+
+    chain, index = [], max(range(len(pairs)), key=best.__getitem__)
+    while index >= 0:
+        chain.append(pairs[index][:2])
+        index = previous[index]
+    return chain[::-1]
+
+
+def position_map(a: Edition, b: Edition, anchors: List[Tuple[int, int]]) -> Tuple[List[float], List[float]]:
+    """分段线性的位置映射（A的累计字符数 -> B的累计字符数）的折点"""
+    xs, ys = [0.0], [0.0]
+    for left, right in anchors:
+        x, y = float(a.starts[left]), float(b.starts[right])
+        if x > xs[-1] and y > ys[-1]:
+            xs.append(x)
+            ys.append(y)
+    xs.append(float(max(a.total_chars, xs[-1] + 1)))
+    ys.append(float(max(b.total_chars, ys[-1] + 1)))
+    return xs, ys
+
+
+def align_chapters(a: Edition, b: Edition, xs: List[float], ys: List[float],
+                   min_share: float = MIN_CHAPTER_SHARE) -> List[List[Any]]:
+    """按位置映射把A的章节投影到B上，返回 [A章节spine序号, B章节spine序号, 占A章节的比例, 占B章节的比例]"""
+    def chapter_range(edition, chapter):
+        first = chapter['paragraph_offset']
+        last = first + chapter['paragraphs']
+        start = edition.starts[first] if chapter['paragraphs'] else 0
+        end = edition.starts[last - 1] + edition.lengths[last - 1] if chapter['paragraphs'] else 0
+        return start, end
+
+    b_ranges = [(chapter, *chapter_range(b, chapter)) for chapter in b.chapters]
+    links = []
+    for chapter in a.chapters:
+        start, end = chapter_range(a, chapter)
+        if end <= start:
+            continue
+        mapped_start, mapped_end = np.interp([start, end], xs, ys)
+        for other, other_start, other_end in b_ranges:
+            overlap = min(mapped_end, other_end) - max(mapped_start, other_start)
+            if overlap <= 0 or other_end <= other_start:
+                continue
+            share_a = overlap / max(mapped_end - mapped_start, 1)
+            share_b = overlap / (other_end - other_start)
+            if share_a >= min_share or share_b >= min_share:
+                links.append([chapter['index'], other['index'], round(share_a, 3), round(share_b, 3)])
+    return links
+
+
+# ---- 段落对齐 ----
+
+def _neg_log_erfc(x):
+    """-log(erfc(x))，x >= 0（Abramowitz & Stegun 7.1.26，大 x 时不下溢）"""
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return x * x - np.log(poly)
+
+
+def _bead_cost(la, lb, ratio: float, variance: float):
+    """Gale-Church 长度代价（不含先验）：B的长度换算成A的单位后比较"""
+    lb = lb / ratio
+    mean = np.maximum((la + lb) / 2, 1.0)
+    delta = np.abs(lb - la) / np.sqrt(variance * mean)
+    return _neg_log_erfc(delta / math.sqrt(2))
+
+
+class BandedAligner:
+    """带状区域内的 Gale-Church 动态规划"""
+
+    def __init__(self, a_lengths: List[int], b_lengths: List[int], centers, ratios,
+                 variance: float = DEFAULT_VARIANCE):
+        """centers[i]：A的第 i 个段落之前对应的B段落数的期望；ratios[i]：该处的局部长度比（B/A）"""
+        self.la = np.asarray(a_lengths, dtype=float)
+        self.lb = np.asarray(b_lengths, dtype=float)
+        self.n, self.m = len(self.la), len(self.lb)
+        self.centers = np.maximum.accumulate(np.asarray(centers, dtype=float))
+        self.ratios = np.asarray(ratios, dtype=float)
+        self.variance = variance
+        self.penalties = [-math.log(prior) for _, _, prior in BEADS]
+        self.cells = 0
+
+    def _bands(self, half_width: int):
+        lo = np.clip(np.floor(self.centers) - half_width, 0, self.m).astype(int)
+        hi = np.clip(np.ceil(self.centers) + half_width, 0, self.m).astype(int)
+        lo[0], hi[-1] = 0, self.m
+        # 相邻行的带必须相连：每一行的左端不超过上一行的右端，其余单元由行内的 0-1 单元接上
+        lo = np.minimum(lo, np.concatenate(([0], hi[:-1])))
+        return lo, hi
+
+    def align(self, half_width: int = DEFAULT_BAND) -> List[Tuple[int, int]]:
+        """返回对齐单元列表 [(A段落数, B段落数)]；路径贴到带边时加宽带重算"""
+        while True:
+            beads, touched = self._run(*self._bands(half_width))
+            if not touched or half_width >= max(self.n, self.m):
+                return beads
+            half_width *= 2
+
+    def _run(self, lo, hi):
+        with np.errstate(invalid='ignore', over='ignore'):
+            return self._fill_and_trace(lo, hi)
+
+    def _fill_and_trace(self, lo, hi):
+        inf = math.inf
+        costs = [None] * (self.n + 1)
+        moves = [None] * (self.n + 1)
+        cum_b = np.concatenate(([0.0], np.cumsum(self.lb)))
+
+        def previous(row, js):
+            """第 row 行在列 js 处的代价（带外为 inf）"""
+            values = np.full(len(js), inf)
+            if row < 0:
+                return values
+            inside = (js >= lo[row]) & (js <= hi[row])
+            values[inside] = costs[row][js[inside] - lo[row]]
+            return values
+
+        for i in range(self.n + 1):
+            js = np.arange(lo[i], hi[i] + 1)
+            ratio = self.ratios[min(i, self.n - 1)] if self.n else 1.0
+            lb1 = np.where(js >= 1, self.lb[np.maximum(js - 1, 0)], 0.0)
+            lb2 = cum_b[js] - cum_b[np.maximum(js - 2, 0)]
+            candidates = np.full((len(BEADS), len(js)), inf)
+            if i >= 1:
+                la1 = self.la[i - 1]
+                row1 = previous(i - 1, js - 1)
+                candidates[0] = row1 + _bead_cost(la1, lb1, ratio, self.variance) + self.penalties[0]
+                candidates[1] = previous(i - 1, js) + _bead_cost(la1, 0.0, ratio, self.variance) + self.penalties[1]
+                candidates[4] = previous(i - 1, js - 2) + _bead_cost(la1, lb2, ratio, self.variance) + self.penalties[4]
+                if i >= 2:
+                    la2 = la1 + self.la[i - 2]
+                    candidates[3] = previous(i - 2, js - 1) + _bead_cost(la2, lb1, ratio, self.variance) + self.penalties[3]
+                    candidates[5] = previous(i - 2, js - 2) + _bead_cost(la2, lb2, ratio, self.variance) + self.penalties[5]
+            # 列数不够的单元不可用（0-1 单元在下面单独处理）
+            for bead, (_, dj, _) in enumerate(BEADS):
+                if dj:
+                    candidates[bead, js < dj] = inf
+            other = candidates.min(axis=0)
+            move = candidates.argmin(axis=0).astype(np.int8)
+            if i == 0:
+                other[js == 0] = 0.0
+
+            # 同一行内的 0-1 单元：cost[j] = min(other[j], cost[j-1] + d[j])，用前缀和与前缀最小值一次算出
+            steps = _bead_cost(0.0, lb1, ratio, self.variance) + self.penalties[BEAD_01]
+            steps[0] = 0.0
+            prefix = np.cumsum(steps)
+            best = prefix + np.minimum.accumulate(other - prefix)
+            best = np.where(np.isnan(best), inf, best)
+            move[best < other - 1e-9] = BEAD_01
+            costs[i], moves[i] = best, move
+            self.cells += len(js)
+            if i >= 2:
+                costs[i - 2] = None  # 只保留最近两行的代价
+
+        beads, touched = [], False
+        i, j = self.n, self.m
+        while i > 0 or j > 0:
+            if 0 < i < self.n and ((j == lo[i] and lo[i] > 0) or (j == hi[i] and hi[i] < self.m)):
+                touched = True
+            di, dj, _ = BEADS[moves[i][j - lo[i]]]
+            beads.append((di, dj))
+            i, j = i - di, j - dj
+        return beads[::-1], touched
+
+
+def align_paragraphs(a: Edition, b: Edition, xs: List[float], ys: List[float],
+                     band: int = DEFAULT_BAND, variance: float = DEFAULT_VARIANCE) -> Dict[str, Any]:
+    """对齐两个版本的非空段落，返回以全书段落序号表示的对齐单元边界和统计"""
+    a_index = [p for p, length in enumerate(a.lengths) if length]
+    b_index = [p for p, length in enumerate(b.lengths) if length]
+    a_lengths = [a.lengths[p] for p in a_index]
+    b_lengths = [b.lengths[p] for p in b_index]
+
+    # 每个A段落之前对应的B段落数的期望，以及该处的局部长度比（位置映射的斜率）
+    a_starts = np.array([a.starts[p] for p in a_index] + [a.total_chars], dtype=float)
+    b_ends = np.cumsum(b_lengths) if b_lengths else np.zeros(0)
+    centers = np.searchsorted(b_ends, np.interp(a_starts, xs, ys), side='right')
+    slopes = np.diff(ys) / np.diff(xs)
+    segments = np.clip(np.searchsorted(xs, a_starts[:-1], side='right') - 1, 0, len(slopes) - 1)
+    aligner = BandedAligner(a_lengths, b_lengths, centers, slopes[segments] if len(a_index) else [], variance)
+    start = time.perf_counter()
+    beads = aligner.align(band)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    def to_global(index, positions, total):
+        return positions[index] if index < len(positions) else total
+
+    a_breaks, b_breaks = [0], [0]
+    i = j = 0
+    for di, dj in beads:
+        i, j = i + di, j + dj
+        a_breaks.append(to_global(i, a_index, a.paragraph_count))
+        b_breaks.append(to_global(j, b_index, b.paragraph_count))
+    a_breaks[-1], b_breaks[-1] = a.paragraph_count, b.paragraph_count
+
+    kinds: Dict[str, int] = {}
+    for di, dj in beads:
+        kinds[f"{di}-{dj}"] = kinds.get(f"{di}-{dj}", 0) + 1
+    return {
+        'a_breaks': a_breaks, 'b_breaks': b_breaks,
+        'stats': {'beads': len(beads), 'bead_types': kinds, 'cells': aligner.cells,
+                  'full_cells': (len(a_index) + 1) * (len(b_index) + 1), 'dp_ms': round(elapsed_ms, 1)},
+    }
+
+
+# ---- 对齐索引 ----
+
+def build_alignment(a_dir: Path, b_dir: Path, band: int = DEFAULT_BAND,
+                    variance: float = DEFAULT_VARIANCE) -> Dict[str, Any]:
+    """对齐两个提取结果目录，返回对齐索引"""
+    if not numpy_available():
+        raise RuntimeError("双语对齐需要numpy: pip install numpy")
+    timings = {}
+    start = time.perf_counter()
+    a, b = Edition(a_dir), Edition(b_dir)
+    timings['load_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    start = time.perf_counter()
+    anchors = match_anchors(a, b)
+    xs, ys = position_map(a, b, anchors)
+    chapter_links = align_chapters(a, b, xs, ys)
+    timings['chapters_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    paragraphs = align_paragraphs(a, b, xs, ys, band, variance)
+    timings['paragraphs_ms'] = paragraphs['stats'].pop('dp_ms')
+
+    def edition_info(edition):
+        return {'name': edition.name, 'language': edition.language, 'paragraphs': edition.paragraph_count,
+                'chars': edition.total_chars,
+                'chapters': [{key: chapter[key] for key in ('index', 'output_name', 'paragraph_offset', 'paragraphs')}
+                             for chapter in edition.chapters]}
+
+    return {
+        'format': INDEX_FORMAT,
+        'version': INDEX_VERSION,
+        'editions': [edition_info(a), edition_info(b)],
+        'chapter_links': chapter_links,
+        'anchors': [list(pair) for pair in anchors],
+        'beads': {'a_breaks': paragraphs['a_breaks'], 'b_breaks': paragraphs['b_breaks']},
+        'summary': dict(paragraphs['stats'], anchors=len(anchors), length_ratio=round(b.total_chars / max(a.total_chars, 1), 3),
+                        timings=timings),
+    }
+
+
+def locate(index: Dict[str, Any], side: int, chapter_index: int, paragraph: int) -> Tuple[int, int]:
+    """从一个版本的 (章节spine序号, 章节内段落序号) 跳到另一个版本对应位置的开头，side 为 0（A）或 1（B）"""
+    source, target = index['editions'][side], index['editions'][1 - side]
+    breaks = index['beads']['a_breaks' if side == 0 else 'b_breaks']
+    other_breaks = index['beads']['b_breaks' if side == 0 else 'a_breaks']
+    chapter = next(c for c in source['chapters'] if c['index'] == chapter_index)
+    position = chapter['paragraph_offset'] + paragraph
+    bead = min(bisect.bisect_right(breaks, position) - 1, len(other_breaks) - 2)
+    target_position = other_breaks[bead]
+    offsets = [c['paragraph_offset'] for c in target['chapters']]
+    chapter_slot = max(bisect.bisect_right(offsets, target_position) - 1, 0)
+    target_chapter = target['chapters'][chapter_slot]
+    return target_chapter['index'], target_position - target_chapter['paragraph_offset']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='双语版本段落对齐')
+    parser.add_argument('edition_a', help='第一个版本的提取结果目录（含 extraction_report.json）')
+    parser.add_argument('edition_b', help='第二个版本的提取结果目录')
+    parser.add_argument('--output', '-o', help='对齐索引输出路径（默认: 第一个版本目录/alignment/<第二个版本目录名>.json）')
+    parser.add_argument('--band', type=int, default=DEFAULT_BAND, help=f'带状区域初始半宽（段落数，默认: {DEFAULT_BAND}）')
+    args = parser.parse_args()
+
+    a_dir, b_dir = Path(args.edition_a), Path(args.edition_b)
+    print(f"🔗 对齐: {a_dir.name} <-> {b_dir.name}")
+    index = build_alignment(a_dir, b_dir, args.band)
+    output = Path(args.output) if args.output else a_dir / 'alignment' / f"{b_dir.name}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+    summary = index['summary']
+    a, b = index['editions']
+    print(f"  - 段落: {a['paragraphs']} <-> {b['paragraphs']}，长度比 {summary['length_ratio']}")
+    print(f"  - 锚点: {summary['anchors']} 个，章节对应: {len(index['chapter_links'])} 组")
+    print(f"  - 对齐单元: {summary['beads']} 个 {summary['bead_types']}")
+    print(f"  - 计算单元格: {summary['cells']} / {summary['full_cells']}（全矩阵）")
+    print(f"  - 耗时: {summary['timings']}")
+    print(f"💾 对齐索引已保存到: {output} ({output.stat().st_size / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite 目录索引
+把提取报告（extraction_report.json）和结构分析（*_structure.json）批量写入本地 SQLite，
+跨书查询不再需要逐个打开JSON文件。提取器和结构分析器可以在运行时直接写入，也可以从已有JSON重建。
+
+    python catalogue_db.py import extracted_html analysis --db catalogue.sqlite --rebuild
+    python catalogue_db.py query "SELECT b.title, COUNT(*) FROM skipped_files s JOIN books b ON b.id = s.book_id
+                                  WHERE s.skip_category = 'noise_title' GROUP BY b.id HAVING COUNT(*) > 5"
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path, PureWindowsPath
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+DEFAULT_DB = "catalogue.sqlite"
+DEFAULT_BATCH_SIZE = 200  # 每个事务写入的书籍数
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    id INTEGER PRIMARY KEY,
+    book_key TEXT NOT NULL UNIQUE,          -- EPUB文件名（不含扩展名）
+    epub_path TEXT,
+    sha256 TEXT,
+    title TEXT,
+    author TEXT,
+    language TEXT,
+    extraction_status TEXT,
+    rules_fingerprint TEXT,
+    extracted_count INTEGER,
+    skipped_count INTEGER,
+    report_path TEXT,
+    analysis_path TEXT,
+    manifest_item_count INTEGER,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS spine_items (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    source TEXT NOT NULL,                   -- extraction / analysis
+    idx INTEGER NOT NULL,
+    item_id TEXT,
+    file_name TEXT,
+    linear TEXT,
+    media_type TEXT,
+    PRIMARY KEY (book_id, source, idx)
+);
+CREATE TABLE IF NOT EXISTS toc_entries (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    level INTEGER,
+    title TEXT,
+    href TEXT,
+    PRIMARY KEY (book_id, source, position)
+);
+CREATE TABLE IF NOT EXISTS extracted_files (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    original_name TEXT,
+    output_name TEXT,
+    raw_size_bytes INTEGER,
+    cleaned_size_bytes INTEGER,
+    PRIMARY KEY (book_id, idx)
+);
+CREATE TABLE IF NOT EXISTS skipped_files (
+    book_id INTEGER NOT NULL REFERENCES books(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    file_name TEXT,
+    item_id TEXT,
+    skip_reason TEXT,
+    skip_category TEXT,                     -- noise_filename / noise_title / near_duplicate / blank / other
+    skip_keyword TEXT,
+    PRIMARY KEY (book_id, idx)
+);
+CREATE TABLE IF NOT EXISTS timings (
+    book_id INTEGER PRIMARY KEY REFERENCES books(id) ON DELETE CASCADE,
+    time_to_first_chapter_ms REAL,
+    total_ms REAL,
+    pipeline_wall_ms REAL,
+    pipeline_bottleneck TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_books_sha256 ON books(sha256);
+CREATE INDEX IF NOT EXISTS idx_books_title ON books(title);
+CREATE INDEX IF NOT EXISTS idx_books_author ON books(author);
+CREATE INDEX IF NOT EXISTS idx_skipped_category ON skipped_files(skip_category, skip_keyword);
+CREATE INDEX IF NOT EXISTS idx_extracted_output ON extracted_files(output_name);
+CREATE INDEX IF NOT EXISTS idx_toc_title ON toc_entries(title);
+"""
+
+# 跳过原因 -> (类别, 关键字)，对应 html_extractor / noise_triage 中的原因文本
+_SKIP_REASON_PATTERNS = (
+    (re.compile(r"^文件名包含噪声关键字: (.*)$"), 'noise_filename'),
+    (re.compile(r"^标题包含噪声关键字: (.*)$"), 'noise_title'),
+    (re.compile(r"^与已知噪声页面近似重复: (.*?) \(相似度"), 'near_duplicate'),
+    (re.compile(r"^空白页面()"), 'blank'),
+)
+
+_TABLES = ('spine_items', 'toc_entries', 'extracted_files', 'skipped_files', 'timings', 'books')
+
+
+def classify_skip_reason(reason: str) -> Tuple[str, Optional[str]]:
+    """把跳过原因文本归类，返回 (类别, 命中的关键字)"""
+    for pattern, category in _SKIP_REASON_PATTERNS:
+        match = pattern.match(reason or '')
+        if match:
+            return category, match.group(1) or None
+    return 'other', None
+
+
+def _book_key(path: str) -> str:
+    # 报告可能在 Windows 上生成，按两种分隔符取文件名
+    return Path(PureWindowsPath(path).name).stem
+
+
+class CatalogueDB:
+    """目录数据库：按书批量写入，每 batch_size 本书提交一次事务"""
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_DB, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self._pending_books = 0
+
+    def clear(self):
+        """清空全部数据（从JSON重建前调用）"""
+        for table in _TABLES:
+            self.conn.execute(f"DELETE FROM {table}")
+        self.conn.commit()
+
+    def _upsert_book(self, book_key: str, values: Dict[str, Any]) -> int:
+        values = {k: v for k, v in values.items() if v is not None}
+        values['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        columns = ['book_key'] + list(values)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        self.conn.execute(
+            f"INSERT INTO books ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT(book_key) DO UPDATE SET {updates}",
+            [book_key] + list(values.values()))
+        return self.conn.execute("SELECT id FROM books WHERE book_key = ?", (book_key,)).fetchone()[0]
+
+    def _replace_spine_and_toc(self, book_id: int, source: str, spine: Iterable[Dict[str, Any]],
+                               toc: Iterable[Dict[str, Any]], id_key: str):
+        self.conn.execute("DELETE FROM spine_items WHERE book_id = ? AND source = ?", (book_id, source))
+        self.conn.executemany(
+            "INSERT INTO spine_items VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(book_id, source, item.get('index'), item.get(id_key), item.get('file_name'),
+              item.get('linear'), item.get('media_type')) for item in spine])
+        self.conn.execute("DELETE FROM toc_entries WHERE book_id = ? AND source = ?", (book_id, source))
+        self.conn.executemany(
+            "INSERT INTO toc_entries VALUES (?, ?, ?, ?, ?, ?)",
+            [(book_id, source, position, entry.get('level'), entry.get('title'), entry.get('href'))
+             for position, entry in enumerate(toc)])
+
+    def add_extraction_report(self, report: Dict[str, Any], report_path: Optional[str] = None,
+                              sha256: Optional[str] = None, rules_fingerprint: Optional[str] = None) -> int:
+        """写入一份提取报告，返回书籍ID"""
+        summary = report.get('extraction_summary', {})
+        metadata = report.get('metadata', {})
+        epub_path = summary.get('epub_source') or str(report_path or '')
+        book_id = self._upsert_book(_book_key(epub_path), {
+            'epub_path': epub_path,
+            'sha256': sha256,
+            'title': metadata.get('title'),
+            'author': metadata.get('author'),
+            'language': metadata.get('language'),
+            'extraction_status': summary.get('status', 'complete'),
+            'rules_fingerprint': rules_fingerprint,
+            'extracted_count': summary.get('total_files_extracted'),
+            'skipped_count': summary.get('total_files_skipped'),
+            'report_path': str(report_path) if report_path else None,
+        })
+
+        self._replace_spine_and_toc(book_id, 'extraction', report.get('spine_info', []),
+                                    report.get('toc_info', []), 'item_id')
+        self.conn.execute("DELETE FROM extracted_files WHERE book_id = ?", (book_id,))
+        self.conn.executemany(
+            "INSERT INTO extracted_files VALUES (?, ?, ?, ?, ?, ?)",
+            [(book_id, f['index'], f.get('original_name'), f.get('output_name'),
+              f.get('raw_size_bytes'), f.get('cleaned_size_bytes')) for f in report.get('extracted_files', [])])
+        self.conn.execute("DELETE FROM skipped_files WHERE book_id = ?", (book_id,))
+        self.conn.executemany(
+            "INSERT INTO skipped_files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(book_id, f['index'], f.get('file_name'), f.get('item_id'), f.get('skip_reason'),
+              *classify_skip_reason(f.get('skip_reason', ''))) for f in report.get('skipped_files', [])])
+
+        timings = summary.get('timings') or {}
+        pipeline = summary.get('pipeline') or {}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO timings VALUES (?, ?, ?, ?, ?)",
+            (book_id, timings.get('time_to_first_chapter_ms'), timings.get('total_ms'),
+             pipeline.get('wall_ms'), pipeline.get('bottleneck')))
+
+        self._book_written()
+        return book_id
+
+    def add_structure_analysis(self, analysis: Dict[str, Any], analysis_path: Optional[str] = None,
+                               sha256: Optional[str] = None) -> int:
+        """写入一份结构分析结果，返回书籍ID（标题、作者等以提取报告为准）"""
+        book_id = self._upsert_book(_book_key(analysis.get('file_name') or analysis.get('file_path', '')), {
+            'epub_path': analysis.get('file_path'),
+            'sha256': sha256,
+            'analysis_path': str(analysis_path) if analysis_path else None,
+            'manifest_item_count': len(analysis.get('all_items', [])),
+        })
+        self._replace_spine_and_toc(book_id, 'analysis', analysis.get('spine', []),
+                                    analysis.get('toc', []), 'id')
+        self._book_written()
+        return book_id
+
+    def _book_written(self):
+        self._pending_books += 1
+        if self._pending_books >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._pending_books = 0
+
+    def query(self, sql: str, params: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        self.conn.row_factory = sqlite3.Row
+        try:
+            return self.conn.execute(sql, tuple(params)).fetchall()
+        finally:
+            self.conn.row_factory = None
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def import_json(db: CatalogueDB, roots: List[str]) -> Dict[str, int]:
+    """扫描目录下的 extraction_report.json 和 *_structure.json 写入数据库"""
+    counts = {'reports': 0, 'analyses': 0, 'errors': 0}
+    for root in roots:
+        root_path = Path(root)
+        files = [root_path] if root_path.is_file() else sorted(root_path.rglob("*.json"))
+        for path in files:
+            is_report = path.name == 'extraction_report.json'
+            if not is_report and not path.name.endswith('_structure.json'):
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if is_report:
+                    db.add_extraction_report(data, str(path))
+                    counts['reports'] += 1
+                else:
+                    db.add_structure_analysis(data, str(path))
+                    counts['analyses'] += 1
+            except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+                print(f"  ✗ 导入失败: {path} - {e}")
+                counts['errors'] += 1
+    db.commit()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite 目录索引')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'数据库文件（默认: {DEFAULT_DB}）')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='从已有的JSON结果导入')
+    import_parser.add_argument('roots', nargs='+', help='提取输出目录、分析输出目录或单个JSON文件')
+    import_parser.add_argument('--rebuild', action='store_true', help='导入前清空数据库')
+
+    query_parser = subparsers.add_parser('query', help='执行SQL查询')
+    query_parser.add_argument('sql', help='SQL语句')
+
+    args = parser.parse_args()
+    with CatalogueDB(args.db) as db:
+        if args.command == 'import':
+            if args.rebuild:
+                db.clear()
+            start = time.perf_counter()
+            counts = import_json(db, args.roots)
+            print(f"✅ 导入 {counts['reports']} 份提取报告、{counts['analyses']} 份结构分析"
+                  f"（失败 {counts['errors']}），耗时 {time.perf_counter() - start:.2f}s → {args.db}")
+        else:
+            rows = db.query(args.sql)
+            if rows:
+                print("\t".join(rows[0].keys()))
+            for row in rows:
+                print("\t".join("" if value is None else str(value) for value in row))
+            print(f"({len(rows)} 行)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+章节清理预算与降级
+个别病态章节（数MB的层层嵌套 span、触发目录清理分支的上千个链接）会让一本书卡上几分钟。
+每个章节的清理都有CPU时间和内存预算，超出时逐级降级：
+
+- full：完整清理（噪声标签/选择器、关键字段落、目录链接、空段落）
+- tags：只剔除噪声标签和选择器命中的元素（一次线性遍历，不汇总子树文本）
+- raw：原样输出，不构建DOM
+
+CPU时间按当前线程计（time.thread_time），在规则引擎的遍历中每隔若干节点检查一次，
+流水线工作线程、渐进式提取的后台线程和工作进程中都有效。
+内存无法按章节精确计量，按标签数估算DOM大小：估算超出预算时不解析，直接原样输出。
+"""
+
+import time
+from typing import Any, Dict, Optional
+
+# 清理层级（写入报告的键）
+TIER_FULL = 'full'
+TIER_TAGS = 'tags'
+TIER_RAW = 'raw'
+CLEANING_TIERS = (TIER_FULL, TIER_TAGS, TIER_RAW)
+
+# html.parser 构建的DOM中每个元素约占用的内存（tracemalloc 实测约600字节）
+BYTES_PER_TAG = 640
+# 遍历中每隔多少个节点检查一次CPU时间
+CHECK_INTERVAL = 256
+
+
+class BudgetExceeded(Exception):
+    """章节清理超出预算；reason 为 'cpu' 或 'memory'"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def estimate_dom_bytes(content: str) -> int:
+    """按标签数估算解析后DOM占用的内存"""
+    return content.count('<') * BYTES_PER_TAG
+
+
+class ChapterBudget:
+    """一个清理层级的CPU时间预算（cpu_ms 为0时不限制）"""
+
+    def __init__(self, cpu_ms: float):
+        self.cpu_ms = cpu_ms
+        self._start = time.thread_time()
+        self._deadline = self._start + cpu_ms / 1000 if cpu_ms else None
+
+    def spent_ms(self) -> float:
+        return (time.thread_time() - self._start) * 1000
+
+    def check(self):
+        """超出预算时抛出 BudgetExceeded"""
+        if self._deadline is not None and time.thread_time() > self._deadline:
+            raise BudgetExceeded('cpu', f"超过 {self.cpu_ms:.0f} ms CPU时间预算")
+
+
+def degradation_record(tier: str, reason: str, spent_ms: float, detail: str) -> Dict[str, Any]:
+    """写入 extracted_files 记录的降级说明"""
+    return {'tier': tier, 'reason': reason, 'cpu_ms': round(spent_ms, 1), 'detail': detail}
+
+
+def budget_from_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """从提取配置中取出章节预算：{'cpu_ms', 'memory_bytes'}（0表示不限制）"""
+    config = config or {}
+    return {
+        'cpu_ms': config.get('chapter_cpu_budget_ms') or 0,
+        'memory_bytes': (config.get('chapter_memory_budget_mb') or 0) * 1024 * 1024,
+    }
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+章节统计
+提取过程中逐章收集计数（文本长度、标签数、链接等）和逐段落的文本长度，
+以 NumPy 数组形式向量化计算整书分布：章节长度分位数、文本/标记比、链接密度和异常章节；
+也可以跨书批量加载各书报告中的统计结果
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import List, Dict, Any
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from bs4 import NavigableString, CData
+
+from chapter_budget import CHECK_INTERVAL
+from paragraphs import PARAGRAPH_TAGS
+
+# 每章收集的计数字段
+CHAPTER_FIELDS = (
+    'index', 'raw_bytes', 'cleaned_bytes', 'text_chars', 'tag_count',
+    'link_count', 'link_text_chars', 'image_count', 'paragraph_count'
+)
+PERCENTILES = (5, 25, 50, 75, 95)
+OUTLIER_Z = 3.5  # 基于中位数绝对偏差的稳健 z 分数阈值
+
+_TEXT_TYPES = (NavigableString, CData)
+_PARAGRAPH_TAG_SET = frozenset(PARAGRAPH_TAGS)
+
+
+def numpy_available() -> bool:
+    return np is not None
+
+
+def _percentiles(values) -> Dict[str, float]:
+    if values.size == 0:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def _safe_ratio(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape, dtype=np.float64),
+                     where=denominator > 0)
+
+
+def count_chapter(cleaned_html: str, soup=None, budget=None) -> Dict[str, Any]:
+    """统计单个章节的计数和各段落文本长度（纯Python，不依赖numpy）
+
+    budget 为章节预算（chapter_budget.ChapterBudget），解析和遍历中定期检查，超出时抛出 BudgetExceeded
+    """
+    if soup is None:
+        from rule_engine import BudgetedSoup
+        soup = BudgetedSoup(cleaned_html, 'html.parser', budget=budget)
+
+    tag_count = 0
+    text_chars = 0
+    link_count = 0
+    link_text_chars = 0
+    image_count = 0
+    paragraph_text_chars = []
+
+    for steps, node in enumerate(soup.descendants, 1):
+        if budget is not None and not steps % CHECK_INTERVAL:
+            budget.check()
+        if isinstance(node, NavigableString):
+            if type(node) in _TEXT_TYPES:
+                text_chars += len(node.strip())
+            continue
+        tag_count += 1
+        name = node.name
+        if name == 'a':
+            link_count += 1
+            link_text_chars += len(node.get_text(strip=True))
+        elif name == 'img':
+            image_count += 1
+        elif name in _PARAGRAPH_TAG_SET and node.find_parent(PARAGRAPH_TAGS) is None:
+            # 与 paragraphs.py 的段落模型一致：嵌套在段落元素中的段落归入外层，不单独计数
+            paragraph_text_chars.append(len(node.get_text(strip=True)))
+
+    return {
+        'cleaned_bytes': len(cleaned_html.encode('utf-8')),
+        'text_chars': text_chars,
+        'tag_count': tag_count,
+        'link_count': link_count,
+        'link_text_chars': link_text_chars,
+        'image_count': image_count,
+        'paragraph_count': len(paragraph_text_chars),
+        'paragraph_text_chars': paragraph_text_chars,
+    }
+
+
+class BookStatsCollector:
+    """单本书的统计收集器：提取时逐章追加，结束时一次性向量化汇总"""
+
+    def __init__(self):
+        if np is None:
+            raise ImportError("章节统计需要 numpy: pip install numpy")
+        self._chapters: Dict[str, List[int]] = {field: [] for field in CHAPTER_FIELDS}
+        # 段落级（节点级）数组：所属章节位置 + 文本长度
+        self._node_chapter: List[int] = []
+        self._node_text_chars: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._chapters['index'])
+
+    def add_chapter(self, index: int, raw_bytes: int, cleaned_html: str, soup=None):
+        """追加一个已提取章节；soup 为清理后的DOM（没有时重新解析 cleaned_html）"""
+        self.add_counts(index, raw_bytes, count_chapter(cleaned_html, soup))
+
+    def add_counts(self, index: int, raw_bytes: int, counts: Dict[str, Any]):
+        """追加 count_chapter 的结果（计数可以在其他进程中完成）"""
+        position = len(self)
+        values = dict(counts, index=index, raw_bytes=raw_bytes)
+        for field in CHAPTER_FIELDS:
+            self._chapters[field].append(values[field])
+        self._node_chapter.extend([position] * len(counts['paragraph_text_chars']))
+        self._node_text_chars.extend(counts['paragraph_text_chars'])
+
+    def arrays(self) -> Dict[str, Any]:
+        """返回章节级和段落级计数数组（按章节索引排序，章节可以乱序追加）"""
+        arrays = {field: np.asarray(values, dtype=np.int64) for field, values in self._chapters.items()}
+        arrays['node_chapter'] = np.asarray(self._node_chapter, dtype=np.int64)
+        arrays['node_text_chars'] = np.asarray(self._node_text_chars, dtype=np.int64)
+
+        order = np.argsort(arrays['index'], kind='stable')
+        if np.any(order != np.arange(order.size)):
+            for field in CHAPTER_FIELDS:
+                arrays[field] = arrays[field][order]
+            new_position = np.empty_like(order)
+            new_position[order] = np.arange(order.size)
+            node_chapter = new_position[arrays['node_chapter']]
+            node_order = np.argsort(node_chapter, kind='stable')
+            arrays['node_chapter'] = node_chapter[node_order]
+            arrays['node_text_chars'] = arrays['node_text_chars'][node_order]
+        return arrays
+
+    def summarize(self) -> Dict[str, Any]:
+        """向量化计算整书分布，返回可直接写入报告的字典"""
+        a = self.arrays()
+        text = a['text_chars']
+        chapter_count = text.size
+
+        text_to_markup = _safe_ratio(text.astype(np.float64), a['cleaned_bytes'].astype(np.float64))
+        link_density = _safe_ratio(a['link_text_chars'].astype(np.float64), text.astype(np.float64))
+        mean_paragraph_chars = _safe_ratio(
+            np.bincount(a['node_chapter'], weights=a['node_text_chars'], minlength=chapter_count),
+            a['paragraph_count'].astype(np.float64))
+
+        # 异常章节：对数长度的稳健 z 分数（中位数 / MAD）
+        outliers = []
+        if chapter_count >= 3:
+            log_text = np.log1p(text)
+            median = np.median(log_text)
+            mad = np.median(np.abs(log_text - median))
+            if mad > 0:
+                z = 0.6745 * (log_text - median) / mad
+                for position in np.flatnonzero(np.abs(z) > OUTLIER_Z):
+                    outliers.append({
+                        'index': int(a['index'][position]),
+                        'text_chars': int(text[position]),
+                        'z_score': round(float(z[position]), 2),
+                        'reason': '过长' if z[position] > 0 else '过短'
+                    })
+
+        total_text = int(text.sum())
+        total_cleaned = int(a['cleaned_bytes'].sum())
+        return {
+            'chapter_count': int(chapter_count),
+            'paragraph_count': int(a['paragraph_count'].sum()),
+            'total_text_chars': total_text,
+            'chapter_text_chars': _percentiles(text),
+            'paragraph_text_chars': _percentiles(a['node_text_chars']),
+            'text_to_markup_ratio': round(total_text / total_cleaned, 4) if total_cleaned else 0.0,
+            'link_density': round(int(a['link_text_chars'].sum()) / total_text, 4) if total_text else 0.0,
+            'per_chapter': {
+                **{field: a[field].tolist() for field in CHAPTER_FIELDS},
+                'text_to_markup_ratio': np.round(text_to_markup, 4).tolist(),
+                'link_density': np.round(link_density, 4).tolist(),
+                'mean_paragraph_chars': np.round(mean_paragraph_chars, 1).tolist(),
+            },
+            'outliers': outliers
+        }
+
+
+def summarize_lengths(lengths: List[int]) -> Dict[str, Any]:
+    """对一组长度做分位数汇总（结构分析器使用）"""
+    if np is None:
+        return {}
+    values = np.asarray(lengths, dtype=np.int64)
+    return {
+        'count': int(values.size),
+        'total': int(values.sum()),
+        'percentiles': _percentiles(values),
+    }
+
+
+# 跨书查询时每本书提取的指标
+BOOK_METRICS = (
+    'chapter_count', 'paragraph_count', 'total_text_chars',
+    'text_to_markup_ratio', 'link_density', 'outlier_count', 'p50_chapter_chars'
+)
+
+
+def load_catalogue_stats(root: str) -> Dict[str, Any]:
+    """扫描目录下所有 extraction_report.json，把各书统计合并成按列存放的数组
+
+    返回 {'books': [书名...], 指标名: ndarray, 'chapter_book': ndarray, 'chapter_text_chars': ndarray, ...}
+    """
+    if np is None:
+        raise ImportError("章节统计需要 numpy: pip install numpy")
+
+    books = []
+    rows = {metric: [] for metric in BOOK_METRICS}
+    chapter_book = []
+    chapter_columns = {'text_chars': [], 'link_density': [], 'text_to_markup_ratio': []}
+
+    for report_path in sorted(Path(root).rglob('extraction_report.json')):
+        with open(report_path, 'r', encoding='utf-8') as f:
+            stats = json.load(f).get('statistics')
+        if not stats:
+            continue
+
+        book_position = len(books)
+        books.append(report_path.parent.name)
+        rows['chapter_count'].append(stats['chapter_count'])
+        rows['paragraph_count'].append(stats['paragraph_count'])
+        rows['total_text_chars'].append(stats['total_text_chars'])
+        rows['text_to_markup_ratio'].append(stats['text_to_markup_ratio'])
+        rows['link_density'].append(stats['link_density'])
+        rows['outlier_count'].append(len(stats['outliers']))
+        rows['p50_chapter_chars'].append(stats['chapter_text_chars']['p50'])
+
+        per_chapter = stats['per_chapter']
+        chapter_book.extend([book_position] * len(per_chapter['index']))
+        for column in chapter_columns:
+            chapter_columns[column].extend(per_chapter[column])
+
+    catalogue = {'books': books}
+    for metric, values in rows.items():
+        catalogue[metric] = np.asarray(values, dtype=np.float64)
+    catalogue['chapter_book'] = np.asarray(chapter_book, dtype=np.int64)
+    for column, values in chapter_columns.items():
+        catalogue[f'chapter_{column}'] = np.asarray(values, dtype=np.float64)
+    return catalogue
+
+
+def main():
+    parser = argparse.ArgumentParser(description='跨书查询章节统计')
+    parser.add_argument('root', nargs='?', default='extracted_html', help='提取输出根目录')
+    parser.add_argument('--sort', choices=BOOK_METRICS, default='link_density', help='排序指标')
+    parser.add_argument('--top', type=int, default=20, help='显示前N本书')
+    parser.add_argument('--ascending', action='store_true', help='升序排列')
+    args = parser.parse_args()
+
+    catalogue = load_catalogue_stats(args.root)
+    if not catalogue['books']:
+        print("未找到包含统计信息的提取报告")
+        return
+
+    order = np.argsort(catalogue[args.sort], kind='stable')
+    if not args.ascending:
+        order = order[::-1]
+
+    print(f"共 {len(catalogue['books'])} 本书, {catalogue['chapter_book'].size} 个章节, 按 {args.sort} 排序:")
+    print(f"{'书名':30s} " + " ".join(f"{metric:>20s}" for metric in BOOK_METRICS))
+    for position in order[:args.top]:
+        values = " ".join(f"{catalogue[metric][position]:20.4g}" for metric in BOOK_METRICS)
+        print(f"{catalogue['books'][position][:30]:30s} {values}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+章节存储
+提取时把一本书的清理版HTML拼接成单个二进制文件，并生成章节/段落偏移表；
+读取时通过 mmap 映射该文件，章节和段落均以 memoryview 切片返回，无需解码或复制
+"""
+
+import json
+import mmap
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Union
+
+from paragraphs import find_paragraph_spans
+
+STORE_BLOB_NAME = "chapters.bin"
+STORE_INDEX_NAME = "chapters_index.json"
+STORE_VERSION = 1
+
+
+class ChapterStoreWriter:
+    """在提取过程中收集章节内容，最后一次性写出存储文件和偏移表"""
+
+    def __init__(self, encoding: str = "utf-8"):
+        self.encoding = encoding
+        self._chunks: List[bytes] = []
+        self._chapters: List[Dict[str, Any]] = []
+        self._offset = 0
+
+    def add_chapter(self, index: int, output_name: str, html: str):
+        """追加一个章节（按spine顺序调用）"""
+        data = html.encode(self.encoding)
+        paragraph_offsets = []
+        for start, end in find_paragraph_spans(data):
+            paragraph_offsets.extend((start, end))
+
+        self._chapters.append({
+            'index': index,
+            'output_name': output_name,
+            'offset': self._offset,
+            'length': len(data),
+            'paragraph_offsets': paragraph_offsets
+        })
+        self._chunks.append(data)
+        self._offset += len(data)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._offset
+
+    def build_index(self) -> Dict[str, Any]:
+        """生成偏移表（段落偏移为相对章节起点的扁平 [start, end, ...] 列表）"""
+        return {
+            'version': STORE_VERSION,
+            'blob': STORE_BLOB_NAME,
+            'encoding': self.encoding,
+            'size_bytes': self._offset,
+            'chapters': self._chapters
+        }
+
+    def write(self, book_dir: Union[str, Path]) -> Dict[str, Any]:
+        """写出存储文件和偏移表，返回用于提取报告的摘要"""
+        book_dir = Path(book_dir)
+        blob_path = book_dir / STORE_BLOB_NAME
+        index_path = book_dir / STORE_INDEX_NAME
+
+        with open(blob_path, 'wb') as f:
+            for chunk in self._chunks:
+                f.write(chunk)
+        with open(index_path, 'w', encoding='utf-8') as f:
+            json.dump(self.build_index(), f, ensure_ascii=False)
+
+        return {
+            'blob_path': str(blob_path),
+            'index_path': str(index_path),
+            'total_chapters': len(self._chapters),
+            'size_bytes': self._offset
+        }
+
+    @classmethod
+    def from_extraction_output(cls, book_dir: Union[str, Path]) -> 'ChapterStoreWriter':
+        """根据已有的提取结果（extraction_report.json + cleaned_html）补建章节存储"""
+        book_dir = Path(book_dir)
+        with open(book_dir / 'extraction_report.json', 'r', encoding='utf-8') as f:
+            report = json.load(f)
+
+        writer = cls()
+        for entry in report.get('extracted_files', []):
+            cleaned_path = book_dir / 'cleaned_html' / entry['output_name']
+            with open(cleaned_path, 'r', encoding='utf-8') as f:
+                writer.add_chapter(entry['index'], entry['output_name'], f.read())
+        return writer
+
+
+class ChapterStore:
+    """只读章节存储：mmap 映射整书文件，按偏移表返回零拷贝切片
+
+    返回的 memoryview 在 close() 之前必须全部释放，否则 mmap 无法关闭。
+    """
+
+    def __init__(self, book_dir: Union[str, Path]):
+        self.book_dir = Path(book_dir)
+        with open(self.book_dir / STORE_INDEX_NAME, 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+
+        if self.index.get('version') != STORE_VERSION:
+            raise ValueError(f"不支持的章节存储版本: {self.index.get('version')}")
+
+        self.encoding = self.index.get('encoding', 'utf-8')
+        self.chapters: List[Dict[str, Any]] = self.index['chapters']
+        self._by_name = {chapter['output_name']: pos for pos, chapter in enumerate(self.chapters)}
+
+        self._file = open(self.book_dir / self.index['blob'], 'rb')
+        if self.index['size_bytes'] > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        else:
+            # 空文件无法 mmap
+            self._mmap = None
+            self._view = memoryview(b"")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    def close(self):
+        """释放映射和文件句柄"""
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _resolve(self, chapter: Union[int, str]) -> Dict[str, Any]:
+        """按位置（第几个已提取章节）或输出文件名定位章节"""
+        if isinstance(chapter, str):
+            if chapter not in self._by_name:
+                raise KeyError(f"章节不存在: {chapter}")
+            return self.chapters[self._by_name[chapter]]
+        return self.chapters[chapter]
+
+    def get_chapter(self, chapter: Union[int, str]) -> memoryview:
+        """返回整个章节的 memoryview"""
+        entry = self._resolve(chapter)
+        start = entry['offset']
+        return self._view[start:start + entry['length']]
+
+    def paragraph_count(self, chapter: Union[int, str]) -> int:
+        """返回章节中的段落数"""
+        return len(self._resolve(chapter)['paragraph_offsets']) // 2
+
+    def get_paragraphs(self, chapter: Union[int, str], start: int, end: Optional[int] = None) -> memoryview:
+        """返回第 start 到 end-1 段（含两段之间的原始标记）的连续 memoryview"""
+        entry = self._resolve(chapter)
+        offsets = entry['paragraph_offsets']
+        count = len(offsets) // 2
+        if end is None:
+            end = start + 1
+        if not 0 <= start < end <= count:
+            raise IndexError(f"段落范围越界: [{start}, {end})，共 {count} 段")
+
+        base = entry['offset']
+        return self._view[base + offsets[2 * start]:base + offsets[2 * end - 1]]
+
+    def decode_chapter(self, chapter: Union[int, str]) -> str:
+        """需要字符串时的便捷方法（会产生解码和复制）"""
+        return str(self.get_chapter(chapter), self.encoding)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+断点续跑日志
+批量提取时以追加方式记录每本书（按EPUB内容哈希）和每个章节的进度，每行一个JSON事件：
+
+    {"event": "book_started",  "sha256": ..., "epub": ...}
+    {"event": "chapter_done",  "sha256": ..., "index": 3, "file_name": ...}
+    {"event": "book_done",     "sha256": ..., "fingerprint": ..., "report": ..., "chapters": 18}
+    {"event": "book_failed",   "sha256": ..., "reason": ...}
+
+重启时回放日志：已完成且规则指纹一致、报告仍存在且状态为 complete 的书直接复用；开始但未完成的书重新排队。
+进程崩溃时最后一行可能只写了一半，回放时忽略。
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+
+JOURNAL_NAME = "extraction_journal.jsonl"
+
+
+def report_complete(report_path: Union[str, Path]) -> bool:
+    """报告存在且状态为 complete（渐进式提取中断时报告停留在 in_progress；没有 status 的旧报告只在提取完成时写出）"""
+    try:
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return report.get('extraction_summary', {}).get('status', 'complete') == 'complete'
+
+
+class CheckpointJournal:
+    """追加写入的进度日志"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.completed: Dict[str, Dict[str, Any]] = {}   # sha256 -> book_done 事件
+        self.in_flight: Dict[str, Dict[str, Any]] = {}   # sha256 -> {'epub', 'chapters': set}
+        self.failed: Dict[str, Dict[str, Any]] = {}      # sha256 -> book_failed 事件
+        self.reports: Dict[str, Dict[str, Any]] = {}     # 报告路径 -> 最近一次写到这里的 book_done 事件
+        self.corrupt_lines = 0
+        self._lock = threading.Lock()
+        self._replay()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        needs_newline = False
+        if self.path.exists() and self.path.stat().st_size > 0:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if needs_newline:
+            # 上次崩溃留下的半行单独成行，不会和新事件粘在一起
+            self._file.write("\n")
+
+    def _replay(self):
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    self.corrupt_lines += 1
+                    continue
+                self._apply(event)
+
+    def _apply(self, event: Dict[str, Any]):
+        digest = event.get('sha256')
+        kind = event.get('event')
+        if kind == 'book_started':
+            self.in_flight[digest] = {'epub': event.get('epub'), 'chapters': set()}
+        elif kind == 'chapter_done':
+            if digest in self.in_flight:
+                self.in_flight[digest]['chapters'].add(event.get('index'))
+        elif kind == 'book_done':
+            self.in_flight.pop(digest, None)
+            self.failed.pop(digest, None)
+            self.completed[digest] = event
+            self.reports[event.get('report', '')] = event
+        elif kind == 'book_failed':
+            self.in_flight.pop(digest, None)
+            self.failed[digest] = event
+
+    def _append(self, event: Dict[str, Any], sync: bool = False):
+        event['time'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self._apply(event)
+
+    def book_started(self, digest: str, epub_path: str):
+        self._append({'event': 'book_started', 'sha256': digest, 'epub': str(epub_path)})
+
+    def chapter_done(self, digest: str, index: int, file_name: str):
+        self._append({'event': 'chapter_done', 'sha256': digest, 'index': index, 'file_name': file_name})
+
+    def book_done(self, digest: str, fingerprint: str, report_path: str, chapters: int, skipped: int):
+        self._append({
+            'event': 'book_done', 'sha256': digest, 'fingerprint': fingerprint,
+            'report': str(report_path), 'chapters': chapters, 'skipped': skipped
+        }, sync=True)
+
+    def book_failed(self, digest: str, reason: str):
+        self._append({'event': 'book_failed', 'sha256': digest, 'reason': reason}, sync=True)
+
+    def reusable(self, digest: str, fingerprint: str,
+                 report_path: Optional[Union[str, Path]] = None) -> Optional[Dict[str, Any]]:
+        """已完成、规则指纹一致且报告仍存在并且状态为 complete 时返回 book_done 事件
+
+        指定 report_path 时只认最近一次写到该路径的结果（同一内容以不同文件名出现时各有各的输出目录）
+        """
+        if report_path is None:
+            done = self.completed.get(digest)
+        else:
+            done = self.reports.get(str(report_path))
+            if done and done.get('sha256') != digest:
+                return None
+        if done and done.get('fingerprint') == fingerprint and report_complete(done.get('report', '')):
+            return done
+        return None
+
+    def interrupted_chapters(self, digest: str) -> int:
+        """上次中断时这本书已完成的章节数（0表示没有中断记录）"""
+        entry = self.in_flight.get(digest)
+        return len(entry['chapters']) if entry else 0
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
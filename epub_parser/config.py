@@ -67,6 +67,46 @@ NOISE_HTML_TAGS = [
     "object",  # 对象元素
 ]
 
+# 段落级关键字过滤：这些块级标签的文本包含噪声关键字时整块剔除
+NOISE_BLOCK_TAGS = ["p", "div", "h1", "h2", "h3", "h4", "h5", "h6"]
+
+# 版权信息关键字（小写匹配；出版社特有的关键字放在下面的规则配置档中）
+COPYRIGHT_KEYWORDS = ["copyright", "版权", "isbn", "imprint"]
+
+# 目录标题：块文本恰好等于这些词，或标题标签中包含 "contents" 时剔除
+TOC_TITLE_KEYWORDS = ["contents", "目录", "table of contents"]
+
+# 目录链接关键字：页面链接数超过阈值时，剔除链接文本包含这些词的段落
+TOC_LINK_KEYWORDS = ["table of contents", "contents", "目录", "index"]
+TOC_LINK_THRESHOLD = 10
+
+# 清理后为空（无文本且无图片）时剔除的标签
+EMPTY_REMOVABLE_TAGS = ["p", "div"]
+
+# 规则配置档：按出版社、制作工具在上面的全局规则上增删（见 rule_profiles.py）
+# match 中每类信号有一项命中计1分，达到 min_score（默认1）即选中；多个配置档命中时按这里的顺序叠加
+# add / remove 的键：noise_tags、css_selectors、noise_titles、block_tags、copyright_keywords、
+# toc_title_keywords、toc_link_keywords、empty_tags；set 覆盖 toc_link_threshold
+RULE_PROFILES = {
+    "calibre": {
+        "description": "calibre 转换的书：MOBI分页标记和calibre生成的内嵌目录",
+        "match": {
+            "generator": ["calibre"],
+            "file_names": [r"^index_split_\d+\.x?html?$"],
+            "css_classes": [r"calibre\d*"],
+        },
+        "add": {"css_selectors": [".mbp_pagebreak", "#calibre_generated_inline_toc"]},
+    },
+    "penguin": {
+        "description": "企鹅兰登旗下品牌（Penguin、Viking、Vintage等）：版权页只有品牌名，正文中极少出现",
+        "match": {
+            "publisher": ["penguin", "viking", "random house", "vintage", "windmill"],
+            "isbn_prefixes": ["978014", "9780670", "978009", "9780241", "9780525", "97807352"],
+        },
+        "add": {"copyright_keywords": ["penguin", "viking"]},
+    },
+}
+
 # 空白页面判定阈值
 MIN_TEXT_LENGTH = 50  # 正文最小字符数
 MIN_MEANINGFUL_TAGS = 2  # 最小有意义标签数（p, div, h1-h6等）
@@ -78,6 +118,41 @@ DEFAULT_CONFIG = {
     "keep_cover": True,  # 保留封面页
     "min_text_length": MIN_TEXT_LENGTH,  # 最小文本长度
     "verbose": False,  # 详细日志
+    "build_chapter_store": True,  # 生成整书章节存储（chapters.bin + 偏移表）
+    "noise_index_path": None,  # 近似重复噪声页面索引（noise_index.py build 生成）
+    "noise_similarity_threshold": 0.8,  # 与已知噪声页面的相似度阈值
+    "collect_statistics": True,  # 计算章节统计分布（需要numpy）
+    "pipeline": False,  # 读取/清理/写出分阶段流水线
+    "pipeline_workers": 1,  # 清理阶段的工作进程数（1为单线程，0为CPU核数）
+    "pipeline_queue_size": 8,  # 阶段之间的队列容量
+    "atomic_output": True,  # 输出先写入临时目录，完成后整体改名提交
+    "output_fsync": "none",  # fsync策略：none / commit（提交时统一fsync）/ always（每个文件）
+    "output_batch_bytes": 4 * 1024 * 1024,  # 小文件缓存到该大小后集中写出
+    "reader_bundle": False,  # 生成阅读端章节包（压缩HTML、段落JSON及gzip/brotli版本）
+    "reader_bundle_gzip_level": 9,  # 章节包gzip压缩级别
+    "reader_bundle_brotli_quality": 11,  # 章节包brotli压缩质量（需要brotli库）
+    "reader_bundle_bandwidth_kbps": 1600,  # 报告中估算传输耗时使用的带宽
+    "export_images": False,  # 导出章节引用的图片并改写引用路径
+    "image_workers": 0,  # 图片转码进程数（0为CPU核数，1为在主进程中转码）
+    "image_cache_dir": None,  # 图片转码缓存目录（默认为输出目录下的 .image_cache）
+    "image_webp_quality": 80,  # WebP质量
+    "image_variants": {"full": 1600, "thumb": 320},  # WebP变体：名称 -> 最长边像素（不放大）
+    "archive_max_total_bytes": 1024 * 1024 * 1024,  # EPUB压缩包解压后的总大小上限
+    "archive_max_member_bytes": 128 * 1024 * 1024,  # 单个条目解压后的大小上限
+    "archive_max_ratio": 200,  # 单个条目压缩比上限（小于1MB的条目不检查）
+    "archive_max_entries": 10000,  # 条目数上限
+    "archive_max_depth": 32,  # 条目路径层级上限
+    "chapter_cpu_budget_ms": 5000,  # 单个章节清理的CPU时间预算，超出时降级（0为不限制）
+    "chapter_memory_budget_mb": 256,  # 单个章节DOM的估算内存预算，超出时原样输出（0为不限制）
+    "llm_chunks": False,  # 生成LLM分块和带token数的分段缓存（llm/）
+    "llm_chunk_tokens": 512,  # 每个分块的token预算
+    "llm_chunk_overlap": 64,  # 相邻分块的重叠token数
+    "llm_tokenizer": "approx",  # 本地分词器：approx / whitespace / tiktoken:<编码> / <模块>:<函数>
+    "paginate": False,  # 预计算各视口的分页边界（reader/pagination.json）
+    "pagination_profiles": None,  # 分页视口：名称 -> {width, height, font_px, ...}（默认见 pagination.DEFAULT_PROFILES）
+    "nav_index": True,  # 生成导航索引：目录项 -> 输出文件、段落和字符偏移（nav_index.json）
+    "record_log": True,  # 每完成一个章节向 extraction_records.jsonl 追加一行记录
+    "rule_profile": "auto",  # 规则配置档：auto（按书籍指纹自动选择）、default（只用全局规则）或逗号分隔的配置档名
 }
 
 # 有意义的内容标签（用于判断是否为空白页）
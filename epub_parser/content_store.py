@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内容寻址存储
+批量提取时按内容哈希去重：相同的spine文档只解析、清理一次，
+相同的清单资源（CSS、字体、图片等）只保存一份
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Union
+
+
+def hash_bytes(data: bytes) -> str:
+    """计算内容哈希（sha256十六进制）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: Union[str, Path], chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件内容哈希"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SharedContentStore:
+    """内容寻址存储
+
+    目录结构:
+        objects/ab/abcdef...      # 按哈希保存的内容对象（原始HTML、清理HTML、资源文件）
+        documents/<key>.json      # 文档处理结果缓存（噪声判定 + 清理结果对象哈希）
+
+    书籍输出目录中的文件以硬链接指向对象，跨文件系统时退化为复制。
+    """
+
+    def __init__(self, root: Union[str, Path], rules_fingerprint: str = ""):
+        self.root = Path(root)
+        self.rules_fingerprint = rules_fingerprint
+        self.objects_dir = self.root / "objects"
+        self.documents_dir = self.root / "documents"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.documents_dir.mkdir(parents=True, exist_ok=True)
+
+        # 本次运行内的文档结果缓存，避免重复读盘
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def has_object(self, digest: str) -> bool:
+        return self.object_path(digest).exists()
+
+    def put_object(self, data: bytes, digest: Optional[str] = None) -> Tuple[str, bool]:
+        """保存内容对象，返回 (哈希, 是否已存在)"""
+        digest = digest or hash_bytes(data)
+        path = self.object_path(digest)
+        if path.exists():
+            return digest, True
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return digest, False
+
+    def read_text(self, digest: str, encoding: str = 'utf-8') -> str:
+        with open(self.object_path(digest), 'r', encoding=encoding) as f:
+            return f.read()
+
+    def materialize(self, digest: str, dest_path: Union[str, Path]):
+        """把对象放到书籍输出目录（优先硬链接）"""
+        dest_path = Path(dest_path)
+        if dest_path.exists() or dest_path.is_symlink():
+            dest_path.unlink()
+        try:
+            os.link(self.object_path(digest), dest_path)
+        except OSError:
+            shutil.copyfile(self.object_path(digest), dest_path)
+
+    def document_key(self, raw_digest: str, variant: str = "") -> str:
+        """文档结果缓存键：原始内容哈希 + 规则指纹 + 与文件名相关的判定变体"""
+        return hash_bytes(f"{raw_digest}|{self.rules_fingerprint}|{variant}".encode('utf-8'))
+
+    def lookup_document(self, key: str) -> Optional[Dict[str, Any]]:
+        """查询文档处理结果，未命中返回None"""
+        with self._lock:
+            if key in self._documents:
+                return self._documents[key]
+
+        path = self.documents_dir / f"{key}.json"
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # 清理结果对象缺失时视为未命中
+        if result.get('cleaned_sha256') and not self.has_object(result['cleaned_sha256']):
+            return None
+
+        with self._lock:
+            self._documents[key] = result
+        return result
+
+    def record_document(self, key: str, result: Dict[str, Any]):
+        """记录文档处理结果"""
+        with self._lock:
+            self._documents[key] = result
+
+        path = self.documents_dir / f"{key}.json"
+        tmp_path = path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EPUB输入源
+提取器和结构分析器除文件路径外还接受内存中的字节、io.BytesIO 或任意可定位（seekable）的二进制文件对象，
+上传服务不必先把EPUB落盘成临时文件。
+
+远程大文件（对象存储、HTTP Range）用 RangeReader 包装成可定位的只读文件对象：
+zip 读取先定位到文件末尾的中央目录，再按偏移读取各条目，RangeReader 按块对齐发起范围请求并缓存最近的块。
+LocalRangeSource 是远程范围读取的本地替身，用于开发和基准测试。
+"""
+
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Optional, Union
+
+EpubSource = Union[str, os.PathLike, bytes, bytearray, memoryview, BinaryIO]
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+DEFAULT_CACHE_BLOCKS = 32
+
+
+def is_path_source(source: Any) -> bool:
+    return isinstance(source, (str, os.PathLike))
+
+
+def open_epub_source(source: EpubSource) -> Union[str, BinaryIO]:
+    """转换成 ebooklib.epub.read_epub 可以接受的参数
+
+    路径原样返回；字节包装成 BytesIO（直接传 bytes 会被 ebooklib 当作路径）；
+    可定位的文件对象原样返回；不可定位的流（管道、socket）先完整读入内存。
+    """
+    if is_path_source(source):
+        return str(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(bytes(source))
+    if not hasattr(source, 'read'):
+        raise TypeError(f"不支持的EPUB输入类型: {type(source).__name__}")
+    if getattr(source, 'seekable', lambda: False)():
+        return source
+    return io.BytesIO(source.read())
+
+
+def default_book_name(source: EpubSource) -> Optional[str]:
+    """从路径或文件对象的 name 属性推断书名（不含扩展名），推断不出时返回None"""
+    if is_path_source(source):
+        return Path(source).stem
+    name = getattr(source, 'name', None)
+    if isinstance(name, str) and name:
+        return Path(name).stem
+    return None
+
+
+def source_label(source: EpubSource, book_name: str) -> str:
+    """报告和日志中显示的来源：路径本身，内存输入显示为 <memory:书名>"""
+    if is_path_source(source):
+        return str(source)
+    if isinstance(source, RangeReader):
+        return f"<range:{source.name or book_name}>"
+    return f"<memory:{book_name}>"
+
+
+class RangeReader(io.RawIOBase):
+    """把范围读取函数包装成可定位的只读文件对象
+
+    fetch(offset, length) 返回 [offset, offset + length) 的字节；size 为对象总长度。
+    读取按 block_size 对齐成范围请求，最近 cache_blocks 个块保存在LRU缓存中，
+    zip 中央目录和相邻的小条目不会重复请求。
+    """
+
+    def __init__(self, fetch: Callable[[int, int], bytes], size: int,
+                 block_size: int = DEFAULT_BLOCK_SIZE, cache_blocks: int = DEFAULT_CACHE_BLOCKS,
+                 name: Optional[str] = None):
+        super().__init__()
+        if size < 0:
+            raise ValueError(f"对象长度不能为负数: {size}")
+        self._fetch = fetch
+        self.size = size
+        self.block_size = block_size
+        self.cache_blocks = max(1, cache_blocks)
+        self.name = name
+        self._position = 0
+        self._blocks: "OrderedDict[int, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes_fetched': 0, 'cache_hits': 0}
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        if position < 0:
+            raise ValueError(f"定位到负偏移: {position}")
+        self._position = position
+        return position
+
+    def _block(self, index: int) -> bytes:
+        block = self._blocks.get(index)
+        if block is not None:
+            self._blocks.move_to_end(index)
+            self.stats['cache_hits'] += 1
+            return block
+        start = index * self.block_size
+        length = min(self.block_size, self.size - start)
+        block = bytes(self._fetch(start, length))
+        if len(block) != length:
+            raise IOError(f"范围读取返回 {len(block)} 字节，期望 {length} 字节（偏移 {start}）")
+        self.stats['requests'] += 1
+        self.stats['bytes_fetched'] += length
+        self._blocks[index] = block
+        if len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        with self._lock:
+            end = min(self._position + len(view), self.size)
+            written = 0
+            while self._position < end:
+                index, offset = divmod(self._position, self.block_size)
+                block = self._block(index)
+                count = min(len(block) - offset, end - self._position)
+                view[written:written + count] = block[offset:offset + count]
+                written += count
+                self._position += count
+            return written
+
+    def readall(self) -> bytes:
+        return self.read(max(0, self.size - self._position))
+
+
+class LocalRangeSource:
+    """远程对象范围读取的本地替身：按偏移读取本地文件，可附加每次请求的固定延迟（模拟网络往返）"""
+
+    def __init__(self, path: Union[str, Path], latency_ms: float = 0.0):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        self.latency_ms = latency_ms
+        self.requests = 0
+
+    def fetch(self, offset: int, length: int) -> bytes:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        self.requests += 1
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def open(self, block_size: int = DEFAULT_BLOCK_SIZE,
+             cache_blocks: int = DEFAULT_CACHE_BLOCKS) -> RangeReader:
+        return RangeReader(self.fetch, self.size, block_size, cache_blocks, name=self.path.name)
+
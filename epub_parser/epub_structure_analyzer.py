@@ -5,24 +5,41 @@ EPUB结构分析器 - 详细分析EPUB文件的完整结构
 用于理解EPUB的组织方式，找到正确的章节识别方法
 """
 
+import argparse
 import json
 import os
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
-try:
-    import ebooklib
-    from ebooklib import epub
-except ImportError:
+from lazy_imports import lazy_import, module_available
+
+if not module_available('ebooklib'):
     print("请安装ebooklib库: pip install EbookLib")
     exit(1)
 
-from bs4 import BeautifulSoup
+# 重量级依赖延迟到首次使用时导入
+ebooklib = lazy_import('ebooklib')
+epub = lazy_import('ebooklib.epub')
+bs4 = lazy_import('bs4')
+chapter_stats = lazy_import('chapter_stats')
+catalogue_db = lazy_import('catalogue_db')
+zip_guard = lazy_import('zip_guard')
+
+from epub_source import EpubSource, is_path_source, open_epub_source, default_book_name, source_label
 
 class EPUBStructureAnalyzer:
-    def __init__(self, epub_path: str):
+    def __init__(self, epub_path: EpubSource, book_name: Optional[str] = None,
+                 archive_limits: Optional[Dict[str, int]] = None):
+        # 与提取器相同，epub_path 也可以是 bytes 或可定位的文件对象
         self.epub_path = epub_path
+        self.book_name = book_name or default_book_name(epub_path) or "book"
+        self.source_label = source_label(epub_path, self.book_name)
         self.book = None
+        # 压缩包资源限制（None 使用 zip_guard.DEFAULT_ARCHIVE_LIMITS）
+        self.archive_limits = archive_limits
+        self.archive_stats = None
+        self.load_error = None
+        self.archive_limited = False
         
     def get_item_type_name(self, item_type):
         """获取项目类型的可读名称"""
@@ -44,11 +61,18 @@ class EPUBStructureAnalyzer:
     def load_epub(self) -> bool:
         """加载EPUB文件"""
         try:
-            print(f"📚 正在加载EPUB文件: {self.epub_path}")
-            self.book = epub.read_epub(self.epub_path)
+            print(f"📚 正在加载EPUB文件: {self.source_label}")
+            self.book, guard = zip_guard.read_epub_guarded(open_epub_source(self.epub_path), self.archive_limits)
+            self.archive_stats = guard.summary()
             print(f"✅ EPUB文件加载成功")
             return True
+        except zip_guard.ArchiveLimitError as e:
+            self.load_error = f"超出压缩包限制 {e.limit}: {e}"
+            self.archive_limited = True
+            print(f"⛔ 跳过EPUB文件: {self.load_error}")
+            return False
         except Exception as e:
+            self.load_error = f"加载失败: {e}"
             print(f"❌ EPUB文件加载失败: {e}")
             return False
     
@@ -231,7 +255,7 @@ class EPUBStructureAnalyzer:
                     if item.get_type() == ebooklib.ITEM_DOCUMENT:
                         try:
                             content = item.get_content().decode('utf-8', errors='ignore')
-                            soup = BeautifulSoup(content, 'html.parser')
+                            soup = bs4.BeautifulSoup(content, 'html.parser')
                             text = soup.get_text().strip()
                             
                             item_info['content_length'] = len(text)
@@ -277,13 +301,13 @@ class EPUBStructureAnalyzer:
                             
                             # 修复：优先使用xml解析器
                             try:
-                                soup = BeautifulSoup(content, 'xml')
+                                soup = bs4.BeautifulSoup(content, 'xml')
                             except:
                                 # 如果没有安装lxml，回退到html.parser
                                 import warnings
                                 from bs4 import XMLParsedAsHTMLWarning
                                 warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
-                                soup = BeautifulSoup(content, 'html.parser')
+                                soup = bs4.BeautifulSoup(content, 'html.parser')
                             
                             nav_elements = soup.find_all('nav')
                             
@@ -318,29 +342,39 @@ class EPUBStructureAnalyzer:
         
         return nav_info
     
-    def generate_full_analysis(self, output_file: str = None) -> Dict[str, Any]:
-        """生成完整的结构分析报告"""
+    def generate_full_analysis(self, output_file: str = None,
+                               catalogue: Optional['catalogue_db.CatalogueDB'] = None) -> Dict[str, Any]:
+        """生成完整的结构分析报告（提供 catalogue 时同时写入SQLite目录索引）"""
         if not self.load_epub():
             return None
         
-        print(f"\n🔍 开始分析EPUB结构: {os.path.basename(self.epub_path)}")
+        file_name = os.path.basename(self.epub_path) if is_path_source(self.epub_path) else f"{self.book_name}.epub"
+        print(f"\n🔍 开始分析EPUB结构: {file_name}")
         
         analysis = {
-            'file_path': self.epub_path,
-            'file_name': os.path.basename(self.epub_path),
+            'file_path': str(self.epub_path) if is_path_source(self.epub_path) else self.source_label,
+            'file_name': file_name,
             'metadata': self.analyze_metadata(),
             'spine': self.analyze_spine(),
             'toc': self.analyze_toc(),
             'guide': self.analyze_guide(),
             'all_items': self.analyze_all_items(),
-            'nav_document': self.analyze_nav_document()
+            'nav_document': self.analyze_nav_document(),
+            'archive': self.archive_stats
         }
         
+        # 文档项目正文长度分布
+        document_lengths = [item['content_length'] for item in analysis['all_items'] if item['is_document']]
+        analysis['statistics'] = {'document_text_chars': chapter_stats.summarize_lengths(document_lengths)}
+        
         if output_file:
             with open(output_file, 'w', encoding='utf-8') as f:
                 json.dump(analysis, f, ensure_ascii=False, indent=2)
             print(f"\n💾 分析报告已保存到: {output_file}")
         
+        if catalogue:
+            catalogue.add_structure_analysis(analysis, output_file)
+        
         print("\n" + "="*60)
         print("✅ 结构分析完成")
         print("="*60)
@@ -349,6 +383,11 @@ class EPUBStructureAnalyzer:
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description='EPUB结构分析器')
+    parser.add_argument('--catalogue-db', help='把分析结果写入SQLite目录索引（catalogue_db.py）')
+    args = parser.parse_args()
+    catalogue = catalogue_db.CatalogueDB(args.catalogue_db) if args.catalogue_db else None
+    
     # 使用相对路径，基于当前脚本所在目录
     script_dir = os.path.dirname(os.path.abspath(__file__))
     epub_dir = os.path.join(script_dir, "epub-files")
@@ -375,16 +414,22 @@ def main():
         
         try:
             analyzer = EPUBStructureAnalyzer(epub_path)
-            analysis = analyzer.generate_full_analysis(output_file)
+            analysis = analyzer.generate_full_analysis(output_file, catalogue)
             
             if analysis:
                 print(f"✅ {epub_file} 分析完成")
+            elif analyzer.archive_limited:
+                print(f"⏭️ {epub_file} 超出压缩包限制，已跳过")
             else:
                 print(f"❌ {epub_file} 分析失败")
                 
         except Exception as e:
             print(f"❌ 分析 {epub_file} 时发生错误: {e}")
     
+    if catalogue:
+        catalogue.close()
+        print(f"🗃️ 已写入目录索引: {args.catalogue_db}")
+    
     print(f"\n🎉 所有文件分析完成!")
     print(f"📁 分析报告保存在: {output_dir}")
 
@@ -7,58 +7,185 @@ EPUB HTML提取器
 """
 
 import os
+import posixpath
 import sys
 import argparse
+import hashlib
 import json
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
-try:
-    import ebooklib
-    from ebooklib import epub
-except ImportError:
+from lazy_imports import lazy_import, module_available
+
+if not module_available('ebooklib'):
     print("请安装ebooklib库: pip install EbookLib")
     exit(1)
 
-from bs4 import BeautifulSoup, Comment
+# 重量级依赖延迟到首次使用时导入（--help、空目录等路径不需要它们）
+ebooklib = lazy_import('ebooklib')
+epub = lazy_import('ebooklib.epub')
+bs4 = lazy_import('bs4')
+socket = lazy_import('socket')
 
 # 导入配置文件
 from config import (
     NOISE_TITLES, NOISE_FILENAMES, NOISE_CSS_SELECTORS, NOISE_HTML_TAGS,
     MEANINGFUL_TAGS, COVER_INDICATORS, MIN_TEXT_LENGTH, MIN_MEANINGFUL_TAGS,
-    DEFAULT_CONFIG
+    NOISE_BLOCK_TAGS, COPYRIGHT_KEYWORDS, TOC_TITLE_KEYWORDS, TOC_LINK_KEYWORDS, TOC_LINK_THRESHOLD,
+    EMPTY_REMOVABLE_TAGS, RULE_PROFILES, DEFAULT_CONFIG
+)
+from content_store import SharedContentStore, hash_bytes, hash_file
+from noise_index import MinHashNoiseIndex, MAX_TEXT_CHARS
+from noise_triage import triage_noise_page, TRIAGE_TIERS, TIER_DOM
+from output_writer import BookOutputWriter, DEFAULT_BATCH_BYTES, FSYNC_POLICIES
+from checkpoint_journal import CheckpointJournal, JOURNAL_NAME
+from sharding import parse_shard, select_shard, summary_name, summary_report_path
+from epub_source import EpubSource, is_path_source, open_epub_source, default_book_name, source_label
+from paragraphs import PARAGRAPH_MODEL_VERSION
+from report_writer import (
+    SpineRecord, TocRecord, SkippedRecord, ExtractedRecord, RecordLog, JSONFileWriter, RECORD_LOG_NAME, write_json_file
+)
+from chapter_budget import (
+    BudgetExceeded, ChapterBudget, CLEANING_TIERS, TIER_FULL, TIER_TAGS, TIER_RAW,
+    budget_from_config, degradation_record, estimate_dom_bytes
 )
 
+chapter_store = lazy_import('chapter_store')
+chapter_stats = lazy_import('chapter_stats')
+pipeline = lazy_import('pipeline')
+catalogue_db = lazy_import('catalogue_db')
+image_assets = lazy_import('image_assets')
+reader_bundle = lazy_import('reader_bundle')
+llm_chunks = lazy_import('llm_chunks')
+pagination = lazy_import('pagination')
+nav_index = lazy_import('nav_index')
+rule_engine = lazy_import('rule_engine')
+rule_profiles = lazy_import('rule_profiles')
+zip_guard = lazy_import('zip_guard')
+
+# 只影响运行方式、不影响输出内容的配置，不计入规则指纹
+_RUNTIME_CONFIG_KEYS = {
+    'verbose', 'pipeline', 'pipeline_workers', 'pipeline_queue_size',
+    'atomic_output', 'output_fsync', 'output_batch_bytes', 'image_workers', 'image_cache_dir',
+    'archive_max_total_bytes', 'archive_max_member_bytes', 'archive_max_ratio', 'archive_max_entries',
+    'archive_max_depth',
+    # 降级的章节不写入共享存储的文档缓存，预算只影响病态章节本次的输出
+    'chapter_cpu_budget_ms', 'chapter_memory_budget_mb'
+}
+
+def compute_rules_fingerprint(config: Dict[str, Any]) -> str:
+    """过滤规则与影响输出的配置的指纹，用于结果缓存失效"""
+    merged = DEFAULT_CONFIG.copy()
+    merged.update(config or {})
+    rules = {
+        'noise_titles': NOISE_TITLES,
+        'noise_filenames': NOISE_FILENAMES,
+        'noise_css_selectors': NOISE_CSS_SELECTORS,
+        'noise_html_tags': NOISE_HTML_TAGS,
+        'noise_block_tags': NOISE_BLOCK_TAGS,
+        'copyright_keywords': COPYRIGHT_KEYWORDS,
+        'toc_title_keywords': TOC_TITLE_KEYWORDS,
+        'toc_link_keywords': TOC_LINK_KEYWORDS,
+        'toc_link_threshold': TOC_LINK_THRESHOLD,
+        'empty_removable_tags': EMPTY_REMOVABLE_TAGS,
+        'rule_profiles': RULE_PROFILES,
+        'meaningful_tags': sorted(MEANINGFUL_TAGS),
+        'cover_indicators': COVER_INDICATORS,
+        'min_meaningful_tags': MIN_MEANINGFUL_TAGS,
+        'paragraph_model': PARAGRAPH_MODEL_VERSION,
+        'config': {k: v for k, v in merged.items() if k not in _RUNTIME_CONFIG_KEYS},
+    }
+    payload = json.dumps(rules, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+def output_dir_name(book_name: str) -> str:
+    """书籍输出目录名：只保留字母数字、空格、连字符和下划线"""
+    return "".join(c for c in book_name if c.isalnum() or c in (' ', '-', '_')).strip()
+
+# 流水线工作进程中的提取器（只用于噪声判定和清理）
+_pipeline_extractor = None
+
+def _pipeline_worker_init(config: Dict[str, Any], noise_index: Optional[MinHashNoiseIndex],
+                          profiles: Tuple[str, ...] = ()):
+    global _pipeline_extractor
+    _pipeline_extractor = EPUBHTMLExtractor("", config=config, noise_index=noise_index)
+    _pipeline_extractor.use_rule_profiles(profiles)
+
+def _pipeline_worker_process(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return _pipeline_extractor._process_document(payload)
+
 class EPUBHTMLExtractor:
-    def __init__(self, epub_path: str, output_dir: str = "extracted_html", config: Dict[str, Any] = None):
-        self.epub_path = Path(epub_path)
+    def __init__(self, epub_path: EpubSource, output_dir: str = "extracted_html", config: Dict[str, Any] = None,
+                 content_store: Optional[SharedContentStore] = None,
+                 noise_index: Optional[MinHashNoiseIndex] = None,
+                 book_name: Optional[str] = None):
+        # epub_path 可以是路径、bytes、io.BytesIO 或可定位的文件对象（见 epub_source.py）；
+        # 内存输入没有文件名时由 book_name 决定输出目录名
+        self.epub_source = epub_path
+        self.epub_path = Path(epub_path) if is_path_source(epub_path) else None
         self.output_dir = Path(output_dir)
         self.book = None
-        self.book_name = self.epub_path.stem
+        self.book_name = book_name or default_book_name(epub_path) or "book"
+        self.source_label = source_label(epub_path, self.book_name)
         self.metadata = {}
         self.spine_info = []
         self.toc_info = []
         self.skipped_files = []  # 记录被跳过的文件
+        self.report = None  # 最近一次完成的提取报告
+        self.load_error = None  # 加载失败的原因
+        self.extraction_error = None  # 渐进式提取的后台线程失败的原因（报告停留在 in_progress）
+        self.archive_limited = False  # 压缩包超出资源限制（记为跳过而不是失败）
+        self.archive_stats = None  # 压缩包检查结果（条目数、声明/实际解压大小）
+        self.content_store = content_store  # 批量运行共享的内容寻址存储（可选）
+        self.dedup_stats = {
+            'documents': {'hits': 0, 'misses': 0},
+            'assets': {'hits': 0, 'misses': 0},
+            'bytes_reused': 0
+        }
+        self.noise_triage_stats = {tier: 0 for tier in TRIAGE_TIERS}  # 各分拣层级解决的页面数
+        self.cleaning_tier_stats = {tier: 0 for tier in CLEANING_TIERS}  # 各清理层级的章节数
         
         # 合并配置
         self.config = DEFAULT_CONFIG.copy()
         if config:
             self.config.update(config)
             
+        # 近似重复噪声页面索引：批量运行时由调用方传入同一个实例
+        self.noise_index = noise_index
+        if self.noise_index is None and self.config.get('noise_index_path'):
+            self.noise_index = MinHashNoiseIndex.load(
+                self.config['noise_index_path'], self.config.get('noise_similarity_threshold', 0.8))
+            
+        # 编译后的清理规则（进程内共享）；开始提取时按书籍指纹换成对应配置档的规则
+        self.rules = rule_engine.get_default_rules()
+        self.rule_profiles = ()
+        self.rule_profile_selection = None
+        self.chapter_budget = budget_from_config(self.config)
+        
         # 设置日志
         log_level = logging.DEBUG if self.config.get('verbose', False) else logging.INFO
         logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s')
         self.logger = logging.getLogger(__name__)
         
     def load_epub(self) -> bool:
-        """加载EPUB文件"""
+        """加载EPUB文件（先检查压缩包的条目数、解压大小和压缩比，见 zip_guard.py）"""
         try:
-            print(f"📚 正在加载EPUB文件: {self.epub_path}")
-            self.book = epub.read_epub(str(self.epub_path))
+            print(f"📚 正在加载EPUB文件: {self.source_label}")
+            self.book, guard = zip_guard.read_epub_guarded(open_epub_source(self.epub_source),
+                                                           zip_guard.limits_from_config(self.config))
+            self.archive_stats = guard.summary()
             print(f"✅ EPUB文件加载成功")
             return True
+        except zip_guard.ArchiveLimitError as e:
+            self.load_error = f"超出压缩包限制 {e.limit}: {e}"
+            self.archive_limited = True
+            print(f"⛔ 跳过EPUB文件: {self.load_error}")
+            return False
         except Exception as e:
+            self.load_error = f"加载失败: {e}"
             print(f"❌ EPUB文件加载失败: {e}")
             return False
     
@@ -93,29 +220,41 @@ class EPUBHTMLExtractor:
     
     def is_noise_page(self, item, content: str = None) -> Tuple[bool, str]:
         """判断是否为噪声页面，返回 (是否为噪声, 跳过原因)"""
+        return self._is_noise_document(item.file_name, content)
+    
+    def _is_noise_document(self, file_name: str, content: str = None) -> Tuple[bool, str]:
+        """按文件名和内容判断噪声页面（不依赖ebooklib条目，可在工作进程中调用）"""
         if not self.config.get('skip_noise_pages', True):
             return False, ""
             
         # 检查文件名
-        file_name = item.file_name.lower()
-        for noise_keyword in NOISE_FILENAMES:
+        file_name = file_name.lower()
+        for noise_keyword in self.rules.noise_filenames:
             if noise_keyword.lower() in file_name:
                 return True, f"文件名包含噪声关键字: {noise_keyword}"
         
         # 如果有内容，进一步检查
         if content:
-            soup = BeautifulSoup(content, 'html.parser')
+            soup = bs4.BeautifulSoup(content, 'html.parser')
             
             # 检查标题
             title_tags = soup.find_all(['h1', 'h2', 'h3', 'title'])
             for tag in title_tags:
                 title_text = tag.get_text(strip=True)
-                for noise_title in NOISE_TITLES:
+                for noise_title in self.rules.noise_titles:
                     if noise_title in title_text:
                         return True, f"标题包含噪声关键字: {noise_title}"
             
-            # 检查是否为空白页
             text_content = soup.get_text(strip=True)
+            
+            # 检查是否与已知噪声页面近似重复
+            if self.noise_index is not None:
+                match = self.noise_index.query(text_content)
+                if match:
+                    entry, similarity = match
+                    return True, f"与已知噪声页面近似重复: {entry['source']} (相似度: {similarity:.2f})"
+            
+            # 检查是否为空白页
             meaningful_tags = soup.find_all(lambda tag: tag.name in MEANINGFUL_TAGS)
             
             if (len(text_content) < self.config.get('min_text_length', MIN_TEXT_LENGTH) and 
@@ -127,7 +266,25 @@ class EPUBHTMLExtractor:
         
         return False, ""
     
-    def _is_cover_page(self, soup: BeautifulSoup, file_name: str) -> bool:
+    def classify_noise_page(self, file_name: str, raw_bytes: bytes, content: str) -> Tuple[bool, str, Optional[str]]:
+        """分层噪声判定：先在原始字节上预分拣，无法确定的页面再完整解析
+        
+        返回 (是否为噪声, 跳过原因, 分拣层级)；未启用噪声过滤时层级为None
+        """
+        if not self.config.get('skip_noise_pages', True):
+            return False, "", None
+        
+        # 启用噪声索引时，可能落入索引比对范围的页面需要DOM文本
+        max_dom_free_text = MAX_TEXT_CHARS if self.noise_index is not None else None
+        is_noise, skip_reason, tier = triage_noise_page(file_name, raw_bytes, self.config, max_dom_free_text,
+                                                        self.rules.noise_filenames, self.rules.noise_titles)
+        if tier == TIER_DOM:
+            is_noise, skip_reason = self._is_noise_document(file_name, content)
+        
+        self.logger.debug(f"噪声分拣: {file_name} -> {tier}")
+        return is_noise, skip_reason, tier
+    
+    def _is_cover_page(self, soup: 'bs4.BeautifulSoup', file_name: str) -> bool:
         """判断是否为封面页"""
         # 检查文件名
         for cover_keyword in COVER_INDICATORS['filenames']:
@@ -151,6 +308,70 @@ class EPUBHTMLExtractor:
         
         return False
     
+    def rules_fingerprint(self) -> str:
+        """当前过滤规则与影响输出的配置的指纹，用于结果缓存失效"""
+        return compute_rules_fingerprint(self.config)
+
+    def use_rule_profiles(self, profiles: Tuple[str, ...]):
+        """换用配置档组合的清理规则（编译结果在进程内缓存）"""
+        self.rule_profiles = profiles
+        self.rules = rule_profiles.compiled_rules(profiles)
+    
+    def select_rule_profiles(self) -> Dict[str, Any]:
+        """按 rule_profile 配置选择规则配置档：auto 时按书籍指纹（generator、出版信息、OPF结构、CSS类名）自动选择"""
+        profiles = rule_profiles.parse_profile_setting(self.config.get('rule_profile', rule_profiles.AUTO))
+        selection = {'mode': 'config', 'signals': {}}
+        if profiles is None:
+            fingerprint = rule_profiles.book_fingerprint(self.book)
+            profiles, signals = rule_profiles.select_profiles(fingerprint)
+            selection = {'mode': 'auto', 'signals': signals,
+                         'fingerprint': {key: fingerprint[key] for key in
+                                         ('epub_version', 'generators', 'publishers', 'isbns', 'has_ncx', 'has_nav')}}
+        self.use_rule_profiles(profiles)
+        self.rule_profile_selection = dict(selection, profile=rule_profiles.profile_key(profiles))
+        return self.rule_profile_selection
+    
+    def _dedup_variant(self, item) -> str:
+        """噪声判定中依赖文件名的部分（封面文件名、命中的噪声文件名关键字）、规则配置档和噪声索引会影响结果，需要纳入缓存键"""
+        file_name = item.file_name.lower()
+        is_cover_name = any(keyword.lower() in file_name for keyword in COVER_INDICATORS['filenames'])
+        variant = 'cover' if is_cover_name else ''
+        # 同样的字节在 chap01.xhtml 和 about.xhtml 下判定不同；跳过原因只取第一个命中的关键字
+        noise_keyword = next((keyword for keyword in self.rules.noise_filenames if keyword.lower() in file_name), None)
+        if noise_keyword is not None:
+            variant += f'!{noise_keyword}'
+        if self.rule_profiles:
+            variant += '@' + rule_profiles.profile_key(self.rule_profiles)
+        # 噪声索引命中的页面判为噪声，索引内容同样影响结果
+        if self.noise_index is not None and self.config.get('skip_noise_pages', True):
+            variant += '#' + self.noise_index.digest()
+        return variant
+    
+    def dedup_assets(self) -> List[Dict[str, Any]]:
+        """把清单中的非文档资源（CSS、字体、图片等）按内容哈希存入共享存储"""
+        assets = []
+        if not self.content_store or not self.book:
+            return assets
+        
+        for item in self.book.get_items():
+            if item.get_type() == ebooklib.ITEM_DOCUMENT:
+                continue
+            data = item.get_content()
+            digest, existed = self.content_store.put_object(data)
+            if existed:
+                self.dedup_stats['assets']['hits'] += 1
+                self.dedup_stats['bytes_reused'] += len(data)
+            else:
+                self.dedup_stats['assets']['misses'] += 1
+            assets.append({
+                'file_name': item.file_name,
+                'media_type': item.media_type,
+                'sha256': digest,
+                'size_bytes': len(data),
+                'dedup_hit': existed
+            })
+        return assets
+    
     def extract_spine_info(self):
         """提取spine信息（阅读顺序）"""
         self.spine_info = []
@@ -159,218 +380,643 @@ class EPUBHTMLExtractor:
         for idx, (item_id, linear) in enumerate(self.book.spine):
             item = self.book.get_item_with_id(item_id)
             if item and item.get_type() == ebooklib.ITEM_DOCUMENT:
-                spine_item = {
-                    'index': idx,
-                    'item_id': item_id,
-                    'file_name': item.file_name,
-                    'linear': linear,
-                    'media_type': item.media_type
-                }
+                spine_item = SpineRecord(
+                    index=idx,
+                    item_id=item_id,
+                    file_name=item.file_name,
+                    linear=linear,
+                    media_type=item.media_type
+                )
                 self.spine_info.append(spine_item)
                 print(f"  [{idx:02d}] {item.file_name} (linear: {linear})")
         
         print(f"\n共找到 {len(self.spine_info)} 个文档项目")
     
     def extract_toc_info(self):
-        """提取目录信息"""
-        self.toc_info = []
-        
-        def process_toc_item(item, level=0):
-            if hasattr(item, 'title') and hasattr(item, 'href'):
-                self.toc_info.append({
-                    'title': item.title,
-                    'href': item.href,
-                    'level': level
-                })
-            
-            # 处理子项目
-            if hasattr(item, '__iter__') and not isinstance(item, str):
-                for sub_item in item:
-                    if hasattr(sub_item, 'title'):
-                        process_toc_item(sub_item, level + 1)
-        
+        """提取目录信息（含 (Section, 子项) 形式的嵌套目录）"""
         print("\n提取目录信息:")
-        for item in self.book.toc:
-            process_toc_item(item)
+        self.toc_info = [TocRecord(**entry) for entry in nav_index.flatten_toc(self.book.toc)]
         
         print(f"共找到 {len(self.toc_info)} 个目录项")
     
     def clean_html_content(self, content: str) -> str:
         """清理HTML内容，移除不必要的元素但保持结构"""
-        soup = BeautifulSoup(content, 'html.parser')
+        return str(self.clean_html_soup(content))
+    
+    def clean_html_soup(self, content: str) -> 'bs4.BeautifulSoup':
+        """清理HTML内容并返回清理后的DOM（供统计等后续阶段复用，避免重复解析）
         
-        # 根据配置决定是否移除注释
-        if not self.config.get('preserve_comments', True):
-            comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-            for comment in comments:
-                comment.extract()
+        全部规则（噪声标签、CSS选择器、关键字段落、目录链接、空段落）由 rule_engine 在一次遍历中完成
+        """
+        soup = bs4.BeautifulSoup(content, 'html.parser')
+        rule_engine.clean_soup(soup, self.rules, remove_comments=not self.config.get('preserve_comments', True),
+                   logger=self.logger)
+        return soup
+    
+    def clean_with_budget(self, content: str, anchors: Optional['nav_index.AnchorTracker'] = None,
+                          statistics: bool = False
+                          ) -> Tuple[str, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """按章节预算清理，返回 (清理后内容, 章节统计计数, 降级说明)
         
-        # 移除噪声HTML标签
-        for tag_name in NOISE_HTML_TAGS:
-            for tag in soup.find_all(tag_name):
-                self.logger.debug(f"移除噪声标签: {tag_name}")
-                tag.decompose()
+        解析、清理、序列化和统计计数（statistics 为True时，见 chapter_stats.count_chapter）共用一份预算，
+        超出时依次降级为只剔除噪声元素（tags）和原样输出（raw），见 chapter_budget.py；
+        未降级时降级说明为None，原样输出时没有统计计数。anchors 只在完整清理中记录，降级时其内容不可用
+        """
+        remove_comments = not self.config.get('preserve_comments', True)
+        estimated = estimate_dom_bytes(content)
+        memory_budget = self.chapter_budget['memory_bytes']
+        if memory_budget and estimated > memory_budget:
+            return content, None, degradation_record(
+                TIER_RAW, 'memory', 0.0,
+                f"估算DOM约 {estimated / 1024 / 1024:.0f} MB，超过预算 {memory_budget / 1024 / 1024:.0f} MB")
         
-        # 移除噪声CSS选择器匹配的元素
-        for selector in NOISE_CSS_SELECTORS:
+        def finish(soup, budget):
+            # 序列化不能中途打断，完成后检查一次；统计计数在遍历中检查
+            cleaned = str(soup)
+            budget.check()
+            return cleaned, chapter_stats.count_chapter(cleaned, soup, budget) if statistics else None
+        
+        budget = ChapterBudget(self.chapter_budget['cpu_ms'])
+        try:
             try:
-                for element in soup.select(selector):
-                    self.logger.debug(f"移除噪声元素: {selector}")
-                    element.decompose()
-            except Exception as e:
-                self.logger.warning(f"CSS选择器 {selector} 解析失败: {e}")
-        
-        # 移除包含噪声关键词的段落
-        for p in soup.find_all(['p', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            text = p.get_text(strip=True)
-            if text:
-                # 检查是否包含噪声标题关键词
-                for noise_title in NOISE_TITLES:
-                    if noise_title.lower() in text.lower():
-                        self.logger.debug(f"移除噪声内容段落: {text[:50]}...")
-                        p.decompose()
-                        break
-                else:
-                    # 检查版权信息
-                    if any(keyword in text.lower() for keyword in ['copyright', '版权', 'isbn', 'penguin', 'viking', 'imprint']):
-                        self.logger.debug(f"移除版权信息段落: {text[:50]}...")
-                        p.decompose()
-                    # 检查目录链接
-                    elif text.lower().strip() in ['contents', '目录', 'table of contents'] or \
-                         (p.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6'] and 'contents' in text.lower()):
-                        self.logger.debug(f"移除目录标题: {text}")
-                        p.decompose()
-        
-        # 移除目录链接段落（更精确的识别）
-        # 只在整个页面包含大量链接时才考虑删除目录
-        all_links = soup.find_all('a')
-        if len(all_links) > 10:  # 只有当页面包含很多链接时才进行目录清理
-            for p in soup.find_all('p'):
-                links = p.find_all('a')
-                if len(links) >= 1:  # 检查单个链接段落
-                    link_texts = [a.get_text(strip=True) for a in links]
-                    # 更严格的目录识别：必须包含明确的目录关键词
-                    if any(any(keyword in link_text.lower() for keyword in ['table of contents', 'contents', '目录', 'index']) 
-                           for link_text in link_texts):
-                        self.logger.debug(f"移除目录链接段落: {p.get_text(strip=True)[:50]}...")
-                        p.decompose()
-        
-        # 移除空的段落和div（但保留有图片的）
-        for tag in soup.find_all(['p', 'div']):
-            if not tag.get_text(strip=True) and not tag.find('img'):
-                tag.decompose()
-        
-        return str(soup)
-    
-    def extract_all_html_files(self):
-        """提取所有HTML文件，生成未清理和清理版本"""
-        if not self.spine_info:
-            print("错误：未找到spine信息")
-            return False
+                soup = rule_engine.BudgetedSoup(content, 'html.parser', budget=budget)
+            except BudgetExceeded as e:
+                # 解析中途超出预算时没有可用的DOM，直接原样输出
+                return content, None, degradation_record(TIER_RAW, 'cpu', budget.spent_ms(), f"解析时{e}")
+            try:
+                rule_engine.clean_soup(soup, self.rules, remove_comments=remove_comments,
+                                       logger=self.logger, budget=budget, anchors=anchors)
+                return (*finish(soup, budget), None)
+            except BudgetExceeded as e:
+                spent_ms, detail = budget.spent_ms(), f"完整清理时{e}"
+            
+            # 在同一个DOM上继续：完整清理中途已剔除的噪声元素不必重做，降级清理另有一份同样的预算
+            fallback = ChapterBudget(self.chapter_budget['cpu_ms'])
+            try:
+                rule_engine.strip_noise_elements(soup, self.rules, remove_comments=remove_comments, budget=fallback)
+                return (*finish(soup, fallback),
+                        degradation_record(TIER_TAGS, 'cpu', spent_ms + fallback.spent_ms(), detail))
+            except BudgetExceeded as e:
+                return content, None, degradation_record(TIER_RAW, 'cpu', spent_ms + fallback.spent_ms(),
+                                                         f"{detail}，只剔除噪声元素时{e}")
+        except RecursionError:
+            # 嵌套过深时 BeautifulSoup 的序列化和比较会超出递归深度
+            return content, None, degradation_record(TIER_RAW, 'depth', budget.spent_ms(), "元素嵌套过深")
+    
+    def _prepare_output_dirs(self, atomic: bool = True):
+        """创建本书的输出目录（使用书名作为目录名：EPUB文件名或传入的 book_name）
         
-        # 使用EPUB文件名作为输出目录
-        epub_name = self.epub_path.stem
-        safe_name = "".join(c for c in epub_name if c.isalnum() or c in (' ', '-', '_')).strip()
-        base_output_path = self.output_dir / safe_name
+        atomic 为True时输出先写入临时目录，提交时整体改名；渐进式提取需要立即可见，直接写最终目录
+        """
+        self.base_output_path = self.output_dir / output_dir_name(self.book_name)
         
-        # 创建未清理和清理版本的输出目录
-        raw_output_path = base_output_path / "raw_html"
-        cleaned_output_path = base_output_path / "cleaned_html"
-        raw_output_path.mkdir(parents=True, exist_ok=True)
-        cleaned_output_path.mkdir(parents=True, exist_ok=True)
+        # 报告中记录的是最终路径
+        self.raw_output_path = self.base_output_path / "raw_html"
+        self.cleaned_output_path = self.base_output_path / "cleaned_html"
+        
+        self._output = BookOutputWriter(
+            self.base_output_path,
+            fsync=self.config.get('output_fsync', 'none'),
+            batch_bytes=self.config.get('output_batch_bytes', DEFAULT_BATCH_BYTES),
+            atomic=atomic and self.config.get('atomic_output', True))
+        self._output.makedirs("raw_html")
+        self._output.makedirs("cleaned_html")
+        # extracted_files 记录共享的输出目录（记录中的完整路径由它和文件名拼出）
+        self._record_directories = (str(self.raw_output_path), str(self.cleaned_output_path))
+    
+    def _begin_extraction(self, progressive: bool = False):
+        """初始化一次提取运行的状态"""
+        self._prepare_output_dirs(atomic=not progressive)
         
         print(f"\n开始提取HTML文件:")
-        print(f"  - 未清理版本: {raw_output_path}")
-        print(f"  - 清理版本: {cleaned_output_path}")
+        print(f"  - 未清理版本: {self.raw_output_path}")
+        print(f"  - 清理版本: {self.cleaned_output_path}")
         if self.config.get('skip_noise_pages', True):
             print("  - 启用噪声页面过滤")
+        selection = self.select_rule_profiles()
+        signals = '; '.join(hit for hits in selection['signals'].values() for hit in hits)
+        print(f"  - 规则配置档: {selection['profile']}" + (f" ({signals})" if signals else ""))
         
-        extracted_files = []
+        self.extracted_files = []
+        self.skipped_files = []
+        self._cleaned_chapters = {}  # index -> (输出文件名, 清理后内容)，结束时按spine顺序写入章节存储、阅读端章节包、LLM分块和分页
+        self._chapter_anchors = {}  # index -> 章节的锚点位置（nav_index），结束时解析目录项
+        self._record_log = None
+        self._progressive = progressive
+        if self.config.get('record_log', True) or progressive:
+            # 每完成一个章节追加一行记录；渐进式提取时直接写在最终目录，是首章之后唯一的逐章进度，总是启用
+            self._record_log = RecordLog(self._output.path(RECORD_LOG_NAME))
+        self._assets = self.dedup_assets()
+        self._stats_collector = None
+        if self.config.get('collect_statistics', True):
+            if chapter_stats.numpy_available():
+                self._stats_collector = chapter_stats.BookStatsCollector()
+            else:
+                print("  ⚠️ 未安装numpy，跳过章节统计")
         
-        for spine_item in self.spine_info:
-            item = self.book.get_item_with_id(spine_item['item_id'])
-            if not item:
-                continue
-            
-            try:
-                # 获取原始内容
-                content = item.get_content().decode('utf-8')
-                
-                # 检查是否为噪声页面
-                is_noise, skip_reason = self.is_noise_page(item, content)
-                if is_noise:
-                    self.skipped_files.append({
-                        'index': spine_item['index'],
-                        'file_name': spine_item['file_name'],
-                        'item_id': spine_item['item_id'],
-                        'skip_reason': skip_reason
-                    })
-                    self.logger.debug(f"跳过噪声页面: {spine_item['file_name']} - {skip_reason}")
-                    print(f"  ⊘ 跳过: {spine_item['file_name']} ({skip_reason})")
-                    continue
-                
-                # 生成输出文件名
-                original_name = spine_item['file_name']
-                base_name = Path(original_name).stem
-                output_filename = f"chapter_{spine_item['index']:03d}_{base_name}.html"
-                
-                # 保存未清理版本
-                raw_file_path = raw_output_path / output_filename
-                with open(raw_file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                # 清理内容并保存清理版本
-                cleaned_content = self.clean_html_content(content)
-                cleaned_file_path = cleaned_output_path / output_filename
-                with open(cleaned_file_path, 'w', encoding='utf-8') as f:
-                    f.write(cleaned_content)
-                
-                extracted_files.append({
-                    'index': spine_item['index'],
-                    'original_name': original_name,
-                    'output_name': output_filename,
-                    'raw_file_path': str(raw_file_path),
-                    'cleaned_file_path': str(cleaned_file_path),
-                    'raw_size_bytes': len(content.encode('utf-8')),
-                    'cleaned_size_bytes': len(cleaned_content.encode('utf-8'))
+        self._images = None
+        if self.config.get('export_images'):
+            if not image_assets.pillow_available():
+                print("  ⚠️ 未安装Pillow，图片按原格式导出（不转码为WebP）")
+            self._images = image_assets.ImageExporter(
+                image_assets.collect_images(self.book),
+                cache_dir=self.config.get('image_cache_dir') or self.output_dir / ".image_cache",
+                workers=self.config.get('image_workers') or os.cpu_count() or 1,
+                variants=self.config.get('image_variants'),
+                quality=self.config.get('image_webp_quality', 80))
+        
+        self._lock = threading.RLock()
+        self.pipeline_metrics = None
+        self._start_time = time.perf_counter()
+        self.timings = {'time_to_first_chapter_ms': None, 'total_ms': None}
+    
+    def _elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._start_time) * 1000, 1)
+    
+    def _extract_spine_item(self, spine_item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """提取单个spine项目，返回 extracted_files 记录；跳过或失败时返回None"""
+        try:
+            payload = self._read_document(spine_item)
+            if payload is None:
+                return None
+            return self._write_document(spine_item, payload, self._process_document(payload))
+        except Exception as e:
+            self._report_failure(spine_item, e)
+            return None
+    
+    def _report_failure(self, spine_item: Dict[str, Any], error: BaseException):
+        print(f"  ✗ 提取失败: {spine_item['file_name']} - {error}")
+        self.logger.error(f"提取失败: {spine_item['file_name']} - {error}")
+    
+    def _read_document(self, spine_item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """读取阶段：取出原始字节，共享存储命中时一并取出之前的判定和清理结果"""
+        item = self.book.get_item_with_id(spine_item['item_id'])
+        if not item:
+            return None
+        
+        raw_bytes = item.get_content()
+        payload = {'file_name': item.file_name, 'raw_bytes': raw_bytes, 'cached': None}
+        if self.content_store:
+            payload['raw_digest'] = hash_bytes(raw_bytes)
+            payload['doc_key'] = self.content_store.document_key(payload['raw_digest'], self._dedup_variant(item))
+            cached = self.content_store.lookup_document(payload['doc_key'])
+            with self._lock:
+                if cached is not None:
+                    self.dedup_stats['documents']['hits'] += 1
+                    self.dedup_stats['bytes_reused'] += len(raw_bytes)
+                else:
+                    self.dedup_stats['documents']['misses'] += 1
+            if cached is not None and not cached['is_noise']:
+                payload['cached_cleaned'] = self.content_store.read_text(cached['cleaned_sha256'])
+            payload['cached'] = cached
+        return payload
+    
+    def _process_document(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """处理阶段：噪声判定、清理和统计计数（只依赖配置和规则，可在工作进程中执行）"""
+        content = payload['raw_bytes'].decode('utf-8')
+        cached = payload['cached']
+        result = {'tier': None, 'cleaned_content': None, 'counts': None, 'degraded': None, 'anchors': None}
+        
+        if cached is not None:
+            result['is_noise'], result['skip_reason'] = cached['is_noise'], cached['skip_reason']
+        else:
+            result['is_noise'], result['skip_reason'], result['tier'] = \
+                self.classify_noise_page(payload['file_name'], payload['raw_bytes'], content)
+        if result['is_noise']:
+            return result
+        
+        statistics = self.config.get('collect_statistics', True) and chapter_stats.numpy_available()
+        if cached is not None:
+            result['cleaned_content'] = payload['cached_cleaned']
+            result['anchors'] = cached.get('anchors')
+            if statistics:
+                # 共享存储命中时重新解析清理结果计数，同样受章节预算限制（超出时本章不计入统计）
+                try:
+                    result['counts'] = chapter_stats.count_chapter(
+                        result['cleaned_content'], budget=ChapterBudget(self.chapter_budget['cpu_ms']))
+                except BudgetExceeded:
+                    pass
+        else:
+            # 导航索引的锚点位置在清理的同一次遍历中记录；原样输出的章节没有统计计数
+            tracker = nav_index.AnchorTracker() if self.config.get('nav_index', True) else None
+            result['cleaned_content'], result['counts'], result['degraded'] = \
+                self.clean_with_budget(content, tracker, statistics)
+            if tracker is not None and result['degraded'] is None:
+                result['anchors'] = tracker.resolve()
+        return result
+    
+    def _write_document(self, spine_item: Dict[str, Any], payload: Dict[str, Any],
+                        result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """写出阶段：写入文件和共享存储，登记报告记录"""
+        raw_bytes = payload['raw_bytes']
+        cached = payload['cached']
+        if result['tier'] is not None:
+            with self._lock:
+                self.noise_triage_stats[result['tier']] += 1
+        
+        if result['is_noise']:
+            skip_reason = result['skip_reason']
+            if cached is None and self.content_store:
+                self.content_store.record_document(payload['doc_key'], {
+                    'is_noise': True, 'skip_reason': skip_reason, 'cleaned_sha256': None
                 })
-                
-                print(f"  ✓ 提取: {original_name} -> {output_filename}")
-                
-            except Exception as e:
-                print(f"  ✗ 提取失败: {spine_item['file_name']} - {e}")
-                self.logger.error(f"提取失败: {spine_item['file_name']} - {e}")
-        
-        # 生成提取报告
-        report = {
-            'metadata': self.metadata,
-            'extraction_summary': {
-                'total_files_extracted': len(extracted_files),
-                'total_files_skipped': len(self.skipped_files),
-                'raw_output_directory': str(raw_output_path),
-                'cleaned_output_directory': str(cleaned_output_path),
-                'epub_source': str(self.epub_path),
-                'config_used': self.config
-            },
-            'spine_info': self.spine_info,
-            'extracted_files': extracted_files,
-            'skipped_files': self.skipped_files
-        }
+            record = SkippedRecord(
+                index=spine_item['index'],
+                file_name=spine_item['file_name'],
+                item_id=spine_item['item_id'],
+                skip_reason=skip_reason
+            )
+            with self._lock:
+                self.skipped_files.append(record)
+            if self._record_log is not None:
+                self._record_log.write('skipped', record)
+            self.logger.debug(f"跳过噪声页面: {spine_item['file_name']} - {skip_reason}")
+            print(f"  ⊘ 跳过: {spine_item['file_name']} ({skip_reason})")
+            return None
+        
+        content = raw_bytes.decode('utf-8')
+        cleaned_content = result['cleaned_content']
+        if self._images is not None:
+            # 图片引用指向导出的 images/ 目录，首次引用的图片同时提交转码
+            cleaned_content = self._images.rewrite(spine_item['file_name'], cleaned_content)
+        
+        # 生成输出文件名
+        original_name = spine_item['file_name']
+        base_name = Path(original_name).stem
+        output_filename = f"chapter_{spine_item['index']:03d}_{base_name}.html"
+        
+        if self.content_store:
+            # 原始和清理版本都作为共享对象保存一次，输出目录中只放链接
+            if cached is not None:
+                cleaned_digest = cached['cleaned_sha256']
+            else:
+                cleaned_digest, _ = self.content_store.put_object(result['cleaned_content'].encode('utf-8'))
+                if result['degraded'] is None:
+                    # 降级的结果不进文档缓存，下次（或在更快的机器上）重新完整清理
+                    self.content_store.record_document(payload['doc_key'], {
+                        'is_noise': False, 'skip_reason': '', 'cleaned_sha256': cleaned_digest,
+                        'anchors': result['anchors']
+                    })
+            if cleaned_content != result['cleaned_content']:
+                # 文档缓存保存的是改写图片引用之前的清理结果，改写后的版本另存为对象
+                cleaned_digest, _ = self.content_store.put_object(cleaned_content.encode('utf-8'))
+            self.content_store.put_object(raw_bytes, payload['raw_digest'])
+            self.content_store.materialize(payload['raw_digest'], self._output.path(f"raw_html/{output_filename}"))
+            self.content_store.materialize(cleaned_digest, self._output.path(f"cleaned_html/{output_filename}"))
+        else:
+            # 保存未清理版本和清理版本（批量写出）
+            self._output.write_text(f"raw_html/{output_filename}", content)
+            self._output.write_text(f"cleaned_html/{output_filename}", cleaned_content)
+        
+        record = ExtractedRecord(
+            index=spine_item['index'],
+            original_name=original_name,
+            output_name=output_filename,
+            directories=self._record_directories,
+            raw_size_bytes=len(content.encode('utf-8')),
+            cleaned_size_bytes=len(cleaned_content.encode('utf-8')),
+            cleaning=result['degraded']
+        )
+        if result['degraded'] is not None:
+            print(f"  ⚠️ 降级清理: {original_name} -> {result['degraded']['tier']} ({result['degraded']['detail']})")
+        
+        anchors = None
+        if self.config.get('nav_index', True):
+            anchors = dict(result['anchors'] or nav_index.anchor_record(cleaned_content),
+                           original_name=original_name, output_name=output_filename)
+        
+        with self._lock:
+            if anchors is not None:
+                self._chapter_anchors[spine_item['index']] = anchors
+            if (self.config.get('build_chapter_store', True) or self.config.get('reader_bundle')
+                    or self.config.get('llm_chunks') or self.config.get('paginate')):
+                self._cleaned_chapters[spine_item['index']] = (output_filename, cleaned_content)
+            self.cleaning_tier_stats[result['degraded']['tier'] if result['degraded'] else TIER_FULL] += 1
+            if self._stats_collector is not None and result['counts'] is not None:
+                self._stats_collector.add_counts(spine_item['index'], len(raw_bytes), result['counts'])
+            self.extracted_files.append(record)
+            if self.timings['time_to_first_chapter_ms'] is None:
+                self.timings['time_to_first_chapter_ms'] = self._elapsed_ms()
+        if self._record_log is not None:
+            if self._progressive:
+                # 读取方按记录日志跟随进度，记录中列出的文件须已写出
+                self._output.flush()
+            self._record_log.write('extracted', record)
+        
+        print(f"  ✓ 提取: {original_name} -> {output_filename}")
+        return record
+    
+    def _extract_items(self, spine_items: List[Dict[str, Any]],
+                       on_item: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """提取一组spine项目；启用流水线时读取、处理、写出分阶段并行，否则逐项顺序执行"""
+        if not self.config.get('pipeline', False):
+            for spine_item in spine_items:
+                self._extract_spine_item(spine_item)
+                if on_item:
+                    on_item(spine_item)
+            return
+        
+        def write(spine_item, payload, result, error):
+            if error is not None:
+                self._report_failure(spine_item, error)
+            else:
+                try:
+                    self._write_document(spine_item, payload, result)
+                except Exception as e:
+                    self._report_failure(spine_item, e)
+            if on_item:
+                on_item(spine_item)
+        
+        workers = self.config.get('pipeline_workers', 1) or os.cpu_count() or 1
+        if workers > 1:
+            process, initargs = _pipeline_worker_process, (self.config, self.noise_index, self.rule_profiles)
+        else:
+            process, initargs = self._process_document, ()
+        self.pipeline_metrics = pipeline.run_pipeline(
+            spine_items, self._read_document, process, write,
+            queue_size=self.config.get('pipeline_queue_size', 8), workers=workers,
+            worker_initializer=_pipeline_worker_init, worker_initargs=initargs)
+        print(f"  - 流水线瓶颈阶段: {self.pipeline_metrics['bottleneck']} (工作进程: {workers})")
+    
+    def _build_report(self, status: str = 'complete') -> Dict[str, Any]:
+        """根据当前状态生成提取报告（进行中的报告只包含已完成的章节）"""
+        with self._lock:
+            extracted_files = sorted(self.extracted_files, key=lambda record: record['index'])
+            skipped_files = sorted(self.skipped_files, key=lambda record: record['index'])
+            report = {
+                'metadata': self.metadata,
+                'extraction_summary': {
+                    'status': status,
+                    'total_files_extracted': len(extracted_files),
+                    'total_files_skipped': len(skipped_files),
+                    'raw_output_directory': str(self.raw_output_path),
+                    'cleaned_output_directory': str(self.cleaned_output_path),
+                    'epub_source': self.source_label,
+                    'config_used': self.config,
+                    'noise_triage': dict(self.noise_triage_stats),
+                    'cleaning_tiers': dict(self.cleaning_tier_stats),
+                    'rule_profile': self.rule_profile_selection,
+                    'timings': dict(self.timings)
+                },
+                'spine_info': self.spine_info,
+                'toc_info': self.toc_info,
+                'extracted_files': extracted_files,
+                'skipped_files': skipped_files
+            }
+            if self.archive_stats:
+                report['extraction_summary']['archive'] = self.archive_stats
+            if self.pipeline_metrics:
+                report['extraction_summary']['pipeline'] = self.pipeline_metrics
+            if self.content_store:
+                report['extraction_summary']['dedup'] = dict(self.dedup_stats, shared_store=str(self.content_store.root))
+                report['assets'] = self._assets
+        return report
+    
+    def _write_report(self, report: Dict[str, Any]) -> Path:
+        """流式写入报告，记录逐条序列化（先写临时文件再替换，读取方不会看到写了一半的报告）"""
+        report_path = self.base_output_path / 'extraction_report.json'
+        if self._output.atomic:
+            # 原子输出时报告直接写进暂存目录，随整个目录一起提交
+            write_json_file(self._output.path(report_path.name), report, replace=False)
+            return report_path
         
-        # 保存报告
-        report_path = base_output_path / 'extraction_report.json'
-        with open(report_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        # 直接写最终目录时，先把缓存的章节文件写出，报告中列出的文件都已存在
+        self._output.flush()
+        return write_json_file(report_path, report)
+    
+    def _finish_extraction(self) -> Path:
+        """写出章节存储和统计，生成最终报告"""
+        # 写出章节存储（供阅读端 mmap 零拷贝读取）
+        chapter_store_summary = None
+        if self.config.get('build_chapter_store', True):
+            store_writer = chapter_store.ChapterStoreWriter()
+            for index in sorted(self._cleaned_chapters):
+                output_filename, cleaned_content = self._cleaned_chapters[index]
+                store_writer.add_chapter(index, output_filename, cleaned_content)
+            chapter_store_summary = store_writer.write(self._output.root)
+            for key in ('blob_path', 'index_path'):
+                chapter_store_summary[key] = str(self._output.final_path(chapter_store_summary[key]))
+        
+        # 写出导出的图片（等待进程池中的转码完成）
+        image_summary = None
+        if self._images is not None:
+            image_summary = self._images.finish(self._output.write_bytes)
+            image_summary['directory'] = str(self.base_output_path / image_assets.IMAGE_DIR)
+        
+        # 生成阅读端章节包（预压缩的静态文件）
+        bundle_summary = None
+        if self.config.get('reader_bundle'):
+            if not reader_bundle.brotli_available():
+                print("  ⚠️ 未安装brotli，章节包只生成gzip版本")
+            builder = reader_bundle.ReaderBundleBuilder(self.config.get('reader_bundle_gzip_level', 9),
+                                          self.config.get('reader_bundle_brotli_quality', 11),
+                                          self.config.get('reader_bundle_bandwidth_kbps', 1600))
+            chapters = [(index,) + self._cleaned_chapters[index] for index in sorted(self._cleaned_chapters)]
+            if self._images is not None:
+                # 章节包位于 reader/chapters/，比 cleaned_html/ 深一层
+                chapters = [(index, name, image_assets.rebase_image_links(content, f"../{image_assets.IMAGE_DIR}/", f"../../{image_assets.IMAGE_DIR}/"))
+                            for index, name, content in chapters]
+            bundle_summary = builder.build(chapters, self._output.write_bytes, self.book_name)
+            bundle_summary['directory'] = str(self.base_output_path / bundle_summary['directory'])
+        
+        # 生成LLM分块（分段缓存中保存段落偏移和token数，重新分块时不再解析HTML）
+        chunk_summary = None
+        if self.config.get('llm_chunks'):
+            try:
+                chunker = llm_chunks.LLMChunker(self.config.get('llm_chunk_tokens', 512),
+                                                self.config.get('llm_chunk_overlap', 64),
+                                                self.config.get('llm_tokenizer', 'approx'))
+            except ValueError as e:
+                print(f"  ⚠️ 跳过LLM分块: {e}")
+            else:
+                chapters = [(index,) + self._cleaned_chapters[index] for index in sorted(self._cleaned_chapters)]
+                chunk_summary = chunker.build(chapters, self._output.write_bytes, self.book_name)
+                chunk_summary['directory'] = str(self.base_output_path / chunk_summary['directory'])
+        
+        # 预计算各视口的分页边界（阅读端直接跳到第N页）
+        pagination_summary = None
+        if self.config.get('paginate'):
+            paginator = pagination.Paginator(self.config.get('pagination_profiles'), self._image_sizes())
+            chapters = [(index,) + self._cleaned_chapters[index] for index in sorted(self._cleaned_chapters)]
+            pagination_summary = paginator.build(chapters, self._output.write_bytes, self.book_name)
+            pagination_summary['path'] = str(self.base_output_path / pagination_summary['path'])
+        self._cleaned_chapters = {}
+        
+        # 把目录和导航文档中的 href 解析为输出文件、段落和字符偏移
+        nav_summary = None
+        if self.config.get('nav_index', True):
+            builder = nav_index.NavIndexBuilder(nav_index.collect_entries(self.book))
+            spine = [(spine_item['index'], spine_item['file_name']) for spine_item in self.spine_info]
+            nav_summary = builder.build(spine, self._chapter_anchors, self._output.write_bytes, self.book_name)
+            nav_summary['path'] = str(self.base_output_path / nav_summary['path'])
+        self._chapter_anchors = {}
+        
+        self.timings['total_ms'] = self._elapsed_ms()
+        report = self._build_report('complete')
+        if chapter_store_summary:
+            report['extraction_summary']['chapter_store'] = chapter_store_summary
+        if bundle_summary:
+            report['extraction_summary']['reader_bundle'] = bundle_summary
+        if chunk_summary:
+            report['extraction_summary']['llm_chunks'] = chunk_summary
+        if pagination_summary:
+            report['extraction_summary']['pagination'] = pagination_summary
+        if nav_summary:
+            report['extraction_summary']['nav_index'] = nav_summary
+        if image_summary:
+            report['images'] = image_summary
+        if self._stats_collector is not None:
+            report['statistics'] = self._stats_collector.summarize()
+        
+        # 保存报告并提交输出目录
+        if self._record_log is not None:
+            self._record_log.close()
+        self.report = report
+        report_path = self._write_report(report)
+        self._output.commit()
         
         print(f"\n提取完成！")
-        print(f"  - 成功提取: {len(extracted_files)} 个文件")
+        print(f"  - 成功提取: {len(self.extracted_files)} 个文件")
         print(f"  - 跳过文件: {len(self.skipped_files)} 个")
-        print(f"  - 未清理版本: {raw_output_path}")
-        print(f"  - 清理版本: {cleaned_output_path}")
+        if self.content_store:
+            docs = self.dedup_stats['documents']
+            print(f"  - 去重命中: 文档 {docs['hits']}/{docs['hits'] + docs['misses']}, "
+                  f"资源 {self.dedup_stats['assets']['hits']}/{len(self._assets)}")
+        print(f"  - 未清理版本: {self.raw_output_path}")
+        print(f"  - 清理版本: {self.cleaned_output_path}")
+        if chapter_store_summary:
+            print(f"  - 章节存储: {chapter_store_summary['blob_path']}")
+        if nav_summary:
+            resolved = nav_summary['resolved']
+            print(f"  - 导航索引: {nav_summary['entries']} 项 (锚点 {resolved['anchor']}, 文件 {resolved['file']}, "
+                  f"未定位 {resolved['missing']}) -> {nav_summary['path']}")
+        if image_summary:
+            print(f"  - 导出图片: {image_summary['referenced']} 张 -> {image_summary['directory']} "
+                  f"({image_summary['bytes']['original'] / 1024:.0f} KB -> "
+                  f"{image_summary['bytes'].get(self._images.primary_variant, 0) / 1024:.0f} KB, "
+                  f"缓存命中 {image_summary['cache_hits']}, 转码 {image_summary['transcoded']})")
+        if bundle_summary:
+            best = bundle_summary['encodings'][-1]
+            first_ms = (bundle_summary['first_chapter'] or {}).get('transfer_ms', {})
+            print(f"  - 阅读端章节包: {bundle_summary['directory']} "
+                  f"({best} 压缩比 {bundle_summary['compression_ratio']}x, "
+                  f"首章传输 {first_ms.get('cleaned')} -> {first_ms.get(best)} ms)")
+        if chunk_summary:
+            print(f"  - LLM分块: {chunk_summary['chunks']} 块 -> {chunk_summary['directory']} "
+                  f"(平均 {chunk_summary['mean_chunk_tokens']} / 最大 {chunk_summary['max_chunk_tokens']} token, "
+                  f"分词器 {chunk_summary['tokenizer']})")
+        if pagination_summary:
+            pages = ', '.join(f"{name} {total} 页" for name, total in pagination_summary['profiles'].items())
+            print(f"  - 分页: {pages} -> {pagination_summary['path']}")
+        print(f"  - 首章耗时: {self.timings['time_to_first_chapter_ms']} ms, 总耗时: {self.timings['total_ms']} ms")
         print(f"  - 提取报告: {report_path}")
+        return report_path
+    
+    def _image_sizes(self) -> Dict[str, Tuple[int, int]]:
+        """书中图片的像素尺寸：文件名（以及导出后的文件名）-> (宽, 高)，供分页估算图片高度"""
+        sizes = {}
+        for href, (data, _) in image_assets.collect_images(self.book).items():
+            dimensions = image_assets.image_dimensions(data)
+            if dimensions is None:
+                continue
+            sizes[posixpath.basename(href)] = dimensions
+            if self._images is not None:
+                sizes[self._images.output_name(href)] = dimensions
+        return sizes
+    
+    def extract_all_html_files(self, on_chapter: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """提取所有HTML文件，生成未清理和清理版本
+        
+        on_chapter(spine_item) 在每个spine项目处理完（提取、跳过或失败）后调用，用于记录进度
+        """
+        if not self.spine_info:
+            print("错误：未找到spine信息")
+            return False
+        
+        self._begin_extraction()
+        try:
+            self._extract_items(self.spine_info, on_chapter)
+            self._finish_extraction()
+        except BaseException:
+            # 未提交的暂存目录直接丢弃，最终目录保持上一次完整提取的状态
+            if self._images is not None:
+                self._images.close()
+            if self._record_log is not None:
+                self._record_log.close()
+            self._output.abort()
+            raise
         
         return True
     
+    def extract_progressive(self, on_first_chapter: Optional[Callable[[Dict[str, Any]], None]] = None,
+                            on_chapter: Optional[Callable[[Dict[str, Any]], None]] = None
+                            ) -> Optional[threading.Thread]:
+        """渐进式提取：先提取第一个可读章节并立即发布，其余章节在后台线程中继续
+        
+        第一章完成后写出状态为 in_progress 的报告并调用 on_first_chapter(记录)；
+        后台每完成一个章节只向记录日志（extraction_records.jsonl）追加一行，全部完成后写出一次最终报告。
+        返回后台线程（调用方可 join 等待完成），没有spine信息时返回None。
+        """
+        if not self.spine_info:
+            print("错误：未找到spine信息")
+            return None
+        
+        self._begin_extraction(progressive=True)
+        
+        # 按 preview_first_chapter 的顺序寻找第一个非噪声章节，途中遇到的噪声页面照常记录
+        processed = set()
+        first_record = None
+        for spine_item in self._first_chapter_candidates():
+            processed.add(spine_item['index'])
+            first_record = self._extract_spine_item(spine_item)
+            if on_chapter:
+                on_chapter(spine_item)
+            if first_record:
+                break
+        
+        if self._images is not None:
+            # 首章引用的图片随首章一起发布
+            self._images.publish(self._output.write_bytes)
+        self._write_report(self._build_report('in_progress'))
+        if first_record:
+            print(f"  ➜ 首个可读章节已发布: {first_record['output_name']} "
+                  f"({self.timings['time_to_first_chapter_ms']} ms)")
+            if on_first_chapter:
+                on_first_chapter(first_record)
+        
+        remaining = [spine_item for spine_item in self.spine_info if spine_item['index'] not in processed]
+        thread = threading.Thread(target=self._extract_remaining, args=(remaining, on_chapter),
+                                  name=f"extract-{self.book_name}")
+        thread.start()
+        return thread
+    
+    def _extract_remaining(self, spine_items: List[Dict[str, Any]],
+                           on_chapter: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """后台提取剩余章节（逐章进度在记录日志中，不再每章重写整份报告，否则总开销随章节数平方增长）；
+        失败时原因记在 extraction_error，报告保持 in_progress"""
+        try:
+            self._extract_items(spine_items, on_chapter)
+            self._finish_extraction()
+        except Exception as e:
+            self.extraction_error = f"后台提取失败: {type(e).__name__}: {e}"
+            print(f"  ✗ {self.extraction_error}")
+            self.logger.error(self.extraction_error)
+            if self._images is not None:
+                self._images.close()
+            if self._record_log is not None:
+                self._record_log.close()
+    
+    def extraction_complete(self) -> bool:
+        """最近一次提取是否写出了 status 为 complete 的最终报告"""
+        return (self.extraction_error is None and self.report is not None
+                and self.report['extraction_summary']['status'] == 'complete')
+    
+    def _first_chapter_candidates(self) -> List[Dict[str, Any]]:
+        """第一章的候选顺序：线性章节优先，其次是其余章节"""
+        linear = [item for item in self.spine_info if item['linear'] == 'yes']
+        others = [item for item in self.spine_info if item['linear'] != 'yes']
+        return linear + others
+    
     def preview_first_chapter(self) -> str:
         """预览第一章内容"""
         if not self.book:
@@ -379,15 +1025,11 @@ class EPUBHTMLExtractor:
         if not self.spine_info:
             return "未找到可读取的章节"
         
-        # 获取第一个线性章节
-        first_chapter = None
-        for item in self.spine_info:
-            if item['linear'] == 'yes':
-                first_chapter = item
-                break
+        if self.rule_profile_selection is None:
+            self.select_rule_profiles()
         
-        if not first_chapter:
-            first_chapter = self.spine_info[0]
+        # 获取第一个线性章节
+        first_chapter = self._first_chapter_candidates()[0]
         
         item = self.book.get_item_with_id(first_chapter['item_id'])
         if item:
@@ -418,7 +1060,7 @@ def parse_arguments():
     parser.add_argument(
         'epub_file', 
         nargs='?', 
-        help='要处理的EPUB文件路径（可选，不指定则交互式选择）'
+        help='要处理的EPUB文件或目录路径（可选，不指定则交互式选择；目录则处理其中全部EPUB）'
     )
     
     parser.add_argument(
@@ -476,6 +1118,196 @@ def parse_arguments():
         help=f'最小文本长度阈值（默认: {MIN_TEXT_LENGTH}）'
     )
     
+    parser.add_argument(
+        '--no-chapter-store',
+        action='store_false',
+        dest='build_chapter_store',
+        help='不生成章节存储文件（chapters.bin）'
+    )
+    
+    parser.add_argument(
+        '--no-nav-index',
+        action='store_false',
+        dest='nav_index',
+        help='不生成导航索引（nav_index.json）'
+    )
+    
+    parser.add_argument(
+        '--no-record-log',
+        action='store_false',
+        dest='record_log',
+        help='不逐章写出记录日志（extraction_records.jsonl）'
+    )
+    
+    parser.add_argument(
+        '--noise-index',
+        help='近似重复噪声页面索引文件（由 noise_index.py build 生成）'
+    )
+    
+    parser.add_argument(
+        '--noise-threshold',
+        type=float,
+        default=DEFAULT_CONFIG['noise_similarity_threshold'],
+        help=f"与已知噪声页面的相似度阈值（默认: {DEFAULT_CONFIG['noise_similarity_threshold']}）"
+    )
+    
+    parser.add_argument(
+        '--shared-store',
+        help='共享内容寻址存储目录，批量提取时对相同文档和资源去重'
+    )
+    
+    parser.add_argument(
+        '--no-statistics',
+        action='store_false',
+        dest='collect_statistics',
+        help='不计算章节统计'
+    )
+    
+    parser.add_argument(
+        '--progressive',
+        action='store_true',
+        help='渐进式提取：先发布第一个可读章节，其余章节在后台继续'
+    )
+    
+    parser.add_argument(
+        '--pipeline',
+        action='store_true',
+        help='读取、清理、写出分阶段流水线执行'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_CONFIG['pipeline_workers'],
+        help='流水线清理阶段的工作进程数，0为CPU核数（默认: 1）'
+    )
+    
+    parser.add_argument(
+        '--queue-size',
+        type=int,
+        default=DEFAULT_CONFIG['pipeline_queue_size'],
+        help=f"流水线阶段之间的队列容量（默认: {DEFAULT_CONFIG['pipeline_queue_size']}）"
+    )
+    
+    parser.add_argument(
+        '--fsync',
+        choices=FSYNC_POLICIES,
+        default=DEFAULT_CONFIG['output_fsync'],
+        help=f"输出文件的fsync策略（默认: {DEFAULT_CONFIG['output_fsync']}）"
+    )
+    
+    parser.add_argument(
+        '--no-atomic-output',
+        action='store_false',
+        dest='atomic_output',
+        help='直接写入最终目录（不经过临时目录提交）'
+    )
+    
+    parser.add_argument(
+        '--journal',
+        help=f'断点续跑日志路径（默认: 输出目录/{JOURNAL_NAME}，使用 --resume 时自动启用）'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='根据断点续跑日志跳过已完成的书，重新提取中断的书'
+    )
+    
+    parser.add_argument(
+        '--shard',
+        help='只处理第 i 个分片（格式 i/N，i 从0开始），按文件名哈希固定分配'
+    )
+    
+    parser.add_argument(
+        '--catalogue-db',
+        help='把提取结果写入SQLite目录索引（catalogue_db.py）'
+    )
+    
+    parser.add_argument(
+        '--export-images',
+        action='store_true',
+        help='导出章节引用的图片并改写引用路径（安装Pillow时转码为WebP）'
+    )
+    
+    parser.add_argument(
+        '--image-workers',
+        type=int,
+        default=DEFAULT_CONFIG['image_workers'],
+        help='图片转码进程数，0为CPU核数（默认: 0）'
+    )
+    
+    parser.add_argument(
+        '--image-cache',
+        help='图片转码缓存目录（默认: 输出目录/.image_cache）'
+    )
+    
+    parser.add_argument(
+        '--max-uncompressed-mb',
+        type=int,
+        default=DEFAULT_CONFIG['archive_max_total_bytes'] // (1024 * 1024),
+        help='EPUB解压后的总大小上限（MB），超出的文件跳过（默认: 1024）'
+    )
+    
+    parser.add_argument(
+        '--max-entries',
+        type=int,
+        default=DEFAULT_CONFIG['archive_max_entries'],
+        help='EPUB压缩包条目数上限，超出的文件跳过（默认: 10000）'
+    )
+    
+    parser.add_argument(
+        '--rule-profile',
+        default=DEFAULT_CONFIG['rule_profile'],
+        help="规则配置档：auto（按书籍指纹自动选择）、default（只用全局规则）或逗号分隔的配置档名"
+             f"（可用: {', '.join(RULE_PROFILES)}；默认: auto）"
+    )
+    
+    parser.add_argument(
+        '--chapter-budget-ms',
+        type=int,
+        default=DEFAULT_CONFIG['chapter_cpu_budget_ms'],
+        help='单个章节清理的CPU时间预算（毫秒），超出时降级为只剔除噪声元素或原样输出，0为不限制（默认: 5000）'
+    )
+    
+    parser.add_argument(
+        '--reader-bundle',
+        action='store_true',
+        help='生成阅读端章节包：压缩HTML、段落JSON及预压缩的gzip/brotli版本和清单'
+    )
+    
+    parser.add_argument(
+        '--llm-chunks',
+        action='store_true',
+        help='按标题、段落和句子边界切分LLM输入块，并保存带token数的分段缓存（llm/）'
+    )
+    
+    parser.add_argument(
+        '--chunk-tokens',
+        type=int,
+        default=DEFAULT_CONFIG['llm_chunk_tokens'],
+        help='LLM分块的token预算（默认: 512）'
+    )
+    
+    parser.add_argument(
+        '--chunk-overlap',
+        type=int,
+        default=DEFAULT_CONFIG['llm_chunk_overlap'],
+        help='相邻LLM分块的重叠token数（默认: 64）'
+    )
+    
+    parser.add_argument(
+        '--tokenizer',
+        default=DEFAULT_CONFIG['llm_tokenizer'],
+        help='本地分词器：approx、whitespace、tiktoken:<编码> 或 <模块>:<函数>（默认: approx）'
+    )
+    
+    parser.add_argument(
+        '--paginate',
+        action='store_true',
+        help='按预设视口预计算分页边界（reader/pagination.json）'
+    )
+    
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -484,10 +1316,15 @@ def parse_arguments():
     
     return parser.parse_args()
 
-def select_epub_files(epub_file_arg: Optional[str] = None) -> List[Path]:
-    """选择EPUB文件（支持多选）"""
+def select_epub_files(epub_file_arg: Optional[str] = None, select_all: bool = False) -> List[Path]:
+    """选择EPUB文件（支持多选）；select_all 为True时不交互，直接返回找到的全部文件"""
     if epub_file_arg:
         epub_path = Path(epub_file_arg)
+        if epub_path.is_dir():
+            epub_files = sorted(path for path in epub_path.rglob("*") if path.suffix.lower() == '.epub')
+            if not epub_files:
+                print(f"错误: 目录 {epub_file_arg} 下未找到EPUB文件")
+            return epub_files
         if epub_path.exists() and epub_path.suffix.lower() == '.epub':
             return [epub_path]
         else:
@@ -503,6 +1340,9 @@ def select_epub_files(epub_file_arg: Optional[str] = None) -> List[Path]:
         print("当前目录下未找到EPUB文件")
         return []
     
+    if select_all:
+        return sorted(epub_files)
+    
     if len(epub_files) == 1:
         epub_path = epub_files[0]
         print(f"找到EPUB文件: {epub_path}")
@@ -549,34 +1389,188 @@ def main():
         'keep_cover': args.keep_cover,
         'min_text_length': args.min_text_length,
         'verbose': args.verbose,
+        'build_chapter_store': args.build_chapter_store,
+        'noise_index_path': args.noise_index,
+        'noise_similarity_threshold': args.noise_threshold,
+        'collect_statistics': args.collect_statistics,
+        'pipeline': args.pipeline,
+        'pipeline_workers': args.workers,
+        'pipeline_queue_size': args.queue_size,
+        'atomic_output': args.atomic_output,
+        'output_fsync': args.fsync,
+        'reader_bundle': args.reader_bundle,
+        'export_images': args.export_images,
+        'image_workers': args.image_workers,
+        'image_cache_dir': args.image_cache,
+        'archive_max_total_bytes': args.max_uncompressed_mb * 1024 * 1024,
+        'archive_max_entries': args.max_entries,
+        'chapter_cpu_budget_ms': args.chapter_budget_ms,
+        'rule_profile': args.rule_profile,
+        'llm_chunks': args.llm_chunks,
+        'llm_chunk_tokens': args.chunk_tokens,
+        'llm_chunk_overlap': args.chunk_overlap,
+        'llm_tokenizer': args.tokenizer,
+        'paginate': args.paginate,
+        'nav_index': args.nav_index,
+        'record_log': args.record_log,
     }
     
-    # 选择EPUB文件（支持多选）
-    epub_paths = select_epub_files(args.epub_file)
-    if not epub_paths:
+    try:
+        rule_profiles.parse_profile_setting(args.rule_profile)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
+    
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return
+    
+    # 选择EPUB文件（支持多选；分片运行时不交互，取全部文件后按分片筛选）
+    candidates = select_epub_files(args.epub_file, select_all=shard is not None)
+    if not candidates:
         return
+    epub_paths = candidates
+    if shard:
+        epub_paths = select_shard(candidates, *shard)
+        print(f"\n分片 {shard[0]}/{shard[1]}: 共 {len(candidates)} 个EPUB文件中分配到 {len(epub_paths)} 个")
     
     print(f"\n准备处理 {len(epub_paths)} 个EPUB文件")
     
-    # 处理每个EPUB文件
-    for i, epub_path in enumerate(epub_paths, 1):
-        print(f"\n{'='*60}")
-        print(f"处理第 {i}/{len(epub_paths)} 个文件: {epub_path.name}")
-        print(f"{'='*60}")
-        
-        # 创建提取器并执行提取
-        extractor = EPUBHTMLExtractor(str(epub_path), args.output_dir, config)
-        
-        if extractor.load_epub():
-            extractor.extract_metadata()
-            extractor.extract_toc_info()
-            extractor.extract_spine_info()
-            extractor.extract_all_html_files()
-        else:
-            print(f"EPUB文件加载失败: {epub_path}")
+    # 整个批次共享一个内容存储
+    content_store = None
+    if args.shared_store:
+        content_store = SharedContentStore(args.shared_store, compute_rules_fingerprint(config))
+        print(f"启用共享内容存储: {args.shared_store}")
+    
+    # 噪声索引只加载一次
+    noise_index = None
+    if args.noise_index:
+        noise_index = MinHashNoiseIndex.load(args.noise_index, args.noise_threshold)
+        print(f"加载噪声页面索引: {args.noise_index} ({len(noise_index)} 个页面)")
+    
+    # 断点续跑日志（按EPUB内容哈希记录每本书和每个章节的进度）
+    journal = None
+    fingerprint = compute_rules_fingerprint(config)
+    if args.journal or args.resume:
+        journal = CheckpointJournal(args.journal or Path(args.output_dir) / JOURNAL_NAME)
+        if args.resume:
+            print(f"从断点日志恢复: {journal.path} (已完成 {len(journal.completed)} 本, "
+                  f"中断 {len(journal.in_flight)} 本)")
+    catalogue = catalogue_db.CatalogueDB(args.catalogue_db) if args.catalogue_db else None
+    resume_summary = {'reused_books': 0, 'reused_chapters': 0, 'redone_books': 0,
+                      'redone_chapters': 0, 'new_books': 0, 'failed_books': 0, 'skipped_books': 0}
+    
+    # 批次摘要（供 merge_shards.py 合并）：每本书处理完就写出它的记录，不在内存中累积整个批次；
+    # 先写临时文件，批次结束时替换
+    summary_path = Path(args.output_dir) / summary_name(shard)
+    summary_path.parent.mkdir(parents=True, exist_ok=True)
+    batch_summary = JSONFileWriter(summary_path)
+    batch_summary.write('shard', {'index': shard[0], 'total': shard[1]} if shard else None)
+    batch_summary.write('host', socket.gethostname())
+    batch_summary.write('rules_fingerprint', fingerprint)
+    batch_summary.write('input_count', len(candidates))
+    batch_summary.write('assigned', [path.name for path in epub_paths])
+    batch_summary.begin_list('books')
+    
+    try:
+        # 处理每个EPUB文件
+        for i, epub_path in enumerate(epub_paths, 1):
+            print(f"\n{'='*60}")
+            print(f"处理第 {i}/{len(epub_paths)} 个文件: {epub_path.name}")
+            print(f"{'='*60}")
+            
+            digest = hash_file(epub_path)
+            book_entry = {'name': epub_path.name, 'epub': str(epub_path), 'sha256': digest}
+            on_chapter = None
+            if journal:
+                done = journal.reusable(digest, fingerprint) if args.resume else None
+                if done:
+                    print(f"⏭️ 已完成，复用: {done['report']}")
+                    resume_summary['reused_books'] += 1
+                    resume_summary['reused_chapters'] += done['chapters']
+                    book_entry.update(status='reused',
+                                      report=summary_report_path(done['report'], summary_path.parent),
+                                      extracted=done['chapters'], skipped=done.get('skipped', 0))
+                    batch_summary.append(book_entry)
+                    continue
+                if args.resume and digest in journal.in_flight:
+                    resume_summary['redone_books'] += 1
+                    resume_summary['redone_chapters'] += journal.interrupted_chapters(digest)
+                    print(f"🔁 上次中断（已完成 {journal.interrupted_chapters(digest)} 个章节），重新提取")
+                else:
+                    resume_summary['new_books'] += 1
+                journal.book_started(digest, epub_path)
+                on_chapter = lambda spine_item, digest=digest: journal.chapter_done(
+                    digest, spine_item['index'], spine_item['file_name'])
+            
+            # 创建提取器并执行提取
+            extractor = EPUBHTMLExtractor(str(epub_path), args.output_dir, config, content_store, noise_index)
+            
+            success = False
+            if extractor.load_epub():
+                extractor.extract_metadata()
+                extractor.extract_toc_info()
+                extractor.extract_spine_info()
+                if args.progressive:
+                    thread = extractor.extract_progressive(on_chapter=on_chapter)
+                    if thread:
+                        thread.join()
+                        # 后台线程失败时报告停留在 in_progress，不能记为完成
+                        success = extractor.extraction_complete()
+                else:
+                    success = extractor.extract_all_html_files(on_chapter)
+            else:
+                print(f"EPUB文件加载失败: {epub_path}")
+            
+            if success:
+                report_path = (extractor.base_output_path / 'extraction_report.json').resolve()
+                book_entry.update(status='extracted', report=summary_report_path(report_path, summary_path.parent),
+                                  extracted=len(extractor.extracted_files), skipped=len(extractor.skipped_files))
+            elif extractor.archive_limited:
+                # 超出压缩包限制的文件记为跳过，不影响批次中的其他书
+                resume_summary['skipped_books'] += 1
+                book_entry.update(status='skipped', report=None, reason=extractor.load_error)
+            else:
+                resume_summary['failed_books'] += 1
+                book_entry.update(status='failed', report=None,
+                                  reason=extractor.load_error or extractor.extraction_error or "未找到spine信息")
+            if catalogue and success and extractor.report:
+                catalogue.add_extraction_report(extractor.report, str(report_path), sha256=digest,
+                                                rules_fingerprint=fingerprint)
+            if journal:
+                if success:
+                    journal.book_done(digest, fingerprint, report_path, book_entry['extracted'], book_entry['skipped'])
+                else:
+                    journal.book_failed(digest, book_entry['reason'])
+            batch_summary.append(book_entry)
+    except BaseException:
+        batch_summary.abort()
+        raise
+    
+    batch_summary.end_list()
+    batch_summary.write('finished_at', time.strftime('%Y-%m-%dT%H:%M:%S'))
+    batch_summary.commit()
+    
+    if journal:
+        journal.close()
+    if catalogue:
+        catalogue.close()
+        print(f"已写入目录索引: {args.catalogue_db}")
     
     print(f"\n{'='*60}")
     print(f"所有文件处理完成！共处理了 {len(epub_paths)} 个EPUB文件")
+    print(f"  - 批次摘要: {summary_path}")
+    if args.resume:
+        print(f"  - 复用: {resume_summary['reused_books']} 本 ({resume_summary['reused_chapters']} 个章节)")
+        print(f"  - 重做: {resume_summary['redone_books']} 本中断的书 "
+              f"(中断前已完成 {resume_summary['redone_chapters']} 个章节)")
+        print(f"  - 新处理: {resume_summary['new_books']} 本, 失败: {resume_summary['failed_books']} 本")
+    if resume_summary['skipped_books']:
+        print(f"  - 超出压缩包限制而跳过: {resume_summary['skipped_books']} 本")
     print(f"{'='*60}")
 
 if __name__ == "__main__":
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图片导出与转码
+清理后的章节仍引用EPUB内的原始图片（常为数MB的JPEG/PNG）。导出时：
+
+- 写出阶段把章节中 <img src> / <image xlink:href> 改写为书籍输出目录下 images/ 中的文件，
+  并在第一次遇到某张图片时立即把转码任务提交到进程池，与其余章节的提取重叠
+- 每张图片按内容哈希命名和去重，转码为限制尺寸的WebP变体（默认 full 1600px、thumb 320px，不放大）
+- 转码结果按 (内容哈希, 变体尺寸, 质量) 缓存在缓存目录中，重复运行和多本书共用的图片不再重新编码
+
+Pillow 为可选依赖：未安装时直接导出原始图片（仍按内容哈希命名并改写引用）。
+"""
+
+import io
+import os
+import posixpath
+import re
+import struct
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple, Union
+from urllib.parse import unquote
+
+import ebooklib
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from content_store import hash_bytes
+
+IMAGE_DIR = "images"
+DEFAULT_VARIANTS = {'full': 1600, 'thumb': 320}  # 变体名 -> 最长边像素
+DEFAULT_WEBP_QUALITY = 80
+TRANSCODABLE_TYPES = frozenset({'image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/webp', 'image/tiff'})
+
+# 章节中的图片引用：<img src="..."> 以及SVG封面常用的 <image xlink:href="...">
+_IMAGE_REF_PATTERN = re.compile(
+    r"""(<(?:img|image)\b[^>]*?\s(?:src|xlink:href|href)\s*=\s*)(["'])(.*?)\2""",
+    re.IGNORECASE | re.DOTALL,
+)
+
+_EXTENSIONS = {
+    'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/svg+xml': '.svg',
+    'image/webp': '.webp', 'image/bmp': '.bmp', 'image/tiff': '.tif',
+}
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def resolve_href(document_name: str, reference: str) -> Optional[str]:
+    """把章节中的相对引用解析为清单中的文件名；外部链接和 data: URI 返回None"""
+    reference = reference.strip()
+    if not reference or reference.startswith(('data:', '//')) or re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', reference):
+        return None
+    reference = unquote(reference.split('#', 1)[0].split('?', 1)[0])
+    return posixpath.normpath(posixpath.join(posixpath.dirname(document_name), reference))
+
+
+def rebase_image_links(html: str, old_prefix: str, new_prefix: str) -> str:
+    """替换图片引用的路径前缀（输出文件所在目录层级不同时使用，例如阅读端章节包）"""
+    def replace(match):
+        value = match.group(3)
+        if value.startswith(old_prefix):
+            value = new_prefix + value[len(old_prefix):]
+        return f"{match.group(1)}{match.group(2)}{value}{match.group(2)}"
+    return _IMAGE_REF_PATTERN.sub(replace, html)
+
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """从文件头读出 PNG/GIF/JPEG/WebP 图片的 (宽, 高)，不需要Pillow；无法识别时返回None"""
+    try:
+        if data[:8] == b"\x89PNG\r\n\x1a\n":
+            return struct.unpack('>II', data[16:24])
+        if data[:6] in (b"GIF87a", b"GIF89a"):
+            return struct.unpack('<HH', data[6:10])
+        if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+            if data[12:16] == b"VP8X":
+                return (int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1)
+            if data[12:16] == b"VP8L":
+                bits = int.from_bytes(data[21:25], 'little')
+                return ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+            if data[12:16] == b"VP8 ":
+                width, height = struct.unpack('<HH', data[26:30])
+                return (width & 0x3FFF, height & 0x3FFF)
+            return None
+        if data[:2] == b"\xff\xd8":
+            position = 2
+            while position + 9 < len(data):
+                if data[position] != 0xFF:
+                    position += 1
+                    continue
+                marker = data[position + 1]
+                if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+                    position += 1 if marker == 0xFF else 2
+                    continue
+                length = struct.unpack('>H', data[position + 2:position + 4])[0]
+                # SOF0-SOF15（不含 DHT/JPG/DAC）中记录了图片尺寸
+                if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                    height, width = struct.unpack('>HH', data[position + 5:position + 9])
+                    return (width, height)
+                position += 2 + length
+    except struct.error:
+        return None
+    return None
+
+
+def transcode_image(data: bytes, variants: Dict[str, int], quality: int) -> Dict[str, bytes]:
+    """把一张图片转码为各尺寸的WebP（在工作进程中运行；动图只取第一帧）"""
+    results = {}
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        for name, max_pixels in variants.items():
+            variant = image.copy()
+            variant.thumbnail((max_pixels, max_pixels))
+            buffer = io.BytesIO()
+            variant.save(buffer, 'WEBP', quality=quality, method=4)
+            results[name] = buffer.getvalue()
+    return results
+
+
+class ImageExporter:
+    """单本书的图片导出：改写章节引用、提交转码任务、提取结束时写出图片文件"""
+
+    def __init__(self, images: Dict[str, Tuple[bytes, str]], cache_dir: Optional[Union[str, Path]] = None,
+                 workers: int = 1, variants: Optional[Dict[str, int]] = None,
+                 quality: int = DEFAULT_WEBP_QUALITY):
+        """images 为清单中的图片：文件名 -> (内容, 媒体类型)"""
+        self.variants = dict(variants or DEFAULT_VARIANTS)
+        self.quality = quality
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.workers = max(1, workers)
+        self.transcode = pillow_available()
+        # 尺寸最大的变体作为章节中 src 指向的文件
+        self.primary_variant = max(self.variants, key=self.variants.get)
+
+        self._images = images
+        self._digests = {href: hash_bytes(data) for href, (data, _) in images.items()}
+        self._referenced: Dict[str, str] = {}      # sha256 -> 首次引用的清单文件名
+        self._futures: Dict[str, Future] = {}      # sha256 -> 转码任务
+        self._exported: Dict[str, Dict[str, Any]] = {}  # sha256 -> 已写出的报告条目
+        self._missing: Set[str] = set()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._start_time = None
+
+    def _webp(self, href: str) -> bool:
+        return self.transcode and self._images[href][1] in TRANSCODABLE_TYPES
+
+    def output_name(self, href: str, variant: Optional[str] = None) -> str:
+        """图片在 images/ 下的文件名（按内容哈希命名，多处引用同一内容时共用）"""
+        stem = self._digests[href][:16]
+        if not self._webp(href):
+            return stem + _EXTENSIONS.get(self._images[href][1], posixpath.splitext(href)[1])
+        variant = variant or self.primary_variant
+        return f"{stem}.webp" if variant == self.primary_variant else f"{stem}.{variant}.webp"
+
+    def rewrite(self, document_name: str, html: str) -> str:
+        """改写一个章节中的图片引用（相对 cleaned_html/ 目录），首次引用的图片立即提交转码"""
+        def replace(match):
+            href = resolve_href(document_name, match.group(3))
+            if href is None:
+                return match.group(0)
+            if href not in self._images:
+                with self._lock:
+                    self._missing.add(href)
+                return match.group(0)
+            self._reference(href)
+            return f"{match.group(1)}{match.group(2)}../{IMAGE_DIR}/{self.output_name(href)}{match.group(2)}"
+        return _IMAGE_REF_PATTERN.sub(replace, html)
+
+    def _cache_path(self, digest: str, variant: str) -> Path:
+        return self.cache_dir / digest[:2] / f"{digest}-{variant}-{self.variants[variant]}-q{self.quality}.webp"
+
+    def _reference(self, href: str):
+        digest = self._digests[href]
+        with self._lock:
+            if digest in self._referenced:
+                return
+            self._referenced[digest] = href
+            if self._start_time is None:
+                self._start_time = time.perf_counter()
+            if not self._webp(href) or self._cached(digest) or self.workers <= 1:
+                return
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            self._futures[digest] = self._pool.submit(
+                transcode_image, self._images[href][0], self.variants, self.quality)
+
+    def _cached(self, digest: str) -> bool:
+        return self.cache_dir is not None and all(
+            self._cache_path(digest, variant).exists() for variant in self.variants)
+
+    def _store_cache(self, digest: str, outputs: Dict[str, bytes]):
+        for variant, data in outputs.items():
+            path = self._cache_path(digest, variant)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+
+    def _export(self, digest: str, href: str, write: Callable[[str, bytes], None]) -> Dict[str, Any]:
+        """写出一张图片的全部变体（必要时等待转码任务），返回报告条目"""
+        data, media_type = self._images[href]
+        entry = {'source': href, 'media_type': media_type, 'sha256': digest, 'original_bytes': len(data),
+                 'files': {}, 'bytes': {}, 'cache_hit': False}
+        outputs = None
+        if self._webp(href):
+            try:
+                if self._cached(digest):
+                    outputs = {variant: self._cache_path(digest, variant).read_bytes() for variant in self.variants}
+                    entry['cache_hit'] = True
+                else:
+                    future = self._futures.pop(digest, None)
+                    outputs = future.result() if future else transcode_image(data, self.variants, self.quality)
+                    if self.cache_dir is not None:
+                        self._store_cache(digest, outputs)
+            except Exception as e:
+                # 引用已指向 .webp 文件名：写出原始内容，浏览器按内容识别格式仍能显示
+                entry['error'] = str(e)
+                outputs = None
+        if outputs is None:
+            outputs = {self.primary_variant: data}
+        for variant, payload in outputs.items():
+            relative = f"{IMAGE_DIR}/{self.output_name(href, variant)}"
+            write(relative, payload)
+            entry['files'][variant] = relative
+            entry['bytes'][variant] = len(payload)
+        return entry
+
+    def publish(self, write: Callable[[str, bytes], None]):
+        """立即写出已引用但尚未写出的图片（渐进式提取发布首章前调用）"""
+        with self._lock:
+            pending = [(digest, href) for digest, href in self._referenced.items() if digest not in self._exported]
+        for digest, href in pending:
+            self._exported[digest] = self._export(digest, href, write)
+
+    def finish(self, write: Callable[[str, bytes], None]) -> Dict[str, Any]:
+        """等待转码完成并写出全部被引用的图片，返回写入报告的摘要"""
+        try:
+            self.publish(write)
+        finally:
+            self.close()
+        entries = list(self._exported.values())
+        totals = {'original': sum(entry['original_bytes'] for entry in entries)}
+        for entry in entries:
+            for variant, size in entry['bytes'].items():
+                totals[variant] = totals.get(variant, 0) + size
+        return {
+            'format': 'webp' if self.transcode else 'original',
+            'variants': self.variants if self.transcode else {},
+            'quality': self.quality if self.transcode else None,
+            'referenced': len(entries),
+            'cache_hits': sum(1 for entry in entries if entry['cache_hit']),
+            'transcoded': sum(1 for entry in entries
+                              if self._webp(entry['source']) and not entry['cache_hit'] and 'error' not in entry),
+            'errors': [{'source': entry['source'], 'error': entry['error']} for entry in entries if 'error' in entry],
+            'missing_references': sorted(self._missing),
+            'bytes': totals,
+            'transcode_ms': (round((time.perf_counter() - self._start_time) * 1000, 1)
+                             if self._start_time is not None else 0.0),
+            'images': entries,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+
+def collect_images(book) -> Dict[str, Tuple[bytes, str]]:
+    """从 ebooklib 书籍对象中取出全部图片：文件名 -> (内容, 媒体类型)"""
+    images = {}
+    for item in book.get_items():
+        if item.get_type() in (ebooklib.ITEM_IMAGE, ebooklib.ITEM_COVER) or \
+                (item.media_type or '').startswith('image/'):
+            images[item.file_name] = (item.get_content(), item.media_type)
+    return images
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟导入
+命令行每次上传启动一个进程，ebooklib、bs4、numpy、进程池等重量级模块在 --help、空目录等
+不需要它们的路径上也会被导入。lazy_import 返回一个模块对象，首次访问属性时才真正执行导入。
+
+用法：在模块顶层写 ``epub = lazy_import('ebooklib.epub')``，调用处使用 ``epub.read_epub(...)``；
+``from x import y`` 会立即触发导入，需要延迟的模块应以 ``模块.名称`` 的形式引用。
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def module_available(name: str) -> bool:
+    """检查模块能否导入（只查找，不执行）"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def lazy_import(name: str) -> ModuleType:
+    """返回延迟执行的模块；已经导入过的模块直接返回"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"找不到模块: {name}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    # 子模块挂到父模块上，与普通 import 的行为一致
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM 分块
+把清理后的章节按结构切成不超过 token 预算的块，放在书籍输出目录的 llm/ 下：
+
+    llm/segments.json    # 分段缓存：每个段落的标签、在清理HTML中的字节偏移、纯文本、句子边界和 token 数
+    llm/chunks.jsonl     # 每行一个块：所属章节、标题路径、段落/句子范围、token 数和文本
+
+- 标题（h1-h6）总是开始新块，块中记录所在的标题路径
+- 段落整段装入；单个段落超出预算时按句子切分，单个句子仍超出预算时独立成块（报告中计为 oversize）
+- 相邻块之间按句子重叠不超过 overlap 个 token（不跨标题）
+
+token 数用本地分词器计算一次（approx / whitespace / tiktoken:<编码> / 模块:函数），按句子保存在分段缓存中。
+换一个预算或重叠重新分块时只读分段缓存，不再解析HTML：
+
+    python llm_chunks.py "extracted_html/A Gentleman in Moscow" --tokens 1024 --overlap 128
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from paragraphs import split_into_paragraphs
+
+CHUNK_DIR = "llm"
+SEGMENTS_NAME = "segments.json"
+CHUNKS_NAME = "chunks.jsonl"
+SEGMENTS_VERSION = 2  # 2：段落按嵌套深度配对结束标签
+DEFAULT_CHUNK_TOKENS = 512
+DEFAULT_CHUNK_OVERLAP = 64
+DEFAULT_TOKENIZER = "approx"
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+# approx：中日韩字符各算一个 token，其他语言的词每4个字符约一个 token，标点各算一个
+_APPROX_TOKEN_PATTERN = re.compile(rf"[{_CJK}]|[^\W{_CJK}]+|[^\w\s]")
+# 句末：中文句号/问号/叹号（可跟右引号）；西文句末标点后跟空白和大写字母、数字或左引号
+_SENTENCE_END_PATTERN = re.compile(
+    r"[。！？!?]+[”’」』）\"']*"
+    r"|[.!?]+[\"'”’)\]]*(?=\s+[\"'“‘(\[]?[A-Z0-9])"
+)
+_ABBREVIATION_PATTERN = re.compile(r"\b(?:Mr|Mrs|Ms|Dr|St|Mt|Jr|Sr|Prof|No|vs|etc)$", re.IGNORECASE)
+
+
+def tiktoken_available() -> bool:
+    return tiktoken is not None
+
+
+def _approx_count(text: str) -> int:
+    return sum(1 if len(piece) == 1 else (len(piece) + 3) // 4 for piece in _APPROX_TOKEN_PATTERN.findall(text))
+
+
+def get_tokenizer(spec: str = DEFAULT_TOKENIZER) -> Callable[[str], int]:
+    """按名称返回 token 计数函数；未知或不可用的分词器抛出 ValueError
+
+    - approx：按字符类别估算（无依赖，默认）
+    - whitespace：按空白分词
+    - tiktoken:<编码名>：tiktoken 的本地编码（如 tiktoken:cl100k_base，需要tiktoken）
+    - <模块>:<函数>：自定义函数，接收文本，返回 token 数或 token 序列
+    """
+    if spec == "approx":
+        return _approx_count
+    if spec == "whitespace":
+        return lambda text: len(text.split())
+    module_name, _, attribute = spec.partition(":")
+    if not attribute:
+        raise ValueError(f"未知的分词器: {spec}")
+    if module_name == "tiktoken":
+        if not tiktoken_available():
+            raise ValueError("tiktoken 分词器需要tiktoken: pip install tiktoken")
+        encoding = tiktoken.get_encoding(attribute)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    try:
+        function = getattr(importlib.import_module(module_name), attribute)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"无法加载分词器 {spec}: {e}")
+
+    def count(text: str) -> int:
+        result = function(text)
+        return result if isinstance(result, int) else len(result)
+    return count
+
+
+def split_sentences(text: str) -> List[int]:
+    """句子的结束位置（字符偏移，最后一个为 len(text)）"""
+    ends = []
+    for match in _SENTENCE_END_PATTERN.finditer(text):
+        if match.group(0)[0] == "." and _ABBREVIATION_PATTERN.search(text[max(0, match.start() - 6):match.start()]):
+            continue
+        if match.end() < len(text) and (not ends or match.end() > ends[-1]):
+            ends.append(match.end())
+    ends.append(len(text))
+    return ends
+
+
+def segment_chapter(html: str, count_tokens: Callable[[str], int]) -> List[Dict[str, Any]]:
+    """把一个清理后的章节拆成段落和句子，计算每个句子的 token 数
+
+    每个段落为 {'tag', 'start', 'end', 'text', 'tokens', 'sentences'}，start/end 为在清理HTML中的字节偏移，
+    sentences 为 [[结束字符偏移, token数], ...]
+    """
+    segments = []
+    for paragraph in split_into_paragraphs(html):
+        text = paragraph['text']
+        if not text:
+            continue
+        sentences, position = [], 0
+        for end in split_sentences(text):
+            sentences.append([end, count_tokens(text[position:end])])
+            position = end
+        segments.append({'tag': paragraph['tag'], 'start': paragraph['start'], 'end': paragraph['end'],
+                         'text': text, 'tokens': sum(tokens for _, tokens in sentences), 'sentences': sentences})
+    return segments
+
+
+def _chapter_digest(html: str) -> str:
+    return hashlib.sha256(html.encode('utf-8')).hexdigest()
+
+
+def build_segments(chapters: List[Tuple[int, str, str]], tokenizer: str = DEFAULT_TOKENIZER,
+                   book_name: str = "", cached: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """chapters 为按spine顺序的 (索引, 输出文件名, 清理后HTML)；内容和分词器都未变的章节沿用 cached 中的分段"""
+    count_tokens = get_tokenizer(tokenizer)
+    reusable = {}
+    if cached and cached.get('version') == SEGMENTS_VERSION and cached.get('tokenizer') == tokenizer:
+        reusable = {chapter['sha256']: chapter['paragraphs'] for chapter in cached.get('chapters', [])}
+    result = []
+    for index, output_filename, cleaned_content in chapters:
+        digest = _chapter_digest(cleaned_content)
+        paragraphs = reusable.get(digest)
+        if paragraphs is None:
+            paragraphs = segment_chapter(cleaned_content, count_tokens)
+        result.append({'index': index, 'source': output_filename, 'sha256': digest, 'paragraphs': paragraphs})
+    return {'version': SEGMENTS_VERSION, 'book': book_name, 'tokenizer': tokenizer, 'chapters': result}
+
+
+def _chunk_text(paragraphs: List[Dict[str, Any]], units: List[Tuple[int, int, int]]) -> str:
+    """块的文本：同一段落内的句子总是连续的，按段落截取原文，段落之间空一行"""
+    ranges: Dict[int, List[int]] = {}
+    for p, s, _ in units:
+        ranges.setdefault(p, [s, s])[1] = s
+    parts = []
+    for p, (first, last) in ranges.items():
+        sentences = paragraphs[p]['sentences']
+        start = sentences[first - 1][0] if first else 0
+        parts.append(paragraphs[p]['text'][start:sentences[last][0]].strip())
+    return "\n\n".join(parts)
+
+
+def chunk_chapter(chapter: Dict[str, Any], max_tokens: int = DEFAULT_CHUNK_TOKENS,
+                  overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """按预算切分一个章节的分段缓存"""
+    paragraphs = chapter['paragraphs']
+    chunks = []
+    headings: List[Tuple[int, str]] = []  # (级别, 标题文本)
+    current: List[Tuple[int, int, int]] = []  # 句子单元 (段落序号, 句子序号, token数)
+    carried = 0  # current 开头来自上一块的重叠单元数
+    has_body = False  # current 中是否已有标题以外的内容
+
+    def flush(keep_overlap: bool):
+        nonlocal current, carried
+        if len(current) > carried:
+            first, last = current[0], current[-1]
+            chunks.append({
+                'chapter': chapter['index'],
+                'source': chapter['source'],
+                'headings': [text for _, text in headings],
+                'start': [first[0], first[1]],
+                'end': [last[0], last[1] + 1],
+                'byte_range': [paragraphs[first[0]]['start'], paragraphs[last[0]]['end']],
+                'tokens': sum(unit[2] for unit in current),
+                'overlap_tokens': sum(unit[2] for unit in current[:carried]),
+                'text': _chunk_text(paragraphs, current),
+            })
+        tail, tokens = [], 0
+        if keep_overlap and overlap > 0:
+            for unit in reversed(current):
+                if tokens + unit[2] > overlap or len(tail) + 1 >= len(current):
+                    break
+                tail.insert(0, unit)
+                tokens += unit[2]
+        current, carried = tail, len(tail)
+
+    def size() -> int:
+        return sum(unit[2] for unit in current)
+
+    for p, paragraph in enumerate(paragraphs):
+        units = [(p, s, tokens) for s, (_, tokens) in enumerate(paragraph['sentences'])]
+        if paragraph['tag'] in HEADING_TAGS:
+            if has_body:  # 连续的标题（如卷名和章名）放在同一块
+                flush(keep_overlap=False)
+                has_body = False
+            level = int(paragraph['tag'][1])
+            headings = [heading for heading in headings if heading[0] < level] + [(level, paragraph['text'])]
+            current.extend(units)
+            continue
+        has_body = True
+        if size() + paragraph['tokens'] <= max_tokens:
+            current.extend(units)
+            continue
+        if paragraph['tokens'] <= max_tokens:
+            flush(keep_overlap=True)
+            while current and size() + paragraph['tokens'] > max_tokens:
+                current.pop(0)  # 重叠部分和整段放不下时让出空间
+                carried -= 1
+            current.extend(units)
+            continue
+        for unit in units:  # 超出预算的段落按句子装入
+            if current and size() + unit[2] > max_tokens:
+                flush(keep_overlap=True)
+                while current and size() + unit[2] > max_tokens:
+                    current.pop(0)
+                    carried -= 1
+            current.append(unit)
+    flush(keep_overlap=False)
+    return chunks
+
+
+def chunk_segments(segments: Dict[str, Any], max_tokens: int = DEFAULT_CHUNK_TOKENS,
+                   overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[Dict[str, Any]]:
+    """切分整本书的分段缓存，块按章节顺序编号"""
+    chunks = []
+    for chapter in segments['chapters']:
+        for number, chunk in enumerate(chunk_chapter(chapter, max_tokens, overlap)):
+            chunk['id'] = f"{Path(chapter['source']).stem}-{number:04d}"
+            chunks.append(chunk)
+    return chunks
+
+
+def chunks_to_jsonl(chunks: List[Dict[str, Any]]) -> bytes:
+    return "".join(json.dumps(chunk, ensure_ascii=False) + "\n" for chunk in chunks).encode('utf-8')
+
+
+def chunk_summary(segments: Dict[str, Any], chunks: List[Dict[str, Any]], max_tokens: int,
+                  overlap: int) -> Dict[str, Any]:
+    paragraphs = [paragraph for chapter in segments['chapters'] for paragraph in chapter['paragraphs']]
+    sizes = [chunk['tokens'] for chunk in chunks]
+    return {
+        'tokenizer': segments['tokenizer'],
+        'max_tokens': max_tokens,
+        'overlap': overlap,
+        'chapters': len(segments['chapters']),
+        'paragraphs': len(paragraphs),
+        'sentences': sum(len(paragraph['sentences']) for paragraph in paragraphs),
+        'tokens': sum(paragraph['tokens'] for paragraph in paragraphs),
+        'chunks': len(chunks),
+        'max_chunk_tokens': max(sizes, default=0),
+        'mean_chunk_tokens': round(sum(sizes) / len(sizes), 1) if sizes else 0,
+        'oversize_chunks': sum(1 for size in sizes if size > max_tokens),
+    }
+
+
+class LLMChunker:
+    """提取结束时生成分段缓存和分块；write(相对路径, 字节) 由调用方提供（提取器中为 BookOutputWriter.write_bytes）"""
+
+    def __init__(self, max_tokens: int = DEFAULT_CHUNK_TOKENS, overlap: int = DEFAULT_CHUNK_OVERLAP,
+                 tokenizer: str = DEFAULT_TOKENIZER):
+        get_tokenizer(tokenizer)  # 提前发现不可用的分词器
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.tokenizer = tokenizer
+
+    def build(self, chapters: List[Tuple[int, str, str]], write: Callable[[str, bytes], None],
+              book_name: str = "") -> Dict[str, Any]:
+        """chapters 为按spine顺序的 (索引, 输出文件名, 清理后HTML)；返回写入报告的摘要"""
+        start = time.perf_counter()
+        segments = build_segments(chapters, self.tokenizer, book_name)
+        segment_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        chunks = chunk_segments(segments, self.max_tokens, self.overlap)
+        chunk_ms = (time.perf_counter() - start) * 1000
+        write(f"{CHUNK_DIR}/{SEGMENTS_NAME}", json.dumps(segments, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        write(f"{CHUNK_DIR}/{CHUNKS_NAME}", chunks_to_jsonl(chunks))
+        return dict(chunk_summary(segments, chunks, self.max_tokens, self.overlap), directory=CHUNK_DIR,
+                    segment_ms=round(segment_ms, 1), chunk_ms=round(chunk_ms, 1))
+
+
+def load_segments(book_dir: Path) -> Optional[Dict[str, Any]]:
+    path = Path(book_dir) / CHUNK_DIR / SEGMENTS_NAME
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def rechunk(book_dir: Path, max_tokens: int, overlap: int, tokenizer: Optional[str] = None,
+            output: Optional[Path] = None) -> Dict[str, Any]:
+    """按新的预算重新分块：沿用分段缓存，不解析HTML；缓存缺失、分词器不同或章节内容变化时只重新分段受影响的章节"""
+    book_dir = Path(book_dir)
+    start = time.perf_counter()
+    cached = load_segments(book_dir)
+    tokenizer = tokenizer or (cached or {}).get('tokenizer') or DEFAULT_TOKENIZER
+    with open(book_dir / 'extraction_report.json', 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    # 读取清理HTML只为核对摘要；内容未变的章节直接沿用缓存
+    chapters = [(record['index'], record['output_name'],
+                 (book_dir / 'cleaned_html' / record['output_name']).read_text(encoding='utf-8'))
+                for record in sorted(report.get('extracted_files', []), key=lambda r: r['index'])]
+    segments = build_segments(chapters, tokenizer, (cached or {}).get('book') or book_dir.name, cached)
+    cached_digests = set()
+    if cached and cached.get('version') == SEGMENTS_VERSION and cached.get('tokenizer') == tokenizer:
+        cached_digests = {chapter['sha256'] for chapter in cached.get('chapters', [])}
+    rebuilt = sum(1 for chapter in segments['chapters'] if chapter['sha256'] not in cached_digests)
+    if rebuilt or segments != cached:
+        path = book_dir / CHUNK_DIR / SEGMENTS_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(segments, ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+    segment_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    chunks = chunk_segments(segments, max_tokens, overlap)
+    chunk_ms = (time.perf_counter() - start) * 1000
+    output = Path(output) if output else book_dir / CHUNK_DIR / CHUNKS_NAME
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(chunks_to_jsonl(chunks))
+    return dict(chunk_summary(segments, chunks, max_tokens, overlap), output=str(output), segmented=rebuilt,
+                segment_ms=round(segment_ms, 1), chunk_ms=round(chunk_ms, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='按新的token预算重新分块（读取 llm/segments.json，不重新解析HTML）')
+    parser.add_argument('book_dir', help='书籍输出目录（含 extraction_report.json）')
+    parser.add_argument('--tokens', type=int, default=DEFAULT_CHUNK_TOKENS, help=f'每块的token预算（默认: {DEFAULT_CHUNK_TOKENS}）')
+    parser.add_argument('--overlap', type=int, default=DEFAULT_CHUNK_OVERLAP, help=f'相邻块的重叠token数（默认: {DEFAULT_CHUNK_OVERLAP}）')
+    parser.add_argument('--tokenizer', help='分词器（默认沿用分段缓存的分词器，没有缓存时为 approx）')
+    parser.add_argument('--output', '-o', help='分块输出路径（默认: 书籍输出目录/llm/chunks.jsonl）')
+    args = parser.parse_args()
+
+    try:
+        summary = rechunk(Path(args.book_dir), args.tokens, args.overlap, args.tokenizer, args.output)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    source = f"重新分段 {summary['segmented']} 个章节" if summary['segmented'] else "使用分段缓存"
+    print(f"✂️ {Path(args.book_dir).name}: {source} ({summary['segment_ms']:.0f} ms)，"
+          f"分块 {summary['chunk_ms']:.0f} ms")
+    print(f"  - {summary['chunks']} 块，平均 {summary['mean_chunk_tokens']} / 最大 {summary['max_chunk_tokens']} token"
+          f"（预算 {summary['max_tokens']}，重叠 {summary['overlap']}，分词器 {summary['tokenizer']}）")
+    if summary['oversize_chunks']:
+        print(f"  - ⚠️ {summary['oversize_chunks']} 块由单个超出预算的句子构成")
+    print(f"💾 分块已保存到: {summary['output']}")
+
+
+if __name__ == "__main__":
+    main()
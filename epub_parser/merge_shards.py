@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片结果合并
+读取各分片运行写出的批次摘要（batch_summary*.json）和其中列出的 extraction_report.json，
+合并成一份目录视图，并检查缺失的分片、缺失/失败的书籍以及重复处理的书籍（同一内容哈希或同名文件出现多次）
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from sharding import SUMMARY_PREFIX, shard_for
+
+DEFAULT_OUTPUT = "catalogue.json"
+
+
+def find_summaries(paths: List[str]) -> List[Path]:
+    """参数可以是摘要文件，也可以是分片的输出目录"""
+    summaries = []
+    for value in paths:
+        path = Path(value)
+        if path.is_dir():
+            summaries.extend(sorted(path.glob(f"{SUMMARY_PREFIX}*.json")))
+        elif path.exists():
+            summaries.append(path)
+        else:
+            print(f"⚠️ 路径不存在: {value}")
+    return summaries
+
+
+def _load_report(report_path: Optional[str], summary_dir: Path) -> Optional[Dict[str, Any]]:
+    """报告路径相对批次摘要所在的目录（sharding.summary_report_path）；旧摘要中的绝对路径原样使用"""
+    if not report_path:
+        return None
+    path = summary_dir / report_path
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def merge_summaries(summary_paths: List[Path], epub_dir: Optional[str] = None) -> Dict[str, Any]:
+    """合并批次摘要，返回 {'shards', 'books', 'problems'}"""
+    shards = []
+    books = []
+    totals = set()
+
+    for summary_path in summary_paths:
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            summary = json.load(f)
+        shard = summary.get('shard')
+        if shard:
+            totals.add(shard['total'])
+        shards.append({
+            'summary': str(summary_path),
+            'shard': shard,
+            'host': summary.get('host'),
+            'finished_at': summary.get('finished_at'),
+            'rules_fingerprint': summary.get('rules_fingerprint'),
+            'assigned': len(summary.get('assigned', [])),
+            'books': len(summary.get('books', [])),
+        })
+        for book in summary.get('books', []):
+            entry = dict(book, shard=shard['index'] if shard else None, host=summary.get('host'))
+            report = (_load_report(book.get('report'), summary_path.parent)
+                      if book.get('status') in ('extracted', 'reused') else None)
+            if report:
+                entry['title'] = report.get('metadata', {}).get('title')
+                entry['author'] = report.get('metadata', {}).get('author')
+                entry['status_in_report'] = report.get('extraction_summary', {}).get('status', 'complete')
+            entry['report_found'] = report is not None
+            books.append(entry)
+
+    problems = {
+        'inconsistent_shard_totals': sorted(totals) if len(totals) > 1 else [],
+        'missing_shards': [],
+        'missing_books': [],
+        'failed_books': [],
+        'skipped_books': [],
+        'missing_reports': [],
+        'duplicate_books': [],
+        'misassigned_books': [],
+    }
+
+    # 缺失的分片
+    if len(totals) == 1:
+        total = totals.pop()
+        present = {s['shard']['index'] for s in shards if s['shard']}
+        problems['missing_shards'] = [i for i in range(total) if i not in present]
+        # 书籍出现在不属于它的分片中（例如用不同的 N 重跑过）
+        problems['misassigned_books'] = [
+            {'name': book['name'], 'shard': book['shard'], 'expected_shard': shard_for(book['name'], total)}
+            for book in books if book['shard'] is not None and shard_for(book['name'], total) != book['shard']
+        ]
+
+    succeeded = [book for book in books if book.get('status') in ('extracted', 'reused')]
+    problems['failed_books'] = [
+        {'name': book['name'], 'shard': book['shard'], 'reason': book.get('reason')}
+        for book in books if book.get('status') == 'failed'
+    ]
+    problems['skipped_books'] = [
+        {'name': book['name'], 'shard': book['shard'], 'reason': book.get('reason')}
+        for book in books if book.get('status') == 'skipped'
+    ]
+    problems['missing_reports'] = [
+        {'name': book['name'], 'report': book.get('report')} for book in succeeded if not book['report_found']
+    ]
+
+    # 重复：同一内容哈希或同一文件名被处理多次
+    by_hash = defaultdict(list)
+    by_name = defaultdict(list)
+    for book in succeeded:
+        by_hash[book['sha256']].append(book)
+        by_name[book['name']].append(book)
+    for key, group in list(by_hash.items()) + list(by_name.items()):
+        if len(group) > 1:
+            problems['duplicate_books'].append({
+                'key': key,
+                'entries': [{'name': b['name'], 'shard': b['shard'], 'host': b['host'], 'epub': b['epub']}
+                            for b in group]
+            })
+
+    # 缺失：输入目录中的书没有任何分片成功处理
+    # 超出压缩包限制而跳过的书单独列出，不算缺失
+    done_names = {book['name'] for book in succeeded + [b for b in books if b.get('status') == 'skipped']}
+    if epub_dir:
+        expected = sorted(path.name for path in Path(epub_dir).rglob("*") if path.suffix.lower() == '.epub')
+    else:
+        expected = sorted({book['name'] for book in books})
+    problems['missing_books'] = [name for name in expected if name not in done_names]
+
+    return {'shards': shards, 'books': books, 'problems': problems}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合并分片提取结果')
+    parser.add_argument('paths', nargs='+', help='批次摘要文件或分片输出目录')
+    parser.add_argument('--epub-dir', help='完整的EPUB输入目录（用于检查缺失的书）')
+    parser.add_argument('--output', '-o', default=DEFAULT_OUTPUT, help=f'合并后的目录视图（默认: {DEFAULT_OUTPUT}）')
+    args = parser.parse_args()
+
+    summary_paths = find_summaries(args.paths)
+    if not summary_paths:
+        print("未找到批次摘要文件")
+        return 1
+
+    catalogue = merge_summaries(summary_paths, args.epub_dir)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(catalogue, f, ensure_ascii=False, indent=2)
+
+    problems = catalogue['problems']
+    print(f"📚 合并 {len(catalogue['shards'])} 个批次摘要，共 {len(catalogue['books'])} 条书籍记录")
+    labels = {
+        'inconsistent_shard_totals': '分片总数不一致',
+        'missing_shards': '缺失的分片',
+        'missing_books': '缺失的书籍',
+        'failed_books': '处理失败的书籍',
+        'skipped_books': '超出压缩包限制而跳过的书籍',
+        'missing_reports': '报告文件不存在',
+        'duplicate_books': '重复处理的书籍',
+        'misassigned_books': '分配到错误分片的书籍',
+    }
+    for key, label in labels.items():
+        items = problems[key]
+        marker = "❌" if items else "✅"
+        print(f"  {marker} {label}: {len(items)}")
+        for item in items[:10]:
+            print(f"      - {item}")
+    print(f"目录视图: {args.output}")
+    return 1 if any(problems.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+导航索引
+目录（NCX / book.toc）和EPUB3导航文档（toc、page-list、landmarks）中的 href 形如 index_split_003.html#filepos12345，
+指向原始文件名和原始元素 id；提取后文件改名为 chapter_NNN_*.html，清理又会剔除一部分带 id 的元素，
+阅读端只能在章节中逐段查找。提取时在清理的同一次遍历中记录每个 id 落在清理结果的哪个段落、哪个字符偏移
+（AnchorTracker，由 rule_engine.clean_soup 调用），结束时把全部目录项解析为 (输出文件, 段落序号, 字符偏移)，
+写入书籍输出目录的 nav_index.json：
+
+- 段落序号与 paragraphs.split_into_paragraphs 一致，偏移为段落纯文本（合并空白后）中的字符偏移，与离线分页相同
+- id 所在元素被剔除（噪声元素、关键字段落、目录链接段落、空段落）时，锚点落到其后第一处保留下来的文字或图片
+- 落在章节最后一段之后的锚点、以及指向被跳过页面的目录项，落到下一个提取章节的开头
+- 降级清理或缓存中没有锚点记录的章节，按清理结果中仍然存在的 id 定位，找不到时落到章节开头
+"""
+
+import json
+import posixpath
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from bs4 import BeautifulSoup, Tag
+
+from paragraphs import PARAGRAPH_TAGS, find_paragraph_spans
+
+NAV_INDEX_NAME = "nav_index.json"
+NAV_INDEX_VERSION = 1
+
+# 解析结果：anchor（按 id 定位）、file（定位到文件开头）、skipped（文件被跳过，落到下一个章节）、
+# section（没有 href 的分组标题，取其后第一个目录项的位置）、missing（无法定位）
+RESOLUTION_KINDS = ('anchor', 'file', 'skipped', 'section', 'missing')
+
+_PARAGRAPH_TAG_SET = frozenset(PARAGRAPH_TAGS)
+_ID_PATTERN = re.compile(rb"""<[a-zA-Z][^>]*?\s(?:id|name)\s*=\s*["']([^"']+)["']""")
+_SCHEME_PATTERN = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+def _decomposed(node) -> bool:
+    # 被 decompose 的元素名称会被清空；Tag.decomposed 对未剔除的元素会落入 __getattr__ 的子元素查找，很慢
+    return not node.name if isinstance(node, Tag) else node.decomposed
+
+
+class AnchorTracker:
+    """在清理遍历中记录锚点（元素 id 和 <a name>）的位置
+
+    rule_engine.clean_soup 进入元素时调用 enter，剔除噪声元素前调用 removed，遇到文本时调用 text，离开元素时调用 leave；
+    锚点先挂到其后第一处段落内的文字或图片上，全部剔除完成后由 resolve 换算成清理结果中的 [段落序号, 字符偏移]
+    """
+
+    __slots__ = ('_pending', '_targets', '_bound', '_paragraphs', '_current', '_length', '_gap')
+
+    def __init__(self):
+        self._pending: List[str] = []  # 等待下一处文字或图片的锚点
+        self._targets: List[Tuple[Any, Any, int]] = []  # (文本节点或img, 所在段落元素, 字符偏移)，文档顺序
+        self._bound: Dict[str, int] = {}  # 锚点 -> targets 下标
+        self._paragraphs: List[Any] = []  # 最外层段落元素，文档顺序
+        self._current = None
+        self._length = 0  # 当前段落已合并空白的文本长度（不含末尾空白）
+        self._gap = False  # 当前段落末尾是否有待合并的空白
+
+    def _add_anchors(self, element):
+        anchor = element.attrs.get('id')
+        if anchor:
+            self._pending.append(anchor)
+        if element.name == 'a' and element.attrs.get('name'):
+            self._pending.append(element.attrs['name'])
+
+    def _bind(self, node, offset: int):
+        if self._pending:
+            index = len(self._targets)
+            for anchor in self._pending:
+                self._bound.setdefault(anchor, index)
+            self._pending = []
+        self._targets.append((node, self._current, offset))
+
+    def enter(self, element):
+        if self._current is None and element.name in _PARAGRAPH_TAG_SET:
+            self._current = element
+            self._paragraphs.append(element)
+            self._length, self._gap = 0, False
+        self._add_anchors(element)
+        if element.name == 'img' and self._current is not None:
+            self._bind(element, self._length + (1 if self._length and self._gap else 0))
+
+    def removed(self, element):
+        """元素在进入时即被剔除：它和后代的锚点交给其后的内容"""
+        self._add_anchors(element)
+        for descendant in element.find_all(True):
+            self._add_anchors(descendant)
+
+    def text(self, string: str):
+        if self._current is None:
+            return
+        words = string.split()
+        if not words:
+            self._gap = self._gap or bool(string)
+            return
+        if self._length and (self._gap or string[0].isspace()):
+            self._length += 1
+        self._bind(string, self._length)
+        self._length += sum(map(len, words)) + len(words) - 1
+        self._gap = string[-1].isspace()
+
+    def leave(self, element):
+        # 段落到最外层段落元素自身结束为止（与 paragraphs 中按嵌套深度配对结束标签一致）
+        if element is self._current:
+            self._current = None
+
+    def resolve(self) -> Dict[str, Any]:
+        """剔除完成后调用：返回 {'paragraphs': 段落数, 'anchors': {锚点: [段落序号, 字符偏移]}}
+
+        其后已没有保留内容的锚点记为 [段落数, 0]（章节末尾）
+        """
+        ordinals = {}
+        for element in self._paragraphs:
+            if not _decomposed(element):
+                ordinals[id(element)] = len(ordinals)
+        count = len(ordinals)
+
+        # 每个挂载点之后（含自身）第一处保留下来的位置
+        positions: List[Optional[List[int]]] = [None] * len(self._targets)
+        following = [count, 0]
+        for index in range(len(self._targets) - 1, -1, -1):
+            node, paragraph, offset = self._targets[index]
+            if not _decomposed(node):
+                following = [ordinals[id(paragraph)], offset]
+            positions[index] = following
+
+        anchors = {anchor: positions[index] for anchor, index in self._bound.items()}
+        for anchor in self._pending:
+            anchors.setdefault(anchor, [count, 0])
+        return {'paragraphs': count, 'anchors': anchors}
+
+
+def anchor_record(html: str) -> Dict[str, Any]:
+    """没有遍历记录时（降级清理、旧的缓存结果）按清理结果中仍存在的 id 定位，偏移记为0"""
+    data = html.encode('utf-8')
+    ends = [end for _, end in find_paragraph_spans(data)]
+    anchors = {}
+    for match in _ID_PATTERN.finditer(data):
+        paragraph = _bisect(ends, match.start())
+        anchors.setdefault(match.group(1).decode('utf-8'), [paragraph, 0])
+    return {'paragraphs': len(ends), 'anchors': anchors}
+
+
+def _bisect(ends: List[int], position: int) -> int:
+    """第一个结束位置大于 position 的段落（即 position 所在或其后的段落）"""
+    low, high = 0, len(ends)
+    while low < high:
+        middle = (low + high) // 2
+        if ends[middle] <= position:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+# ---- 目录项 ----
+
+def _normalize_href(href: str, base: Optional[str] = None) -> str:
+    """把 href 换算成相对于OPF目录的 文件名#片段（base 为 href 所在文档；外部链接原样返回）"""
+    href = (href or '').strip()
+    if not href or _SCHEME_PATTERN.match(href):
+        return href
+    path, _, fragment = href.partition('#')
+    path = unquote(path.split('?', 1)[0])
+    if base is not None:
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(base), path)) if path else base
+    return f"{path}#{fragment}" if fragment else path
+
+
+def flatten_toc(items, level: int = 0) -> List[Dict[str, Any]]:
+    """展开 ebooklib 的 book.toc（Link、(Section, 子项列表) 元组和嵌套列表），返回 [{'title', 'href', 'level'}]"""
+    entries = []
+    for item in items:
+        if isinstance(item, tuple) and len(item) == 2 and hasattr(item[0], 'title'):
+            section, children = item
+            entries.append({'title': section.title, 'href': _normalize_href(getattr(section, 'href', '')),
+                            'level': level})
+            entries.extend(flatten_toc(children, level + 1))
+        elif isinstance(item, (list, tuple)):
+            entries.extend(flatten_toc(item, level))
+        elif hasattr(item, 'title'):
+            entries.append({'title': item.title, 'href': _normalize_href(getattr(item, 'href', '')), 'level': level})
+    return entries
+
+
+def parse_nav_document(file_name: str, content: bytes) -> List[Dict[str, Any]]:
+    """解析EPUB3导航文档中全部 <nav>，返回 [{'kind', 'title', 'href', 'level'}]（kind 为 epub:type，如 toc、page-list）"""
+    soup = BeautifulSoup(content, 'html.parser')
+    entries = []
+
+    def walk(ol, kind, level):
+        for li in ol.find_all('li', recursive=False):
+            label = li.find(['a', 'span'], recursive=False)
+            if label is not None:
+                entries.append({'kind': kind, 'title': label.get_text(" ", strip=True),
+                                'href': _normalize_href(label.get('href', ''), file_name), 'level': level})
+            for child in li.find_all('ol', recursive=False):
+                walk(child, kind, level + 1)
+
+    for nav in soup.find_all('nav'):
+        kind = (nav.get('epub:type') or nav.get('role') or 'toc').split()[0].replace('doc-', '')
+        for ol in nav.find_all('ol', recursive=False):
+            walk(ol, kind, 0)
+    return entries
+
+
+def collect_entries(book) -> List[Dict[str, Any]]:
+    """书中全部目录项：book.toc（kind 为 toc），以及导航文档中不重复的项（toc、page-list、landmarks 等）"""
+    entries = [dict(kind='toc', **entry) for entry in flatten_toc(book.toc)]
+    seen = {(entry['kind'], entry['href'], entry['title']) for entry in entries}
+    for item in book.get_items():
+        if 'nav' not in (getattr(item, 'properties', None) or []):
+            continue
+        for entry in parse_nav_document(item.file_name, item.get_content()):
+            key = (entry['kind'], entry['href'], entry['title'])
+            if key not in seen:
+                seen.add(key)
+                entries.append(entry)
+    return entries
+
+
+# ---- 解析 ----
+
+def build_nav_index(entries: List[Dict[str, Any]], spine: List[Tuple[int, str]],
+                    chapters: Dict[int, Dict[str, Any]], book_name: str = "") -> Dict[str, Any]:
+    """把目录项解析到提取结果中的位置
+
+    spine 为全部spine项目的 (索引, 原始文件名)（含被跳过的），chapters 为提取的章节：
+    索引 -> {'original_name', 'output_name', 'paragraphs', 'anchors'}
+    """
+    order = [index for index, _ in spine]
+    spine_position = {file_name: position for position, (_, file_name) in enumerate(spine)}
+
+    def chapter_start(position: int) -> Optional[List[Any]]:
+        """spine中第 position 项及其后第一个提取章节的开头"""
+        for index in order[position:]:
+            if index in chapters:
+                return [index, 0, 0]
+        return None
+
+    resolved = []
+    for entry in entries:
+        file_name, _, fragment = entry['href'].partition('#')
+        kind, target = 'missing', None
+        position = spine_position.get(file_name)
+        if not entry['href']:
+            kind = 'section'
+        elif position is not None:
+            index = order[position]
+            chapter = chapters.get(index)
+            if chapter is None:
+                kind, target = 'skipped', chapter_start(position)
+            else:
+                location = chapter['anchors'].get(fragment) if fragment else None
+                kind = 'anchor' if location is not None else 'file'
+                if location is None:
+                    target = [index, 0, 0]
+                elif location[0] >= chapter['paragraphs']:
+                    target = chapter_start(position + 1)
+                else:
+                    target = [index] + list(location)
+        resolved.append((entry, kind if target is not None or kind == 'section' else 'missing', target))
+
+    # 分组标题取其后第一个已定位目录项的位置
+    following = None
+    for position in range(len(resolved) - 1, -1, -1):
+        entry, kind, target = resolved[position]
+        if kind == 'section':
+            resolved[position] = (entry, kind if following else 'missing', following)
+        elif target is not None:
+            following = target
+
+    output = []
+    for entry, kind, target in resolved:
+        record = {'kind': entry['kind'], 'title': entry['title'], 'level': entry['level'], 'href': entry['href'],
+                  'resolved': kind, 'chapter': None, 'file': None, 'paragraph': None, 'offset': None}
+        if target is not None:
+            record.update(chapter=target[0], file=chapters[target[0]]['output_name'],
+                          paragraph=target[1], offset=target[2])
+        output.append(record)
+    return {
+        'version': NAV_INDEX_VERSION,
+        'book': book_name,
+        'files': {chapter['original_name']: chapter['output_name'] for _, chapter in sorted(chapters.items())},
+        'entries': output,
+    }
+
+
+def nav_index_summary(index: Dict[str, Any], build_ms: float) -> Dict[str, Any]:
+    counts = dict.fromkeys(RESOLUTION_KINDS, 0)
+    for entry in index['entries']:
+        counts[entry['resolved']] += 1
+    return {'path': NAV_INDEX_NAME, 'entries': len(index['entries']), 'resolved': counts,
+            'build_ms': round(build_ms, 1)}
+
+
+class NavIndexBuilder:
+    """提取结束时生成导航索引；write(相对路径, 字节) 由调用方提供（提取器中为 BookOutputWriter.write_bytes）"""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        self.entries = entries
+
+    def build(self, spine: List[Tuple[int, str]], chapters: Dict[int, Dict[str, Any]],
+              write: Callable[[str, bytes], None], book_name: str = "") -> Dict[str, Any]:
+        start = time.perf_counter()
+        index = build_nav_index(self.entries, spine, chapters, book_name)
+        write(NAV_INDEX_NAME, json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        return nav_index_summary(index, (time.perf_counter() - start) * 1000)
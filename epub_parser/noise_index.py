@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复噪声页面索引
+用 MinHash 签名 + LSH 分桶索引历史提取报告中被跳过的页面，
+新章节只需计算一次签名并查询少量分桶，即可识别措辞略有不同的出版社广告页/版权页
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import time
+import zlib
+from pathlib import Path, PureWindowsPath
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+
+INDEX_VERSION = 1
+
+# 默认参数：64个签名位，16个band × 每band 4行，LSH候选阈值约为 (1/16)^(1/4) ≈ 0.5
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.8
+MIN_TEXT_CHARS = 20  # 过短的文本没有区分度，不参与索引和查询
+MAX_TEXT_CHARS = 20000  # 超长文本不可能是样板页，直接跳过
+
+_WHITESPACE = re.compile(r"\s+")
+_MAX_HASH = 0xFFFFFFFF
+
+
+def normalize_text(text: str) -> str:
+    """小写并去除空白，使排版差异不影响签名"""
+    return _WHITESPACE.sub("", text).lower()
+
+
+class MinHashNoiseIndex:
+    """噪声页面 MinHash/LSH 索引
+
+    签名采用单次哈希的 one-permutation MinHash：每个 shingle 只计算一次 crc32，
+    按哈希值分配到 num_perm 个桶并取桶内最小值，空桶向后借用相邻桶的值（densification）。
+    """
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, bands: int = DEFAULT_BANDS,
+                 shingle_size: int = DEFAULT_SHINGLE_SIZE, threshold: float = DEFAULT_THRESHOLD):
+        if num_perm % bands != 0:
+            raise ValueError(f"num_perm ({num_perm}) 必须是 bands ({bands}) 的整数倍")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        self.entries: List[Dict[str, Any]] = []
+        self._signatures: List[Tuple[int, ...]] = []
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._entries_digest = None  # 条目摘要缓存，加入条目时失效
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        """计算文本签名；文本过短或过长时返回None"""
+        text = normalize_text(text)
+        if len(text) < MIN_TEXT_CHARS or len(text) > MAX_TEXT_CHARS:
+            return None
+
+        num_perm = self.num_perm
+        bucket_width = (_MAX_HASH // num_perm) + 1
+        signature = [_MAX_HASH] * num_perm
+        k = self.shingle_size
+        for i in range(max(1, len(text) - k + 1)):
+            h = zlib.crc32(text[i:i + k].encode('utf-8'))
+            bucket = h // bucket_width
+            value = h % bucket_width
+            if value < signature[bucket]:
+                signature[bucket] = value
+
+        # 空桶向后借用（环形），偏移量参与编码以区分借来的值
+        if _MAX_HASH in signature:
+            original = list(signature)
+            for i in range(num_perm):
+                if original[i] == _MAX_HASH:
+                    step = 1
+                    while original[(i + step) % num_perm] == _MAX_HASH:
+                        step += 1
+                    signature[i] = original[(i + step) % num_perm] + step * bucket_width
+        return tuple(signature)
+
+    def _band_keys(self, signature: Tuple[int, ...]) -> Iterable[Tuple[int, Tuple[int, ...]]]:
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    def add(self, text: str, source: str, skip_reason: str = "") -> bool:
+        """把一个已知噪声页面加入索引，返回是否成功（文本不适合时返回False）"""
+        signature = self.signature(text)
+        if signature is None:
+            return False
+        self._add_signature(signature, {'source': source, 'skip_reason': skip_reason})
+        return True
+
+    def _add_signature(self, signature: Tuple[int, ...], entry: Dict[str, Any]):
+        self._entries_digest = None
+        entry_id = len(self.entries)
+        self.entries.append(entry)
+        self._signatures.append(signature)
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(entry_id)
+
+    def query(self, text: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        """查询最相似的已知噪声页面，返回 (条目, 估计相似度)；低于阈值返回None"""
+        signature = self.signature(text)
+        if signature is None or not self.entries:
+            return None
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best = None
+        best_similarity = 0.0
+        for entry_id in candidates:
+            other = self._signatures[entry_id]
+            similarity = sum(1 for a, b in zip(signature, other) if a == b) / self.num_perm
+            if similarity > best_similarity:
+                best, best_similarity = entry_id, similarity
+
+        if best is None or best_similarity < self.threshold:
+            return None
+        return self.entries[best], best_similarity
+
+    def digest(self) -> str:
+        """索引内容（签名参数、阈值、签名和条目）的摘要；换一个索引可能改变噪声判定，共享存储的缓存键需要区分"""
+        if self._entries_digest is None:
+            h = hashlib.sha256(f"{self.num_perm}|{self.bands}|{self.shingle_size}".encode('utf-8'))
+            for entry, signature in zip(self.entries, self._signatures):
+                h.update(json.dumps([signature, entry], ensure_ascii=False, sort_keys=True).encode('utf-8'))
+            self._entries_digest = h.hexdigest()
+        return hashlib.sha256(f"{self._entries_digest}|{self.threshold}".encode('utf-8')).hexdigest()[:16]
+
+    def save(self, path: str):
+        """保存索引（签名和来源），分桶在加载时重建"""
+        data = {
+            'version': INDEX_VERSION,
+            'num_perm': self.num_perm,
+            'bands': self.bands,
+            'shingle_size': self.shingle_size,
+            'entries': [dict(entry, signature=list(signature))
+                        for entry, signature in zip(self.entries, self._signatures)]
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = DEFAULT_THRESHOLD) -> 'MinHashNoiseIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"不支持的噪声索引版本: {data.get('version')}")
+
+        index = cls(data['num_perm'], data['bands'], data['shingle_size'], threshold)
+        for entry in data['entries']:
+            signature = tuple(entry.pop('signature'))
+            index._add_signature(signature, entry)
+        return index
+
+
+def page_text(content: str) -> str:
+    """与 is_noise_page 一致的文本提取方式"""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup(content, 'html.parser').get_text(strip=True)
+
+
+def _locate_epub(epub_source: str, epub_dirs: List[Path]) -> Optional[Path]:
+    """报告中记录的路径可能来自其他机器（包括Windows路径），按文件名在候选目录中查找"""
+    path = Path(epub_source)
+    if path.exists():
+        return path
+    name = PureWindowsPath(epub_source).name
+    for directory in epub_dirs:
+        candidate = directory / name
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def build_from_reports(reports_root: str, epub_dirs: List[str] = None,
+                       index: MinHashNoiseIndex = None) -> MinHashNoiseIndex:
+    """扫描目录下所有 extraction_report.json，把其中 skipped_files 对应的页面加入索引"""
+    from ebooklib import epub
+
+    index = index or MinHashNoiseIndex()
+    epub_dirs = [Path(d) for d in (epub_dirs or [])]
+
+    for report_path in sorted(Path(reports_root).rglob('extraction_report.json')):
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+
+        skipped = report.get('skipped_files', [])
+        if not skipped:
+            continue
+
+        epub_source = report.get('extraction_summary', {}).get('epub_source', '')
+        epub_path = _locate_epub(epub_source, epub_dirs)
+        if not epub_path:
+            print(f"  ⚠️ 找不到源EPUB，跳过: {epub_source}")
+            continue
+
+        book = epub.read_epub(str(epub_path))
+        added = 0
+        for skipped_file in skipped:
+            item = book.get_item_with_id(skipped_file.get('item_id'))
+            if item is None:
+                continue
+            text = page_text(item.get_content().decode('utf-8', errors='ignore'))
+            source = f"{epub_path.stem}/{skipped_file['file_name']}"
+            if index.add(text, source, skipped_file.get('skip_reason', '')):
+                added += 1
+        print(f"  ✓ {epub_path.name}: 加入 {added}/{len(skipped)} 个噪声页面")
+
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='近似重复噪声页面索引')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='根据历史提取报告构建索引')
+    build_parser.add_argument('reports_root', help='包含 extraction_report.json 的目录（递归扫描）')
+    build_parser.add_argument('--epub-dir', action='append', default=[], help='源EPUB的查找目录（可多次指定）')
+    build_parser.add_argument('--output', '-o', default='noise_index.json', help='索引输出路径')
+
+    query_parser = subparsers.add_parser('query', help='查询HTML文件是否与已知噪声页面近似重复')
+    query_parser.add_argument('index', help='索引文件路径')
+    query_parser.add_argument('html_files', nargs='+', help='要查询的HTML文件')
+    query_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='相似度阈值')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        index = build_from_reports(args.reports_root, args.epub_dir)
+        index.save(args.output)
+        print(f"\n索引构建完成: {len(index)} 个噪声页面 -> {args.output}")
+        return
+
+    index = MinHashNoiseIndex.load(args.index, args.threshold)
+    for html_file in args.html_files:
+        with open(html_file, 'r', encoding='utf-8') as f:
+            text = page_text(f.read())
+        start = time.perf_counter()
+        match = index.query(text)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if match:
+            entry, similarity = match
+            print(f"  ⊘ {html_file}: 近似 {entry['source']} (相似度 {similarity:.2f}, {elapsed_ms:.2f}ms)")
+        else:
+            print(f"  ✓ {html_file}: 未命中 ({elapsed_ms:.2f}ms)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+噪声页面预分拣
+在构建DOM之前直接扫描原始字节，解决显而易见的情况（文件名命中、标题命中、正文明显足够长），
+只有无法确定的页面才交给 is_noise_page 做完整解析
+"""
+
+import html
+import re
+from typing import Optional, Tuple, Dict, Any, Iterable
+
+from config import NOISE_TITLES, NOISE_FILENAMES, MEANINGFUL_TAGS, MIN_TEXT_LENGTH, MIN_MEANINGFUL_TAGS
+
+# 分拣层级（写入报告的键）
+TIER_FILENAME = 'filename'
+TIER_BYTE_SCAN = 'byte_scan'
+TIER_DOM = 'dom'
+TRIAGE_TIERS = (TIER_FILENAME, TIER_BYTE_SCAN, TIER_DOM)
+
+# 不产生文本/标签的区域：注释、CDATA、script/style 内容
+_INVISIBLE_PATTERN = re.compile(
+    rb"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<(script|style)\b[^>]*>.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_HEADING_OPEN_PATTERN = re.compile(rb"<(?:title|h[1-3])\b", re.IGNORECASE)
+_HEADING_PATTERN = re.compile(rb"<(title|h[1-3])\b[^>]*>(.*?)</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_NAME_PATTERN = re.compile(rb"<([a-zA-Z][a-zA-Z0-9:-]*)")
+_MARKUP_PATTERN = re.compile(rb"<[^>]*>")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+_MEANINGFUL_TAG_BYTES = frozenset(tag.encode('ascii') for tag in MEANINGFUL_TAGS)
+
+
+def _visible_text_pieces(fragment: bytes):
+    """按标签切分并逐段去空白，与 get_text(strip=True) 的拼接方式一致"""
+    for piece in _MARKUP_PATTERN.split(fragment):
+        text = html.unescape(piece.decode('utf-8', errors='ignore')).strip()
+        if text:
+            yield text
+
+
+def triage_noise_page(file_name: str, raw: bytes, config: Dict[str, Any],
+                      max_dom_free_text: Optional[int] = None,
+                      noise_filenames: Iterable[str] = NOISE_FILENAMES,
+                      noise_titles: Iterable[str] = NOISE_TITLES) -> Tuple[Optional[bool], str, str]:
+    """预分拣，返回 (是否为噪声 / None表示无法确定, 跳过原因, 分拣层级)
+
+    max_dom_free_text: 若设置，正文（去除全部空白后）不超过该长度的页面必须走完整解析
+    （例如启用近似重复噪声索引时，需要由DOM提取的文本参与比对）。
+    noise_filenames / noise_titles: 规则配置档合并后的列表（rule_engine.CompiledRules 的同名属性），默认为全局规则
+    """
+    # 第一层：文件名规则，不读取内容
+    lower_name = file_name.lower()
+    for noise_keyword in noise_filenames:
+        if noise_keyword.lower() in lower_name:
+            return True, f"文件名包含噪声关键字: {noise_keyword}", TIER_FILENAME
+
+    if not raw:
+        return None, "", TIER_DOM
+
+    # 第二层：字节扫描
+    visible = _INVISIBLE_PATTERN.sub(b"", raw)
+
+    # 标题：开标签和完整元素数量不一致（未闭合等异常结构）时无法确定
+    headings = _HEADING_PATTERN.findall(visible)
+    if len(headings) != len(_HEADING_OPEN_PATTERN.findall(visible)):
+        return None, "", TIER_DOM
+    for _, inner in headings:
+        title_text = "".join(_visible_text_pieces(inner))
+        for noise_title in noise_titles:
+            if noise_title in title_text:
+                return True, f"标题包含噪声关键字: {noise_title}", TIER_BYTE_SCAN
+
+    pieces = list(_visible_text_pieces(visible))
+    text_length = sum(len(piece) for piece in pieces)
+    if max_dom_free_text is not None:
+        compact_length = sum(len(_WHITESPACE_PATTERN.sub("", piece)) for piece in pieces)
+        # 字节估算与DOM文本可能有少量出入，留出余量
+        if compact_length <= max_dom_free_text * 1.2:
+            return None, "", TIER_DOM
+
+    # 空白页判定要求“文本过短”且“有意义标签过少”，任一条件明确不满足即为正常页面
+    meaningful_count = 0
+    for name in _TAG_NAME_PATTERN.findall(visible):
+        if name.lower() in _MEANINGFUL_TAG_BYTES:
+            meaningful_count += 1
+            if meaningful_count >= MIN_MEANINGFUL_TAGS:
+                return False, "", TIER_BYTE_SCAN
+
+    min_text_length = config.get('min_text_length', MIN_TEXT_LENGTH)
+    # 字节估算的文本长度与DOM结果可能有少量出入，留出余量
+    if text_length >= 2 * min_text_length:
+        return False, "", TIER_BYTE_SCAN
+
+    # 疑似空白页：不保留封面时直接判定，否则需要DOM检查封面元素
+    if not config.get('keep_cover', True) and text_length == 0 and meaningful_count == 0:
+        return True, "空白页面 (文本长度: 0, 有意义标签: 0)", TIER_BYTE_SCAN
+
+    return None, "", TIER_DOM
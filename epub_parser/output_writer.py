@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+原子输出写入
+一本书的全部输出先写入同级的临时目录（.书名.staging-进程号-序号），完成后整体改名为最终目录：
+提取中途崩溃只会留下临时目录，不会出现“看起来完整”的半成品；下次提取同一本书时清理。
+只清理所属进程已经退出的临时目录，另一个进程正在写的同一本书不受影响；
+提交时在两次改名之间崩溃留下的 .书名.previous-进程号-序号 目录，在最终目录缺失时改回最终目录。
+
+小文件先缓存在内存中，累计到 batch_bytes 后集中写出（多个线程并发写，网络文件系统上可以重叠每次
+open/close 的往返延迟）；fsync 策略：
+
+- none：不调用 fsync（进程崩溃安全，掉电不保证）
+- commit：提交时对全部文件和目录统一 fsync 一次
+- always：每个文件写出后立即 fsync；由其他组件通过 path() 直接写出的文件（报告、章节存储、共享存储的硬链接）
+  写出时机不经过本模块，提交改名前统一 fsync
+"""
+
+import itertools
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple, Union
+
+FSYNC_POLICIES = ('none', 'commit', 'always')
+STAGING_MARKER = '.staging-'
+PREVIOUS_MARKER = '.previous-'
+DEFAULT_BATCH_BYTES = 4 * 1024 * 1024
+DEFAULT_FLUSH_THREADS = 4
+
+
+def _fsync_path(path: Path, directory: bool = False):
+    """对文件或目录 fsync（不支持目录 fsync 的平台上忽略）"""
+    flags = os.O_RDONLY
+    if directory:
+        flags |= getattr(os, 'O_DIRECTORY', 0)
+    try:
+        fd = os.open(str(path), flags)
+    except OSError:
+        if directory:
+            return
+        raise
+    try:
+        os.fsync(fd)
+    except OSError:
+        if not directory:
+            raise
+    finally:
+        os.close(fd)
+
+
+_writer_ids = itertools.count()
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否仍在运行（无法判断时按仍在运行处理，不删除它的目录）"""
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # Windows 上 os.kill 会结束目标进程，不能用来探测
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _leftovers(final_dir: Path, marker: str) -> List[Path]:
+    """同级目录中所属进程已经退出的 .书名<marker>进程号-序号 目录"""
+    prefix = f".{final_dir.name}{marker}"
+    found = []
+    if final_dir.parent.exists():
+        for candidate in final_dir.parent.iterdir():
+            if not candidate.name.startswith(prefix) or not candidate.is_dir():
+                continue
+            pid = candidate.name[len(prefix):].split('-', 1)[0]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                found.append(candidate)
+    return found
+
+
+def cleanup_stale_staging(final_dir: Path) -> int:
+    """删除之前中断的提取留下的临时目录（只删除所属进程已退出的），返回删除数量；
+    提交中途中断留下的旧目录在最终目录缺失时改回最终目录，否则删除"""
+    removed = 0
+    for candidate in _leftovers(final_dir, STAGING_MARKER):
+        shutil.rmtree(candidate, ignore_errors=True)
+        removed += 1
+    for candidate in sorted(_leftovers(final_dir, PREVIOUS_MARKER)):
+        if not final_dir.exists():
+            os.replace(candidate, final_dir)
+        else:
+            shutil.rmtree(candidate, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+class BookOutputWriter:
+    """单本书的输出写入器：暂存 → 提交（改名）"""
+
+    def __init__(self, final_dir: Union[str, Path], fsync: str = 'none',
+                 batch_bytes: int = DEFAULT_BATCH_BYTES, atomic: bool = True,
+                 flush_threads: int = DEFAULT_FLUSH_THREADS):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"未知的fsync策略: {fsync}（可选: {', '.join(FSYNC_POLICIES)}）")
+        self.final_dir = Path(final_dir)
+        self.fsync = fsync
+        self.batch_bytes = batch_bytes
+        self.atomic = atomic
+        self.flush_threads = flush_threads
+        # 进程号之后加序号：同一进程中同一本书的两个写入器也不共用临时目录
+        self._suffix = f"{os.getpid()}-{next(_writer_ids)}"
+        self.root = (self.final_dir.parent / f".{self.final_dir.name}{STAGING_MARKER}{self._suffix}"
+                     if atomic else self.final_dir)
+        self.committed = False
+        self.files_written = 0
+        self.bytes_written = 0
+        self.flushes = 0
+        self._pending: List[Tuple[Path, Union[str, bytes]]] = []
+        self._pending_bytes = 0
+        self._written: List[Path] = []
+        self._external: List[Path] = []  # 通过 path() 交给其他组件直接写出的文件
+        self._lock = threading.Lock()
+
+        cleanup_stale_staging(self.final_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, relative: Union[str, Path]) -> Path:
+        """暂存目录中的路径（供直接写文件的组件使用，例如章节存储和共享存储的硬链接）"""
+        self._check_root()
+        path = self.root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._written.append(path)
+            self._external.append(path)
+        return path
+
+    def _check_root(self):
+        """临时目录被删除时报错，而不是重新创建后提交一个残缺的目录"""
+        if not self.root.is_dir():
+            raise FileNotFoundError(f"输出目录已被删除: {self.root}")
+
+    def final_path(self, path: Union[str, Path]) -> Path:
+        """暂存目录中的路径提交后对应的最终路径"""
+        return self.final_dir / Path(path).relative_to(self.root)
+
+    def makedirs(self, relative: Union[str, Path]) -> Path:
+        self._check_root()
+        path = self.root / relative
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def write_text(self, relative: Union[str, Path], text: str):
+        """缓存一个文本文件（UTF-8，与 open(..., 'w') 的换行处理一致）"""
+        self._queue(relative, text, len(text))
+
+    def write_bytes(self, relative: Union[str, Path], data: bytes):
+        self._queue(relative, data, len(data))
+
+    def _queue(self, relative, data, size: int):
+        with self._lock:
+            self._pending.append((self.root / relative, data))
+            self._pending_bytes += size
+            if self._pending_bytes >= self.batch_bytes:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._check_root()
+        for directory in {path.parent for path, _ in self._pending}:
+            directory.mkdir(parents=True, exist_ok=True)
+        sizes = self._map(self._write_file, self._pending)
+        self._written.extend(path for path, _ in self._pending)
+        self.files_written += len(sizes)
+        self.bytes_written += sum(sizes)
+        self._pending = []
+        self._pending_bytes = 0
+        self.flushes += 1
+
+    def _map(self, function, items: list) -> list:
+        """并发执行一批文件操作"""
+        if self.flush_threads > 1 and len(items) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.flush_threads, len(items))) as pool:
+                return list(pool.map(function, items))
+        return [function(item) for item in items]
+
+    def _write_file(self, entry: Tuple[Path, Union[str, bytes]]) -> int:
+        path, data = entry
+        if isinstance(data, str):
+            f = open(path, 'w', encoding='utf-8')
+        else:
+            f = open(path, 'wb')
+        with f:
+            f.write(data)
+            if self.fsync == 'always':
+                f.flush()
+                os.fsync(f.fileno())
+            return f.tell()
+
+    def commit(self) -> Path:
+        """写出剩余缓存并把暂存目录改名为最终目录"""
+        self.flush()
+        self._check_root()
+        if self.fsync == 'commit':
+            self._map(_fsync_path, [path for path in self._written if path.exists()])
+        elif self.fsync == 'always':
+            # 批量写出的文件已逐个 fsync，其他组件直接写出的文件在这里补上
+            self._map(_fsync_path, [path for path in self._external if path.exists()])
+        if self.fsync != 'none':
+            # 新建文件的目录项同样需要落盘
+            for directory in sorted({path.parent for path in self._written} | {self.root}):
+                _fsync_path(directory, directory=True)
+
+        if self.atomic:
+            # 目录不能直接覆盖：先把旧目录移开，再改名，最后删除旧目录
+            previous = None
+            if self.final_dir.exists():
+                previous = self.final_dir.parent / f".{self.final_dir.name}{PREVIOUS_MARKER}{self._suffix}"
+                if previous.exists():
+                    shutil.rmtree(previous)
+                os.replace(self.final_dir, previous)
+            os.replace(self.root, self.final_dir)
+            if previous is not None:
+                shutil.rmtree(previous, ignore_errors=True)
+            if self.fsync != 'none':
+                _fsync_path(self.final_dir.parent, directory=True)
+
+        self.committed = True
+        return self.final_dir
+
+    def abort(self):
+        """放弃本次输出（只删除暂存目录）"""
+        with self._lock:
+            self._pending = []
+            self._pending_bytes = 0
+        if self.atomic and not self.committed:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def summary(self) -> dict:
+        return {
+            'atomic': self.atomic,
+            'fsync': self.fsync,
+            'files_written': self.files_written,
+            'bytes_written': self.bytes_written,
+            'flushes': self.flushes,
+        }
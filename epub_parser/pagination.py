@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线分页
+阅读端在客户端排版整章内容，长章节在低端手机上很慢。提取结束时按若干目标视口预先计算分页，
+写入书籍输出目录的 reader/pagination.json，客户端跳到第 N 页时只需排版这一页的段落。
+
+- 段落模型与阅读端章节包一致（paragraphs.split_into_paragraphs），页边界为 (段落序号, 段落纯文本中的字符偏移)
+- 宽度以 em 为单位估算：中日韩字符与全角标点各占 1em，拉丁字母、数字、空格和半角标点按字符类别取平均宽度
+- 断行：拉丁文字按词断行（超长的词按字符断开），中日韩文字可在任意字符间断行，
+  但句末标点和右引号不出现在行首、左引号不出现在行尾（避头尾）
+- 标题按字号放大，且不单独留在页底；段落之间按段间距留白
+- 段落中的图片按宽度缩放到版心后的高度计（尺寸取自 width/height 属性或提取器读出的图片文件头），
+  尺寸未知时按页面高度的固定比例计
+
+每个视口的每个章节只保存除第一页以外各页开头的扁平数组 [段落, 偏移, 段落, 偏移, ...]，
+另有各章节的起始页码，客户端用二分查找把全书页码换算成章节和页内位置。
+"""
+
+import argparse
+import json
+import posixpath
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from image_assets import IMAGE_DIR, image_dimensions
+from paragraphs import split_into_paragraphs
+
+PAGINATION_NAME = "pagination.json"
+PAGINATION_DIR = "reader"
+PAGINATION_VERSION = 1
+
+# 默认视口（与 interactive-reader 的样式一致：外层与内容区各 20px 内边距，行高1.6，段后1.5em）
+DEFAULT_PROFILES = {
+    "phone-small": {"width": 360, "height": 640, "font_px": 16, "line_height": 1.6, "padding": 40,
+                    "paragraph_spacing_em": 1.5},
+    "phone": {"width": 390, "height": 844, "font_px": 17, "line_height": 1.6, "padding": 40,
+              "paragraph_spacing_em": 1.5},
+    "tablet": {"width": 768, "height": 1024, "font_px": 18, "line_height": 1.6, "padding": 40,
+               "paragraph_spacing_em": 1.5},
+}
+HEADING_SCALES = {"h1": 1.5, "h2": 1.3, "h3": 1.17}
+IMAGE_PAGE_FRACTION = 0.4  # 尺寸未知的图片按页面高度的比例计
+
+_WIDE = ("\u1100-\u115f\u2e80-\u303e\u3040-\u30ff\u3100-\u31ff\u3400-\u4dbf\u4e00-\u9fff\ua960-\ua97f"
+         "\uac00-\ud7af\uf900-\ufaff\ufe30-\ufe4f\uff01-\uff60\uffe0-\uffe6")
+# 不能出现在行首的标点（句末标点、右括号和右引号），不能出现在行尾的标点（左括号和左引号）
+_NO_LINE_START = "、。，．：；！？）］｝〉》」』】〕〗〙”’…—·,.:;!?)]}"
+_NO_LINE_END = "（［｛〈《「『【〔〖〘“‘([{"
+# 断行单元：一个宽字符连同前面的左标点和后面的右标点；一串非空白的窄字符（词）；空白
+_BREAK_UNIT_PATTERN = re.compile(
+    rf"[{re.escape(_NO_LINE_END)}]*[{_WIDE}][{re.escape(_NO_LINE_START)}]*|[^\s{_WIDE}]+|\s+"
+)
+_IMAGE_TAG_PATTERN = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_SRC_PATTERN = re.compile(r"""\ssrc\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_DIMENSION_PATTERN = re.compile(r"""\s(width|height)\s*=\s*["']?(\d+)["']?(?=[\s/>])""", re.IGNORECASE)
+_WIDE_PATTERN = re.compile(rf"[{_WIDE}]")
+
+# 窄字符的平均宽度（em，按常见衬线字体估算）
+_NARROW_WIDTHS = {' ': 0.25, 'i': 0.28, 'l': 0.28, 'j': 0.28, 'f': 0.33, 't': 0.33, 'r': 0.38,
+                  'm': 0.78, 'w': 0.72, 'M': 0.89, 'W': 0.94, '.': 0.25, ',': 0.25, ';': 0.28,
+                  ':': 0.28, "'": 0.22, '"': 0.4, '!': 0.33, '-': 0.33, '—': 1.0, '…': 1.0}
+_LOWER_WIDTH = 0.5
+_UPPER_WIDTH = 0.68
+_DEFAULT_WIDTH = 0.55
+
+
+def _char_width(ch: str, wide_quotes: bool) -> float:
+    if _WIDE_PATTERN.match(ch) or (wide_quotes and ch in "“”‘’"):
+        return 1.0
+    width = _NARROW_WIDTHS.get(ch)
+    if width is not None:
+        return width
+    if ch.islower():
+        return _LOWER_WIDTH
+    if ch.isupper():
+        return _UPPER_WIDTH
+    return _DEFAULT_WIDTH
+
+
+@lru_cache(maxsize=65536)
+def _piece_width(piece: str, wide_quotes: bool) -> float:
+    return sum(_char_width(ch, wide_quotes) for ch in piece)
+
+
+def measure_units(text: str) -> List[Tuple[int, float, bool]]:
+    """断行单元 (结束字符偏移, 宽度em, 是否为空白)；以中日韩文字为主的段落中弯引号按全角计"""
+    wide_quotes = len(_WIDE_PATTERN.findall(text)) * 3 > len(text)
+    return [(match.end(), _piece_width(match.group(0), wide_quotes), match.group(0).isspace())
+            for match in _BREAK_UNIT_PATTERN.finditer(text)]
+
+
+def break_lines(units: List[Tuple[int, float, bool]], line_em: float) -> List[int]:
+    """贪心断行，返回每行开头的字符偏移（第一行为0）；行尾的空白不占宽度，超出一行的词按宽度比例断开"""
+    starts = [0]
+    used = 0.0
+    position = 0
+    for end, width, space in units:
+        if space:
+            if used > 0:
+                used += width
+            position = end
+            continue
+        if used > 0 and used + width > line_em:
+            starts.append(position)
+            used = 0.0
+        while width > line_em:  # 超长的词：按每行能容纳的比例切开
+            length = end - position
+            take = max(1, int(length * line_em / width))
+            position += take
+            width -= width * take / length
+            starts.append(position)
+        used += width
+        position = end
+    return starts
+
+
+def image_sizes_in(html: str, known: Optional[Dict[str, Tuple[int, int]]] = None) -> List[Optional[Tuple[int, int]]]:
+    """段落中每张图片的 (宽, 高)：优先取 width/height 属性，其次按文件名查 known；未知为None"""
+    sizes = []
+    for tag in _IMAGE_TAG_PATTERN.findall(html):
+        attributes = {name.lower(): int(value) for name, value in _DIMENSION_PATTERN.findall(tag)}
+        size = None
+        if attributes.get("width") and attributes.get("height"):
+            size = (attributes["width"], attributes["height"])
+        elif known:
+            src = _SRC_PATTERN.search(tag)
+            size = known.get(posixpath.basename(unquote(src.group(1)))) if src else None
+        sizes.append(size)
+    return sizes
+
+
+def _image_lines(sizes: List[Optional[Tuple[int, int]]], metrics: Dict[str, float]) -> float:
+    """图片占用的行高：宽度缩放到不超过版心，单张不超过一页"""
+    lines = 0.0
+    for size in sizes:
+        if size and size[0] > 0:
+            width = min(size[0], metrics["content_px"])
+            lines += min(size[1] * width / size[0] / metrics["line_px"], metrics["page_lines"])
+        else:
+            lines += metrics["page_lines"] * IMAGE_PAGE_FRACTION
+    return lines
+
+
+def _profile_metrics(profile: Dict[str, Any]) -> Dict[str, float]:
+    font_px = profile["font_px"]
+    line_px = font_px * profile["line_height"]
+    return {
+        "content_px": profile["width"] - 2 * profile["padding"],
+        "line_px": line_px,
+        "line_em": (profile["width"] - 2 * profile["padding"]) / font_px,
+        "page_lines": max(1.0, float(int((profile["height"] - 2 * profile["padding"]) / line_px))),
+        "gap_lines": profile["paragraph_spacing_em"] / profile["line_height"],
+    }
+
+
+def paginate_chapter(paragraphs: List[Dict[str, Any]], profile: Dict[str, Any],
+                     measured: Optional[List[List[Tuple[int, float, bool]]]] = None,
+                     images: Optional[List[List[Optional[Tuple[int, int]]]]] = None) -> List[int]:
+    """计算一个章节在一个视口下的分页，返回除第一页外各页开头的扁平数组 [段落, 偏移, ...]
+
+    measured、images 为各段落的 measure_units、image_sizes_in 结果（多个视口共用，避免重复解析）
+    """
+    metrics = _profile_metrics(profile)
+    page_lines = metrics["page_lines"]
+    breaks: List[int] = []
+    used = 0.0  # 当前页已用的行高（以正文行高为单位）
+
+    def new_page(paragraph: int, offset: int):
+        nonlocal used
+        breaks.extend((paragraph, offset))
+        used = 0.0
+
+    for index, paragraph in enumerate(paragraphs):
+        text = paragraph["text"]
+        gap = metrics["gap_lines"] if used > 0 else 0.0
+        sizes = images[index] if images is not None else image_sizes_in(paragraph["html"])
+        if sizes:  # 图片作为段落开头的整块，放不下时整体移到下一页
+            height = _image_lines(sizes, metrics)
+            if used > 0 and used + gap + height > page_lines:
+                new_page(index, 0)
+                gap = 0.0
+            used += gap + height
+            gap = 0.0
+        if not text:
+            continue
+
+        scale = HEADING_SCALES.get(paragraph["tag"], 1.0)
+        units = measured[index] if measured is not None else measure_units(text)
+        starts = break_lines(units, metrics["line_em"] / scale)
+        if scale > 1.0 and used > 0:
+            # 标题和下一段至少两行放在同一页，否则整体移到下一页
+            if used + gap + len(starts) * scale + 2 > page_lines:
+                new_page(index, 0)
+                gap = 0.0
+        used += gap
+        for start in starts:
+            if used > 0 and used + scale > page_lines:
+                new_page(index, start)
+            used += scale
+    return breaks
+
+
+def paginate_book(chapters: List[Tuple[int, str, str]], profiles: Dict[str, Dict[str, Any]],
+                  book_name: str = "", image_sizes: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, Any]:
+    """chapters 为按spine顺序的 (索引, 输出文件名, 清理后HTML)；image_sizes 为图片文件名 -> (宽, 高)
+
+    返回 pagination.json 的内容
+    """
+    result = {
+        "version": PAGINATION_VERSION,
+        "book": book_name,
+        "profiles": profiles,
+        "chapters": [],
+        "pages": {name: {"total": 0, "chapter_offsets": [], "breaks": []} for name in profiles},
+    }
+    for index, output_filename, cleaned_content in chapters:
+        paragraphs = split_into_paragraphs(cleaned_content)
+        measured = [measure_units(paragraph["text"]) if paragraph["text"] else [] for paragraph in paragraphs]
+        images = [image_sizes_in(paragraph["html"], image_sizes) for paragraph in paragraphs]
+        result["chapters"].append({"index": index, "source": output_filename, "paragraphs": len(paragraphs)})
+        for name, profile in profiles.items():
+            breaks = paginate_chapter(paragraphs, profile, measured, images)
+            pages = result["pages"][name]
+            pages["chapter_offsets"].append(pages["total"])
+            pages["breaks"].append(breaks)
+            pages["total"] += len(breaks) // 2 + 1
+    return result
+
+
+def page_range(pagination: Dict[str, Any], profile: str, page: int) -> Dict[str, Any]:
+    """全书第 page 页（从0开始）的位置：章节spine序号、起点和终点 (段落, 偏移)；终点为None表示到章节末尾"""
+    pages = pagination["pages"][profile]
+    offsets = pages["chapter_offsets"]
+    low, high = 0, len(offsets) - 1
+    while low < high:  # 最后一个起始页码不大于 page 的章节
+        middle = (low + high + 1) // 2
+        if offsets[middle] <= page:
+            low = middle
+        else:
+            high = middle - 1
+    breaks = pages["breaks"][low]
+    local = page - offsets[low]
+    start = (0, 0) if local == 0 else (breaks[2 * local - 2], breaks[2 * local - 1])
+    end = (breaks[2 * local], breaks[2 * local + 1]) if 2 * local < len(breaks) else None
+    return {"chapter": pagination["chapters"][low]["index"], "start": start, "end": end}
+
+
+def pagination_summary(pagination: Dict[str, Any], build_ms: float) -> Dict[str, Any]:
+    return {
+        "path": f"{PAGINATION_DIR}/{PAGINATION_NAME}",
+        "profiles": {name: pages["total"] for name, pages in pagination["pages"].items()},
+        "build_ms": round(build_ms, 1),
+    }
+
+
+class Paginator:
+    """提取结束时生成分页；write(相对路径, 字节) 由调用方提供（提取器中为 BookOutputWriter.write_bytes）"""
+
+    def __init__(self, profiles: Optional[Dict[str, Dict[str, Any]]] = None,
+                 image_sizes: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.profiles = profiles or DEFAULT_PROFILES
+        self.image_sizes = image_sizes
+
+    def build(self, chapters: List[Tuple[int, str, str]], write: Callable[[str, bytes], None],
+              book_name: str = "") -> Dict[str, Any]:
+        start = time.perf_counter()
+        pagination = paginate_book(chapters, self.profiles, book_name, self.image_sizes)
+        write(f"{PAGINATION_DIR}/{PAGINATION_NAME}",
+              json.dumps(pagination, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        return pagination_summary(pagination, (time.perf_counter() - start) * 1000)
+
+
+def parse_profile(spec: str) -> Tuple[str, Dict[str, Any]]:
+    """解析命令行视口：名称=宽x高@字号（如 phone=390x844@17），其余参数取默认值"""
+    match = re.fullmatch(r"([\w-]+)=(\d+)x(\d+)@(\d+(?:\.\d+)?)", spec)
+    if not match:
+        raise ValueError(f"无效的视口: {spec}（格式: 名称=宽x高@字号）")
+    name, width, height, font_px = match.groups()
+    profile = dict(DEFAULT_PROFILES["phone"], width=int(width), height=int(height), font_px=float(font_px))
+    return name, profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='为已提取的书籍重新计算离线分页（reader/pagination.json）')
+    parser.add_argument('book_dir', help='书籍输出目录（含 extraction_report.json）')
+    parser.add_argument('--profile', action='append', default=[],
+                        help='目标视口，格式 名称=宽x高@字号，可重复（默认: ' + ', '.join(DEFAULT_PROFILES) + '）')
+    args = parser.parse_args()
+
+    try:
+        profiles = dict(parse_profile(spec) for spec in args.profile) or DEFAULT_PROFILES
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    book_dir = Path(args.book_dir)
+    with open(book_dir / 'extraction_report.json', 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    chapters = [(record['index'], record['output_name'],
+                 (book_dir / 'cleaned_html' / record['output_name']).read_text(encoding='utf-8'))
+                for record in sorted(report.get('extracted_files', []), key=lambda r: r['index'])]
+
+    def write(relative: str, data: bytes):
+        path = book_dir / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    image_sizes = {}  # 导出过图片时按 images/ 下的文件读取尺寸
+    if (book_dir / IMAGE_DIR).is_dir():
+        for path in (book_dir / IMAGE_DIR).iterdir():
+            dimensions = image_dimensions(path.read_bytes()) if path.is_file() else None
+            if dimensions:
+                image_sizes[path.name] = dimensions
+
+    summary = Paginator(profiles, image_sizes).build(chapters, write, book_dir.name)
+    print(f"📄 {book_dir.name}: {summary['build_ms']:.0f} ms")
+    for name, total in summary['profiles'].items():
+        print(f"  - {name}: {total} 页")
+    print(f"💾 分页已保存到: {book_dir / summary['path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+段落模型工具
+在清理后的HTML中定位段落级块元素，供章节存储、阅读端章节包、LLM分块、分页和导航索引共享。
+段落从开始标签到与之配对的结束标签为止（按嵌套深度配对），嵌套的同名元素整体归入外层段落
+"""
+
+import re
+from html import unescape
+from typing import Any, Dict, Iterator, List, Tuple
+
+# 段落模型版本：段落边界变化时递增（写入规则指纹，共享存储中按旧边界记录的锚点随之失效）
+PARAGRAPH_MODEL_VERSION = 2
+
+# 视为一个段落的块级标签
+PARAGRAPH_TAGS = ("p", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "li", "pre")
+
+# 段落元素的开始标签；段落到与之配对的结束标签为止（外层优先，嵌套的内层段落归入外层）
+_OPEN_PATTERN = re.compile(
+    rb"<(" + b"|".join(tag.encode("ascii") for tag in PARAGRAPH_TAGS) + rb")\b[^>]*>",
+    re.IGNORECASE,
+)
+# 每种段落标签的开始/结束标签，用于跳过嵌套的同名元素（li 中的 li、blockquote 中的 blockquote）
+_SAME_TAG_PATTERNS = {
+    tag.encode("ascii"): re.compile(rb"<(/?)" + tag.encode("ascii") + rb"\b[^>]*>", re.IGNORECASE)
+    for tag in PARAGRAPH_TAGS
+}
+
+
+def _iter_paragraphs(html: bytes) -> Iterator[Tuple[bytes, int, int]]:
+    """逐个返回段落元素的 (小写标签名, 起始, 结束) 字节偏移；没有配对结束标签的开始标签不构成段落"""
+    position = 0
+    while True:
+        opening = _OPEN_PATTERN.search(html, position)
+        if opening is None:
+            return
+        tag = opening.group(1).lower()
+        if opening.group(0).endswith(b"/>"):
+            yield tag, opening.start(), opening.end()
+            position = opening.end()
+            continue
+        depth = 1
+        for match in _SAME_TAG_PATTERNS[tag].finditer(html, opening.end()):
+            if match.group(1):
+                depth -= 1
+            elif not match.group(0).endswith(b"/>"):
+                depth += 1
+            if depth == 0:
+                yield tag, opening.start(), match.end()
+                position = match.end()
+                break
+        else:
+            position = opening.end()
+
+
+def find_paragraph_spans(html: bytes) -> List[Tuple[int, int]]:
+    """返回HTML字节串中每个段落元素的 (起始, 结束) 字节偏移"""
+    return [(start, end) for _, start, end in _iter_paragraphs(html)]
+
+
+_TAG_PATTERN = re.compile(r"<[^>]+>")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def split_into_paragraphs(html: str) -> List[Dict[str, Any]]:
+    """把清理后的HTML拆成段落数组，每项为 {'tag', 'html', 'text', 'start', 'end'}
+
+    html 为段落元素本身，text 为纯文本，start/end 为段落在HTML的UTF-8字节串中的偏移（与 find_paragraph_spans 一致）
+    """
+    data = html.encode("utf-8")
+    paragraphs = []
+    for tag, start, end in _iter_paragraphs(data):
+        fragment = data[start:end].decode("utf-8")
+        text = _SPACE_PATTERN.sub(" ", unescape(_TAG_PATTERN.sub("", fragment))).strip()
+        paragraphs.append({"tag": tag.decode("ascii"), "html": fragment, "text": text, "start": start, "end": end})
+    return paragraphs
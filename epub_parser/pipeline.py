@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段流水线
+把单本书的提取拆成 读取 → 解析/清理 → 写出 三个阶段，阶段之间用有界队列连接：
+
+- 读取阶段（I/O线程）：取出文档字节、查询共享存储
+- 处理阶段（CPU）：噪声判定、清理、统计计数；workers > 1 时在进程池中并行
+- 写出阶段（I/O线程）：按提交顺序取回结果并写文件，输出和报告保持spine顺序
+
+每个阶段记录处理数、忙碌时间、等待上游（饥饿）和等待下游（阻塞）的时间以及队列深度，用于定位瓶颈。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+_END = object()  # 队列结束标记
+
+
+class StageMetrics:
+    """单个阶段的计时统计"""
+    __slots__ = ('name', 'items', 'busy_s', 'starved_s', 'blocked_s')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_s = 0.0     # 实际处理耗时
+        self.starved_s = 0.0  # 等待上游输入
+        self.blocked_s = 0.0  # 下游队列已满，等待放入
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'items': self.items,
+            'busy_ms': round(self.busy_s * 1000, 1),
+            'starved_ms': round(self.starved_s * 1000, 1),
+            'blocked_ms': round(self.blocked_s * 1000, 1),
+        }
+
+
+class MeteredQueue:
+    """记录深度的有界队列"""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self._queue = queue.Queue(maxsize)
+        self.puts = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+
+    def put(self, item, metrics: StageMetrics):
+        start = time.perf_counter()
+        self._queue.put(item)
+        metrics.blocked_s += time.perf_counter() - start
+        depth = self._queue.qsize()
+        self.puts += 1
+        self.depth_sum += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def get(self, metrics: StageMetrics):
+        start = time.perf_counter()
+        item = self._queue.get()
+        metrics.starved_s += time.perf_counter() - start
+        return item
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'capacity': self.maxsize,
+            'max_depth': self.max_depth,
+            'mean_depth': round(self.depth_sum / self.puts, 2) if self.puts else 0.0,
+        }
+
+
+def _timed_call(process: Callable[[Any], Any], payload: Any) -> Tuple[Any, float]:
+    """在工作进程中执行并返回 (结果, 耗时)，处理阶段的忙碌时间按实际计算时间统计"""
+    start = time.perf_counter()
+    result = process(payload)
+    return result, time.perf_counter() - start
+
+
+def _completed(value=None, error: Optional[BaseException] = None) -> Future:
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(value)
+    return future
+
+
+def run_pipeline(items: Iterable[Any],
+                 read: Callable[[Any], Any],
+                 process: Callable[[Any], Any],
+                 write: Callable[[Any, Any, Any, Optional[BaseException]], None],
+                 queue_size: int = 8,
+                 workers: int = 1,
+                 worker_initializer: Optional[Callable] = None,
+                 worker_initargs: tuple = ()) -> Dict[str, Any]:
+    """运行三阶段流水线，返回各阶段和队列的统计
+
+    read(item) -> payload            读取阶段，返回None表示跳过该项
+    process(payload) -> result       处理阶段；workers > 1 时必须是可pickle的模块级函数，
+                                     工作进程由 worker_initializer(*worker_initargs) 初始化
+    write(item, payload, result, error)
+                                     写出阶段，按 items 的顺序调用；read/process 抛出的异常通过 error 传入
+    """
+    read_metrics = StageMetrics('read')
+    process_metrics = StageMetrics('process')
+    write_metrics = StageMetrics('write')
+    read_queue = MeteredQueue('read→process', queue_size)
+    write_queue = MeteredQueue('process→write', queue_size)
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=worker_initializer,
+                                       initargs=worker_initargs)
+
+    def read_stage():
+        try:
+            for item in items:
+                start = time.perf_counter()
+                try:
+                    payload, error = read(item), None
+                except Exception as e:
+                    payload, error = None, e
+                read_metrics.busy_s += time.perf_counter() - start
+                read_metrics.items += 1
+                read_queue.put((item, payload, error), read_metrics)
+        finally:
+            read_queue.put(_END, read_metrics)
+
+    def process_stage():
+        try:
+            while True:
+                entry = read_queue.get(process_metrics)
+                if entry is _END:
+                    break
+                item, payload, error = entry
+                if error is not None or payload is None:
+                    future = _completed(None, error)
+                elif executor is not None:
+                    # 提交后立即把 future 按顺序放入写出队列，有界队列限制了在途任务数
+                    future = executor.submit(_timed_call, process, payload)
+                else:
+                    start = time.perf_counter()
+                    try:
+                        future = _completed((process(payload), time.perf_counter() - start))
+                    except Exception as e:
+                        future = _completed(None, e)
+                process_metrics.items += 1
+                write_queue.put((item, payload, future), process_metrics)
+        finally:
+            write_queue.put(_END, process_metrics)
+
+    reader = threading.Thread(target=read_stage, name='pipeline-read', daemon=True)
+    processor = threading.Thread(target=process_stage, name='pipeline-process', daemon=True)
+    start = time.perf_counter()
+    reader.start()
+    processor.start()
+
+    # 写出阶段在调用线程中运行
+    finished = False
+    try:
+        while True:
+            entry = write_queue.get(write_metrics)
+            if entry is _END:
+                break
+            item, payload, future = entry
+            wait_start = time.perf_counter()
+            try:
+                timed = future.result()
+                error = None
+            except Exception as e:
+                timed, error = None, e
+            write_metrics.starved_s += time.perf_counter() - wait_start
+            result = None
+            if timed is not None:
+                result, busy_s = timed
+                process_metrics.busy_s += busy_s
+            if payload is None and error is None:
+                continue
+            start_write = time.perf_counter()
+            write(item, payload, result, error)
+            write_metrics.busy_s += time.perf_counter() - start_write
+            write_metrics.items += 1
+        finished = True
+    finally:
+        if not finished:
+            # 写出阶段异常退出时排空队列，避免上游线程阻塞在已满的队列上
+            while write_queue.get(write_metrics) is not _END:
+                pass
+        reader.join()
+        processor.join()
+        if executor is not None:
+            executor.shutdown()
+
+    stages = {metrics.name: metrics.to_dict() for metrics in (read_metrics, process_metrics, write_metrics)}
+    # 忙碌时间占比最高的阶段即为瓶颈
+    bottleneck = max(stages, key=lambda name: stages[name]['busy_ms'] / max(workers if name == 'process' else 1, 1))
+    return {
+        'workers': workers,
+        'queue_size': queue_size,
+        'wall_ms': round((time.perf_counter() - start) * 1000, 1),
+        'stages': stages,
+        'queues': {q.name: q.to_dict() for q in (read_queue, write_queue)},
+        'bottleneck': bottleneck,
+    }
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+阅读端章节包
+在提取结束时为每个章节生成阅读端直接使用的静态文件，放在书籍输出目录的 reader/ 下：
+
+    reader/chapters/<章节>.html(.gz/.br)     # 压缩空白、去掉注释后的HTML
+    reader/chapters/<章节>.json(.gz/.br)     # 段落数组 [{'tag', 'html'}]
+    reader/manifest.json                     # 每个文件及其压缩版本的大小、sha256 和 ETag
+
+预先生成 gzip / brotli 版本后，静态服务器或CDN按 Accept-Encoding 直接返回对应文件，运行时不再压缩。
+压缩输出是确定的（gzip 头中不写时间戳），内容不变时 ETag 不变。brotli 为可选依赖，未安装时只生成 gzip。
+"""
+
+import gzip
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from paragraphs import split_into_paragraphs
+
+BUNDLE_DIR = "reader"
+MANIFEST_NAME = "manifest.json"
+DEFAULT_GZIP_LEVEL = 9
+DEFAULT_BROTLI_QUALITY = 11
+DEFAULT_BANDWIDTH_KBPS = 1600  # 估算传输耗时的带宽（约为慢速移动网络）
+
+# 内容中空白有意义的元素，压缩时原样保留
+_PRESERVE_PATTERN = re.compile(r"<(pre|textarea|script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_COMMENT_PATTERN = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+_SPACE_PATTERN = re.compile(r"\s+")
+# 块级标签两侧的空白不影响渲染，可以整体去掉（行内标签之间的空格保留为一个）
+_BLOCK_GAP_PATTERN = re.compile(
+    r"\s*(</?(?:html|head|body|title|meta|link|div|p|h[1-6]|ul|ol|li|dl|dt|dd|table|thead|tbody|tr|td|th|"
+    r"section|article|header|footer|nav|aside|blockquote|figure|figcaption|hr|br)\b[^>]*>)\s*",
+    re.IGNORECASE,
+)
+
+
+def brotli_available() -> bool:
+    return brotli is not None
+
+
+def _minify_fragment(html: str) -> str:
+    html = _COMMENT_PATTERN.sub("", html)
+    html = _SPACE_PATTERN.sub(" ", html)
+    return _BLOCK_GAP_PATTERN.sub(r"\1", html)
+
+
+def minify_html(html: str) -> str:
+    """去掉注释、合并空白、删除块级标签两侧的空白；pre/textarea/script/style 内容保持不变"""
+    parts = []
+    position = 0
+    for match in _PRESERVE_PATTERN.finditer(html):
+        parts.append(_minify_fragment(html[position:match.start()]))
+        parts.append(match.group(0))
+        position = match.end()
+    parts.append(_minify_fragment(html[position:]))
+    return "".join(parts).strip()
+
+
+def _etag(data: bytes) -> Tuple[str, str]:
+    digest = hashlib.sha256(data).hexdigest()
+    return digest, f'"{digest[:32]}"'
+
+
+class ReaderBundleBuilder:
+    """生成阅读端章节包；write(相对路径, 字节) 由调用方提供（提取器中为 BookOutputWriter.write_bytes）"""
+
+    def __init__(self, gzip_level: int = DEFAULT_GZIP_LEVEL, brotli_quality: int = DEFAULT_BROTLI_QUALITY,
+                 bandwidth_kbps: float = DEFAULT_BANDWIDTH_KBPS):
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.bandwidth_kbps = bandwidth_kbps
+        self.encodings = ['gzip'] + (['br'] if brotli_available() else [])
+
+    def _transfer_ms(self, size: int) -> float:
+        return round(size * 8 / self.bandwidth_kbps, 1)
+
+    def _emit(self, write: Callable[[str, bytes], None], relative: str, data: bytes,
+              totals: Dict[str, int], kind: str) -> Dict[str, Any]:
+        """写出一个文件及其压缩版本，返回清单条目"""
+        digest, etag = _etag(data)
+        write(relative, data)
+        entry = {'path': relative, 'bytes': len(data), 'sha256': digest, 'etag': etag, 'encodings': {}}
+        totals[kind] += len(data)
+
+        compressed = {'gzip': gzip.compress(data, self.gzip_level, mtime=0)}
+        if brotli_available():
+            compressed['br'] = brotli.compress(data, quality=self.brotli_quality)
+        for encoding, payload in compressed.items():
+            suffix = '.gz' if encoding == 'gzip' else '.br'
+            _, variant_etag = _etag(payload)
+            write(relative + suffix, payload)
+            entry['encodings'][encoding] = {'path': relative + suffix, 'bytes': len(payload), 'etag': variant_etag}
+            totals[f"{kind}_{encoding}"] += len(payload)
+        return entry
+
+    def build(self, chapters: List[Tuple[int, str, str]], write: Callable[[str, bytes], None],
+              book_name: str = "") -> Dict[str, Any]:
+        """chapters 为按spine顺序的 (索引, 输出文件名, 清理后HTML)；返回写入报告的大小与耗时摘要"""
+        start = time.perf_counter()
+        totals = {f"{kind}{suffix}": 0 for kind in ('html', 'paragraphs')
+                  for suffix in [''] + [f"_{encoding}" for encoding in self.encodings]}
+        cleaned_bytes = 0
+        manifest_chapters = []
+
+        for index, output_filename, cleaned_content in chapters:
+            stem = Path(output_filename).stem
+            cleaned_bytes += len(cleaned_content.encode('utf-8'))
+            minified = minify_html(cleaned_content)
+            # 纯文本可由段落HTML得到，章节包中不重复保存
+            paragraphs = [{'tag': p['tag'], 'html': p['html']} for p in split_into_paragraphs(minified)]
+            paragraphs_json = json.dumps(paragraphs, ensure_ascii=False, separators=(',', ':'))
+            manifest_chapters.append({
+                'index': index,
+                'source': output_filename,
+                'paragraph_count': len(paragraphs),
+                'html': self._emit(write, f"{BUNDLE_DIR}/chapters/{stem}.html",
+                                   minified.encode('utf-8'), totals, 'html'),
+                'paragraphs': self._emit(write, f"{BUNDLE_DIR}/chapters/{stem}.json",
+                                         paragraphs_json.encode('utf-8'), totals, 'paragraphs'),
+            })
+
+        manifest = {
+            'book': book_name,
+            'encodings': self.encodings,
+            'chapters': manifest_chapters,
+        }
+        write(f"{BUNDLE_DIR}/{MANIFEST_NAME}",
+              json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'))
+
+        # 首章按阅读端实际请求的版本估算传输耗时（未压缩的清理HTML为改造前的情况）
+        first_chapter = None
+        if manifest_chapters:
+            html_entry = manifest_chapters[0]['html']
+            first_chapter = {
+                'cleaned_bytes': len(chapters[0][2].encode('utf-8')),
+                'minified_bytes': html_entry['bytes'],
+            }
+            first_chapter.update({f"{encoding}_bytes": variant['bytes']
+                                  for encoding, variant in html_entry['encodings'].items()})
+            first_chapter['transfer_ms'] = {
+                key[:-len('_bytes')]: self._transfer_ms(size)
+                for key, size in list(first_chapter.items()) if key.endswith('_bytes')
+            }
+
+        best = totals[f"html_{self.encodings[-1]}"]
+        return {
+            'directory': BUNDLE_DIR,
+            'chapters': len(manifest_chapters),
+            'encodings': self.encodings,
+            'bytes': dict(totals, cleaned=cleaned_bytes),
+            'compression_ratio': round(cleaned_bytes / best, 2) if best else None,
+            'first_chapter': first_chapter,
+            'bandwidth_kbps': self.bandwidth_kbps,
+            'book_transfer_ms': {
+                'cleaned': self._transfer_ms(cleaned_bytes),
+                **{encoding: self._transfer_ms(totals[f"html_{encoding}"]) for encoding in self.encodings},
+            },
+            'build_ms': round((time.perf_counter() - start) * 1000, 1),
+        }
+
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告记录与流式写出
+提取报告中的 spine_info、toc_info、extracted_files、skipped_files 每项原来都是一个 dict，
+报告最后用 json.dump(..., indent=2) 一次写出。大书和上万本书的批次中，这些字典、重复的完整路径字符串
+以及整份报告序列化成的大字符串都要同时留在内存里。这里提供：
+
+- 记录类型：用 __slots__ 按字段存放，仍可像字典一样按键读取（record['index']、record.get(...)），
+  extracted_files 记录中的完整路径由本书共享的输出目录和文件名拼出，不再逐条保存
+- JSONObjectWriter：逐个键写出一个JSON对象，列表逐项写出，输出与 json.dump(obj, f, ensure_ascii=False, indent=2) 逐字节相同
+- RecordLog：章节完成时立即追加一行（JSON Lines）并刷新，读取方不必等到报告写出
+
+extraction_report.json 的结构不变，旧的读取方（catalogue_db、noise_index、bilingual_align 等）无需修改。
+"""
+
+import json
+import os
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterator, Tuple, Union
+
+RECORD_LOG_NAME = "extraction_records.jsonl"
+
+
+class Record(Mapping):
+    """按字段存放的报告记录；FIELDS 决定键的顺序，OPTIONAL 中的字段为None时不出现"""
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+    OPTIONAL: FrozenSet[str] = frozenset()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            if name in fields:
+                setattr(self, name, fields.pop(name))
+            elif name in self.OPTIONAL:
+                setattr(self, name, None)
+            else:
+                raise TypeError(f"{type(self).__name__} 缺少字段: {name}")
+        if fields:
+            raise TypeError(f"{type(self).__name__} 未知字段: {', '.join(fields)}")
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in self.OPTIONAL:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self.FIELDS:
+            if name not in self.OPTIONAL or getattr(self, name) is not None:
+                yield name
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class SpineRecord(Record):
+    """spine_info 中的一项"""
+    __slots__ = FIELDS = ('index', 'item_id', 'file_name', 'linear', 'media_type')
+
+
+class TocRecord(Record):
+    """toc_info 中的一项（nav_index.flatten_toc 的结果）"""
+    __slots__ = FIELDS = ('title', 'href', 'level')
+
+
+class SkippedRecord(Record):
+    """skipped_files 中的一项"""
+    __slots__ = FIELDS = ('index', 'file_name', 'item_id', 'skip_reason')
+
+
+class ExtractedRecord(Record):
+    """extracted_files 中的一项；directories 为本书共享的 (未清理目录, 清理目录)，完整路径按需拼出"""
+    __slots__ = ('index', 'original_name', 'output_name', 'directories',
+                 'raw_size_bytes', 'cleaned_size_bytes', 'cleaning')
+    FIELDS = ('index', 'original_name', 'output_name', 'raw_file_path', 'cleaned_file_path',
+              'raw_size_bytes', 'cleaned_size_bytes', 'cleaning')
+    OPTIONAL = frozenset({'cleaning'})  # 降级清理的说明（chapter_budget.degradation_record）
+
+    @property
+    def raw_file_path(self) -> str:
+        return os.path.join(self.directories[0], self.output_name)
+
+    @property
+    def cleaned_file_path(self) -> str:
+        return os.path.join(self.directories[1], self.output_name)
+
+
+def json_default(value: Any) -> Any:
+    """json.dump 的 default：把记录转成字典"""
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JSONObjectWriter:
+    """把一个JSON对象逐个键写入文本文件，列表值逐项写出，内存中不出现整份对象的序列化结果"""
+
+    def __init__(self, f, indent: int = 2):
+        self._f = f
+        self._indent = indent
+        self._fields = 0
+        self._items = None  # 正在写出的列表中已写出的项数
+        self._encoder = json.JSONEncoder(ensure_ascii=False, indent=indent, default=json_default)
+        f.write("{")
+
+    def _dumps(self, value: Any, depth: int) -> str:
+        return self._encoder.encode(value).replace("\n", "\n" + " " * (self._indent * depth))
+
+    def _key(self, key: str):
+        if self._items is not None:
+            raise ValueError("上一个列表尚未结束")
+        separator = "," if self._fields else ""
+        self._f.write(f"{separator}\n{' ' * self._indent}{json.dumps(key, ensure_ascii=False)}: ")
+        self._fields += 1
+
+    def write(self, key: str, value: Any):
+        """写出一个键；列表值逐项写出"""
+        if isinstance(value, (list, tuple)):
+            self.begin_list(key)
+            for item in value:
+                self.append(item)
+            self.end_list()
+        else:
+            self._key(key)
+            self._f.write(self._dumps(value, 1))
+
+    def begin_list(self, key: str):
+        self._key(key)
+        self._f.write("[")
+        self._items = 0
+
+    def append(self, item: Any):
+        """向正在写出的列表追加一项"""
+        separator = "," if self._items else ""
+        self._f.write(f"{separator}\n{' ' * (self._indent * 2)}{self._dumps(item, 2)}")
+        self._items += 1
+
+    def end_list(self):
+        self._f.write(f"\n{' ' * self._indent}]" if self._items else "]")
+        self._items = None
+
+    def close(self):
+        self._f.write("\n}" if self._fields else "}")
+
+
+class JSONFileWriter(JSONObjectWriter):
+    """流式写出JSON文件；replace 为True时先写临时文件，commit() 时替换目标文件，读取方不会看到写了一半的文件"""
+
+    def __init__(self, path: Union[str, Path], replace: bool = True, indent: int = 2):
+        self.path = Path(path)
+        self._tmp_path = (self.path.with_name(f".{self.path.name}.{threading.get_ident()}.tmp")
+                          if replace else self.path)
+        super().__init__(open(self._tmp_path, 'w', encoding='utf-8'), indent)
+
+    def commit(self) -> Path:
+        self.close()
+        self._f.close()
+        if self._tmp_path != self.path:
+            os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        self._f.close()
+        if self._tmp_path != self.path:
+            self._tmp_path.unlink(missing_ok=True)
+
+
+def write_json_file(path: Union[str, Path], data: Dict[str, Any], replace: bool = True) -> Path:
+    """流式写出一个JSON对象（与 json.dump(data, f, ensure_ascii=False, indent=2) 的结果相同）"""
+    writer = JSONFileWriter(path, replace)
+    try:
+        for key, value in data.items():
+            writer.write(key, value)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.commit()
+
+
+class RecordLog:
+    """章节记录日志：每完成一个章节追加一行 {"kind": "extracted" | "skipped", ...记录} 并立即刷新"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.records = 0
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'w', encoding='utf-8')
+
+    def write(self, kind: str, record: Mapping):
+        line = json.dumps({'kind': kind, **record}, ensure_ascii=False, default=json_default)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.records += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_record_log(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """逐行读取章节记录日志（进程中断时最后一行可能只写了一半，忽略）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+清理规则引擎
+把 config.py 中的标签、CSS选择器、关键字规则编译成一个匹配器，一次DOM遍历完成全部清理：
+
+- 噪声标签 / 选择器：进入元素时按集合查表（标签名、class、id、属性），命中即整棵子树剔除
+- 关键字段落、目录链接段落、空段落：离开元素时自底向上汇总子树文本和计数，最后统一剔除
+
+结果与逐条规则多次 find_all/select 的旧实现一致；新增规则只增加查表项，不增加遍历次数。
+传入章节预算（chapter_budget.ChapterBudget）时遍历中定期检查CPU时间，超出时抛出 BudgetExceeded。
+传入锚点记录器（nav_index.AnchorTracker）时在同一次遍历中记录元素 id 的位置，供导航索引使用。
+"""
+
+import re
+import logging
+from typing import List, Optional, Iterable, Tuple
+
+from bs4 import BeautifulSoup, NavigableString, CData, Comment
+
+from config import (
+    NOISE_HTML_TAGS, NOISE_CSS_SELECTORS, NOISE_TITLES, NOISE_FILENAMES, NOISE_BLOCK_TAGS,
+    COPYRIGHT_KEYWORDS, TOC_TITLE_KEYWORDS, TOC_LINK_KEYWORDS, TOC_LINK_THRESHOLD,
+    EMPTY_REMOVABLE_TAGS
+)
+
+_CLASS_SELECTOR = re.compile(r"^\.(-?[_a-zA-Z][\w-]*)$")
+_ID_SELECTOR = re.compile(r"^#(-?[_a-zA-Z][\w-]*)$")
+_ATTRIBUTE_SELECTOR = re.compile(r"^\[\s*([_a-zA-Z][\w:.-]*)\s*\]$")
+_TAG_SELECTOR = re.compile(r"^([a-zA-Z][\w-]*)$")
+
+# 参与 get_text() 的字符串类型（与 BeautifulSoup 默认行为一致）
+_TEXT_TYPES = (NavigableString, CData)
+_HEADING_TAGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6"})
+_CHECK_MASK = 0xFF  # 每256个节点检查一次预算
+
+
+def _keyword_pattern(keywords: Iterable[str]) -> Optional['re.Pattern']:
+    """把小写关键字编译成一个交替正则，一次扫描完成全部匹配"""
+    keywords = sorted({k.lower() for k in keywords if k}, key=len, reverse=True)
+    if not keywords:
+        return None
+    return re.compile("|".join(re.escape(k) for k in keywords))
+
+
+class CompiledRules:
+    """编译后的清理规则"""
+
+    def __init__(self,
+                 noise_tags: Iterable[str] = NOISE_HTML_TAGS,
+                 css_selectors: Iterable[str] = NOISE_CSS_SELECTORS,
+                 noise_titles: Iterable[str] = NOISE_TITLES,
+                 block_tags: Iterable[str] = NOISE_BLOCK_TAGS,
+                 copyright_keywords: Iterable[str] = COPYRIGHT_KEYWORDS,
+                 toc_title_keywords: Iterable[str] = TOC_TITLE_KEYWORDS,
+                 toc_link_keywords: Iterable[str] = TOC_LINK_KEYWORDS,
+                 toc_link_threshold: int = TOC_LINK_THRESHOLD,
+                 empty_tags: Iterable[str] = EMPTY_REMOVABLE_TAGS,
+                 noise_filenames: Iterable[str] = NOISE_FILENAMES,
+                 logger: Optional[logging.Logger] = None):
+        logger = logger or logging.getLogger(__name__)
+
+        # 整页跳过的判定（文件名、标题关键字）按原顺序逐个比较，跳过原因取第一个命中的关键字
+        self.noise_filenames = tuple(noise_filenames)
+        self.noise_titles = tuple(noise_titles)
+
+        self.noise_tags = frozenset(tag.lower() for tag in noise_tags)
+        self.classes = set()
+        self.ids = set()
+        self.attributes = set()
+        self.complex_selectors: List[Tuple[str, object]] = []
+
+        # 简单选择器转成查表，其余交给 soupsieve 逐元素匹配
+        tag_selectors = set(self.noise_tags)
+        for selector in css_selectors:
+            selector = selector.strip()
+            for pattern, target in ((_CLASS_SELECTOR, self.classes), (_ID_SELECTOR, self.ids),
+                                    (_ATTRIBUTE_SELECTOR, self.attributes), (_TAG_SELECTOR, tag_selectors)):
+                match = pattern.match(selector)
+                if match:
+                    target.add(match.group(1).lower() if target is tag_selectors else match.group(1))
+                    break
+            else:
+                try:
+                    import soupsieve
+                    self.complex_selectors.append((selector, soupsieve.compile(selector)))
+                except Exception as e:
+                    logger.warning(f"CSS选择器 {selector} 解析失败: {e}")
+        self.removed_tags = frozenset(tag_selectors)
+
+        self.block_tags = frozenset(tag.lower() for tag in block_tags)
+        self.empty_tags = frozenset(tag.lower() for tag in empty_tags)
+        self.noise_title_pattern = _keyword_pattern(noise_titles)
+        self.copyright_pattern = _keyword_pattern(copyright_keywords)
+        self.toc_titles = frozenset(k.lower() for k in toc_title_keywords)
+        self.toc_link_pattern = _keyword_pattern(toc_link_keywords)
+        self.toc_link_threshold = toc_link_threshold
+
+    @property
+    def rule_count(self) -> int:
+        """规则总数（用于基准对比）"""
+        return (len(self.removed_tags) + len(self.classes) + len(self.ids) +
+                len(self.attributes) + len(self.complex_selectors))
+
+    def match_noise_element(self, tag) -> Optional[str]:
+        """进入元素时的噪声判定，返回命中的规则描述"""
+        if tag.name in self.removed_tags:
+            return tag.name
+        attrs = tag.attrs
+        if attrs:
+            if self.classes:
+                classes = attrs.get('class')
+                if classes:
+                    if isinstance(classes, str):
+                        classes = classes.split()
+                    for cls in classes:
+                        if cls in self.classes:
+                            return f".{cls}"
+            if self.ids and attrs.get('id') in self.ids:
+                return f"#{attrs['id']}"
+            for attribute in self.attributes:
+                if attribute in attrs:
+                    return f"[{attribute}]"
+        for selector, compiled in self.complex_selectors:
+            if compiled.match(tag):
+                return selector
+        return None
+
+    def keyword_reason(self, name: str, text: str) -> Optional[str]:
+        """块级元素文本的关键字判定，返回日志类别"""
+        lowered = text.lower()
+        if self.noise_title_pattern and self.noise_title_pattern.search(lowered):
+            return "噪声内容段落"
+        if self.copyright_pattern and self.copyright_pattern.search(lowered):
+            return "版权信息段落"
+        if lowered.strip() in self.toc_titles or (name in _HEADING_TAGS and 'contents' in lowered):
+            return "目录标题"
+        return None
+
+
+class _NodeState:
+    """遍历时每个元素的汇总状态
+
+    带 _kw 后缀的字段不计入被关键字规则剔除的子元素；带 _toc 的字段另外不计入目录链接段落，
+    因为目录清理是否生效要等整页链接数统计完后才知道。
+    """
+    __slots__ = ('pieces', 'links_kw', 'toc_link', 'text_kw', 'img_kw', 'text_toc', 'img_toc')
+
+    def __init__(self):
+        self.pieces = []
+        self.links_kw = 0
+        self.toc_link = False
+        self.text_kw = False
+        self.img_kw = False
+        self.text_toc = False
+        self.img_toc = False
+
+
+class CleaningResult:
+    """一次清理的统计（被剔除的元素数）"""
+    __slots__ = ('noise_elements', 'keyword_blocks', 'toc_blocks', 'empty_blocks', 'comments')
+
+    def __init__(self):
+        self.noise_elements = 0
+        self.keyword_blocks = 0
+        self.toc_blocks = 0
+        self.empty_blocks = 0
+        self.comments = 0
+
+
+class BudgetedSoup(BeautifulSoup):
+    """解析时每隔若干个开始标签检查一次章节预算的 BeautifulSoup（超出时构造函数抛出 BudgetExceeded）"""
+
+    def __init__(self, markup, features: str = 'html.parser', budget=None, **kwargs):
+        self._budget = budget
+        self._start_tags = 0
+        super().__init__(markup, features, **kwargs)
+
+    def handle_starttag(self, *args, **kwargs):
+        self._start_tags += 1
+        if self._budget is not None and not self._start_tags & _CHECK_MASK:
+            self._budget.check()
+        return super().handle_starttag(*args, **kwargs)
+
+
+def clean_soup(soup: BeautifulSoup, rules: CompiledRules, remove_comments: bool = False,
+               logger: Optional[logging.Logger] = None, budget=None, anchors=None) -> CleaningResult:
+    """单次遍历清理DOM（原地修改）
+
+    budget 超出时遍历中途停止，此时已进入过的噪声元素已被剔除，其余规则尚未生效；
+    anchors 为 nav_index.AnchorTracker，清理完成后由调用方 resolve
+    """
+    logger = logger or logging.getLogger(__name__)
+    debug = logger.isEnabledFor(logging.DEBUG)
+    result = CleaningResult()
+
+    keyword_candidates = []  # (元素, 日志类别, 文本)，后序
+    toc_candidates = []      # 后序
+    empty_candidates = []    # (元素, 目录清理生效时是否为空, 不生效时是否为空)，后序
+    candidate_ids = set()
+
+    root_state = _NodeState()
+    frames = [(soup, iter(list(soup.contents)), root_state)]
+    steps = 0
+
+    while frames:
+        steps += 1
+        if budget is not None and not steps & _CHECK_MASK:
+            budget.check()
+        node, children, state = frames[-1]
+        child = next(children, None)
+
+        if child is not None:
+            if isinstance(child, NavigableString):
+                child_type = type(child)
+                if child_type is Comment:
+                    if remove_comments:
+                        child.extract()
+                        result.comments += 1
+                elif child_type in _TEXT_TYPES:
+                    if anchors is not None:
+                        anchors.text(child)
+                    stripped = child.strip()
+                    if stripped:
+                        state.pieces.append(stripped)
+                        state.text_kw = state.text_toc = True
+                continue
+
+            # 进入元素：噪声标签/选择器命中则整棵子树剔除
+            rule = rules.match_noise_element(child)
+            if rule is not None:
+                if debug:
+                    logger.debug(f"移除噪声元素: {rule}")
+                if anchors is not None:
+                    anchors.removed(child)
+                child.decompose()
+                result.noise_elements += 1
+                continue
+            if anchors is not None:
+                anchors.enter(child)
+            frames.append((child, iter(list(child.contents)), _NodeState()))
+            continue
+
+        # 离开元素：汇总子树并登记候选
+        frames.pop()
+        if anchors is not None:
+            anchors.leave(node)
+        if not frames:
+            break
+        parent_state = frames[-1][2]
+        name = node.name
+        text = "".join(state.pieces)
+
+        keyword = None
+        if name in rules.block_tags and text:
+            keyword = rules.keyword_reason(name, text)
+
+        if name == 'a' and text and rules.toc_link_pattern and rules.toc_link_pattern.search(text.lower()):
+            state.toc_link = True
+
+        # 关键字判定使用的文本包含全部子元素（祖先先于后代判定，与旧实现一致）
+        if text:
+            parent_state.pieces.append(text)
+
+        if keyword is not None:
+            keyword_candidates.append((node, keyword, text))
+            candidate_ids.add(id(node))
+            continue
+
+        is_toc = name == 'p' and state.toc_link
+        if is_toc:
+            toc_candidates.append(node)
+
+        if name == 'img':
+            state.img_kw = state.img_toc = True
+        if name in rules.empty_tags:
+            empty_candidates.append((node, not (state.text_toc or state.img_toc),
+                                     not (state.text_kw or state.img_kw)))
+
+        parent_state.links_kw += state.links_kw + (1 if name == 'a' else 0)
+        parent_state.toc_link = parent_state.toc_link or state.toc_link
+        parent_state.text_kw = parent_state.text_kw or state.text_kw
+        parent_state.img_kw = parent_state.img_kw or state.img_kw
+        if not is_toc:
+            parent_state.text_toc = parent_state.text_toc or state.text_toc
+            parent_state.img_toc = parent_state.img_toc or state.img_toc
+
+    # 关键字剔除：只保留最外层候选
+    outermost = []
+    for node, keyword, text in keyword_candidates:
+        if budget is not None:
+            budget.check()
+        parent = node.parent
+        nested = False
+        while parent is not None:
+            if id(parent) in candidate_ids:
+                nested = True
+                break
+            parent = parent.parent
+        if nested:
+            continue
+        if debug:
+            logger.debug(f"移除{keyword}: {text[:50]}...")
+        outermost.append(node)
+    result.keyword_blocks += _remove_elements(outermost, budget)
+
+    # 目录链接段落：只在页面链接很多时清理（后序倒序，祖先在后代之前）
+    toc_active = root_state.links_kw > rules.toc_link_threshold
+    if toc_active:
+        if debug:
+            for node in reversed(toc_candidates):
+                if not node.decomposed:
+                    logger.debug(f"移除目录链接段落: {node.get_text(strip=True)[:50]}...")
+        result.toc_blocks += _remove_elements(
+            [node for node in reversed(toc_candidates) if not node.decomposed], budget)
+
+    # 空段落（无文本且无图片）
+    result.empty_blocks += _remove_elements(
+        [node for node, empty_with_toc, empty_without_toc in reversed(empty_candidates)
+         if (empty_with_toc if toc_active else empty_without_toc) and not node.decomposed], budget)
+
+    return result
+
+
+def _remove_elements(nodes: List, budget=None) -> int:
+    """批量剔除元素，返回实际剔除的个数
+
+    逐个 decompose 时每个元素都要在父元素的 contents 中线性查找自己的位置，上万个兄弟段落时是平方复杂度；
+    这里按父元素分组，每组只重建一次 contents。nodes 中祖先须在后代之前，
+    已随祖先剔除的元素（父元素已 decompose）跳过。中途超出预算时DOM仍保持一致
+    """
+    groups = {}
+    for node in nodes:
+        parent = node.parent
+        group = groups.get(id(parent))
+        if group is None:
+            groups[id(parent)] = group = (parent, [])
+        group[1].append(node)
+
+    removed = 0
+    steps = 0
+    for parent, doomed in groups.values():
+        if parent.decomposed:
+            continue
+        contents = parent.contents
+        extracted = set()
+        try:
+            for node in doomed:
+                steps += 1
+                if budget is not None and not steps & _CHECK_MASK:
+                    budget.check()
+                # 临时只留下这一个子节点，extract 不必查找位置；兄弟和文档顺序链接由 extract 接好
+                parent.contents = [node]
+                node.extract(_self_index=0)
+                extracted.add(id(node))
+                node.decompose()
+                removed += 1
+        finally:
+            parent.contents = [child for child in contents if id(child) not in extracted]
+    return removed
+
+
+def strip_noise_elements(soup: BeautifulSoup, rules: CompiledRules, remove_comments: bool = False,
+                         budget=None) -> CleaningResult:
+    """只剔除噪声标签和选择器命中的元素（章节超出预算时的降级清理，不汇总子树文本）"""
+    result = CleaningResult()
+    stack = [soup]
+    steps = 0
+    while stack:
+        node = stack.pop()
+        for child in list(node.contents):
+            steps += 1
+            if budget is not None and not steps & _CHECK_MASK:
+                budget.check()
+            if isinstance(child, NavigableString):
+                if remove_comments and type(child) is Comment:
+                    child.extract()
+                    result.comments += 1
+                continue
+            if rules.match_noise_element(child) is not None:
+                child.decompose()
+                result.noise_elements += 1
+                continue
+            stack.append(child)
+    return result
+
+
+_default_rules: Optional[CompiledRules] = None
+
+
+def get_default_rules() -> CompiledRules:
+    """按 config.py 编译的默认规则（进程内只编译一次）"""
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = CompiledRules()
+    return _default_rules
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+规则配置档
+一套全局规则（config.py）对不同出版社既可能过严也可能过松：版权关键字 "penguin"、"viking" 只对企鹅兰登旗下的书有意义，
+放在全局规则里会误删其他书中提到维京人的正文段落。config.RULE_PROFILES 定义命名的配置档，在全局规则上增删，
+提取时按廉价的书籍指纹自动选择：
+
+- 制作工具：OPF 中的 generator 元数据、calibre 等写入的 dc:contributor（role=bkp）、首个文档 <head> 中的 generator
+- 出版信息：dc:publisher、dc:rights，以及标识符和标题中的 ISBN
+- OPF 结构：EPUB版本、有无 NCX / 导航文档、文档文件名
+- 样式表中声明的 CSS 类名
+
+指纹只读OPF元数据、清单和样式表，不解析章节。多个配置档同时命中时按 RULE_PROFILES 中的顺序叠加；
+编译结果按配置档组合缓存在进程内，同一批次中同类的书不重复编译（流水线工作进程以 fork 启动时直接继承主进程中已编译的规则）。
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    NOISE_HTML_TAGS, NOISE_CSS_SELECTORS, NOISE_TITLES, NOISE_FILENAMES, NOISE_BLOCK_TAGS,
+    COPYRIGHT_KEYWORDS, TOC_TITLE_KEYWORDS, TOC_LINK_KEYWORDS, TOC_LINK_THRESHOLD,
+    EMPTY_REMOVABLE_TAGS, RULE_PROFILES
+)
+from rule_engine import CompiledRules, get_default_rules
+
+AUTO = "auto"
+DEFAULT = "default"
+
+# 配置档可增删的规则列表：键 -> 全局规则（CompiledRules 的同名参数）
+RULE_LISTS = {
+    'noise_tags': NOISE_HTML_TAGS,
+    'css_selectors': NOISE_CSS_SELECTORS,
+    'noise_titles': NOISE_TITLES,
+    'block_tags': NOISE_BLOCK_TAGS,
+    'copyright_keywords': COPYRIGHT_KEYWORDS,
+    'toc_title_keywords': TOC_TITLE_KEYWORDS,
+    'toc_link_keywords': TOC_LINK_KEYWORDS,
+    'empty_tags': EMPTY_REMOVABLE_TAGS,
+    'noise_filenames': NOISE_FILENAMES,
+}
+
+MAX_CSS_BYTES = 256 * 1024  # 每个样式表最多扫描的字节数
+HEAD_BYTES = 4096  # 首个文档中查找 generator 的范围
+
+_CLASS_PATTERN = re.compile(rb"\.(-?[_a-zA-Z][\w-]*)")
+_COMMENT_PATTERN = re.compile(rb"/\*.*?\*/", re.DOTALL)
+_GENERATOR_PATTERN = re.compile(
+    rb"""<meta\b[^>]*\bname\s*=\s*["']generator["'][^>]*\bcontent\s*=\s*["']([^"']+)["']""", re.IGNORECASE)
+_ISBN_PATTERN = re.compile(r"97[89](?:[\s-]?\d){10}")
+
+_compiled: Dict[Tuple[str, ...], CompiledRules] = {}
+
+
+def _metadata_values(book, namespace: str, name: Optional[str]) -> List[Tuple[Optional[str], Dict[str, str]]]:
+    try:
+        return book.get_metadata(namespace, name) or []
+    except Exception:
+        return []
+
+
+def book_fingerprint(book) -> Dict[str, Any]:
+    """书籍指纹：只读OPF元数据、清单和样式表"""
+    generators = []
+    for value, attributes in _metadata_values(book, 'OPF', 'meta'):
+        if (attributes.get('name') or '').lower() == 'generator' and attributes.get('content'):
+            generators.append(attributes['content'])
+    for value, attributes in _metadata_values(book, 'DC', 'contributor'):
+        roles = {v for k, v in attributes.items() if k.endswith('role')}
+        if value and 'bkp' in roles:
+            generators.append(value)
+
+    publishers = [value for field in ('publisher', 'rights') for value, _ in _metadata_values(book, 'DC', field) if value]
+    isbns = []
+    for field in ('identifier', 'title', 'source'):
+        for value, _ in _metadata_values(book, 'DC', field):
+            for match in _ISBN_PATTERN.finditer(value or ''):
+                isbn = re.sub(r"\D", "", match.group(0))
+                if isbn not in isbns:
+                    isbns.append(isbn)
+
+    documents, classes = [], set()
+    has_ncx = has_nav = False
+    for item in book.get_items():
+        media_type = item.media_type or ''
+        if media_type == 'application/x-dtbncx+xml':
+            has_ncx = True
+        elif 'nav' in (getattr(item, 'properties', None) or []):
+            has_nav = True
+        elif media_type == 'text/css':
+            css = _COMMENT_PATTERN.sub(b"", item.get_content()[:MAX_CSS_BYTES])
+            classes.update(name.decode('ascii', 'ignore') for name in _CLASS_PATTERN.findall(css))
+        elif media_type in ('application/xhtml+xml', 'text/html'):
+            documents.append(item.file_name)
+
+    # 首个spine文档 <head> 中的 generator（InDesign、Sigil 等写在这里）
+    for item_id, _ in book.spine[:1]:
+        item = book.get_item_with_id(item_id)
+        if item is not None:
+            match = _GENERATOR_PATTERN.search(item.get_content()[:HEAD_BYTES])
+            if match:
+                generators.append(match.group(1).decode('utf-8', 'ignore'))
+
+    return {
+        'epub_version': str(getattr(book, 'version', '') or ''),
+        'generators': generators,
+        'publishers': publishers,
+        'isbns': isbns,
+        'has_ncx': has_ncx,
+        'has_nav': has_nav,
+        'file_names': [name.rsplit('/', 1)[-1] for name in documents],
+        'css_classes': sorted(classes),
+    }
+
+
+def _search_any(patterns: Iterable[str], values: Iterable[str], full: bool = False) -> Optional[str]:
+    """第一个命中的 值 ~ 模式（忽略大小写），未命中返回None"""
+    values = list(values)
+    for pattern in patterns:
+        compiled = re.compile(pattern, re.IGNORECASE)
+        for value in values:
+            if (compiled.fullmatch if full else compiled.search)(value):
+                return f"{value} ~ {pattern}"
+    return None
+
+
+def match_profile(profile: Dict[str, Any], fingerprint: Dict[str, Any]) -> List[str]:
+    """配置档的 match 中命中的信号（每类最多一条）"""
+    match = profile.get('match', {})
+    signals = []
+    checks = (
+        ('generator', lambda patterns: _search_any(patterns, fingerprint['generators'])),
+        ('publisher', lambda patterns: _search_any(patterns, fingerprint['publishers'])),
+        ('isbn_prefixes', lambda prefixes: next((isbn for isbn in fingerprint['isbns']
+                                                 if any(isbn.startswith(p) for p in prefixes)), None)),
+        ('file_names', lambda patterns: _search_any(patterns, fingerprint['file_names'])),
+        ('css_classes', lambda patterns: _search_any(patterns, fingerprint['css_classes'], full=True)),
+        ('epub_version', lambda versions: fingerprint['epub_version'] if fingerprint['epub_version'] in versions else None),
+    )
+    for key, check in checks:
+        if match.get(key):
+            hit = check(match[key])
+            if hit:
+                signals.append(f"{key}: {hit}")
+    return signals
+
+
+def select_profiles(fingerprint: Dict[str, Any],
+                    profiles: Optional[Dict[str, Dict[str, Any]]] = None) -> Tuple[Tuple[str, ...], Dict[str, List[str]]]:
+    """按指纹选择配置档，返回 (命中的配置档名（按定义顺序）, 各配置档命中的信号)"""
+    profiles = RULE_PROFILES if profiles is None else profiles
+    selected, signals = [], {}
+    for name, profile in profiles.items():
+        hits = match_profile(profile, fingerprint)
+        if hits and len(hits) >= profile.get('min_score', 1):
+            selected.append(name)
+            signals[name] = hits
+    return tuple(selected), signals
+
+
+def parse_profile_setting(setting: Optional[str],
+                          profiles: Optional[Dict[str, Dict[str, Any]]] = None) -> Optional[Tuple[str, ...]]:
+    """解析 rule_profile 配置：auto 返回None，default 或空返回 ()，否则为配置档名（未知名称抛出 ValueError）"""
+    profiles = RULE_PROFILES if profiles is None else profiles
+    setting = (setting or DEFAULT).strip()
+    if setting == AUTO:
+        return None
+    if setting == DEFAULT:
+        return ()
+    names = tuple(name.strip() for name in setting.split(',') if name.strip())
+    unknown = [name for name in names if name not in profiles]
+    if unknown:
+        raise ValueError(f"未知的规则配置档: {', '.join(unknown)}（可用: {', '.join(profiles) or '无'}）")
+    return tuple(name for name in profiles if name in names)
+
+
+def profile_key(names: Tuple[str, ...]) -> str:
+    """配置档组合的名称（用于缓存键和报告）"""
+    return "+".join(names) if names else DEFAULT
+
+
+def profile_rules(names: Tuple[str, ...],
+                  profiles: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """在全局规则上依次叠加配置档，返回 CompiledRules 的参数"""
+    profiles = RULE_PROFILES if profiles is None else profiles
+    rules = {key: list(values) for key, values in RULE_LISTS.items()}
+    rules['toc_link_threshold'] = TOC_LINK_THRESHOLD
+    for name in names:
+        profile = profiles[name]
+        for key, values in profile.get('remove', {}).items():
+            rules[key] = [value for value in rules[key] if value not in values]
+        for key, values in profile.get('add', {}).items():
+            rules[key] += [value for value in values if value not in rules[key]]
+        rules.update(profile.get('set', {}))
+    return rules
+
+
+def compiled_rules(names: Tuple[str, ...]) -> CompiledRules:
+    """配置档组合编译后的规则（进程内缓存，不叠加配置档时即默认规则）"""
+    if not names:
+        return get_default_rules()
+    rules = _compiled.get(names)
+    if rules is None:
+        rules = _compiled[names] = CompiledRules(**profile_rules(names))
+    return rules
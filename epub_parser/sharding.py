@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+确定性分片
+多台机器各自处理目录中的一部分EPUB，不需要协调服务：按文件名的哈希把每本书固定分配到一个分片，
+重跑时同一本书总是落在同一个分片上。每个分片运行结束后写出批次摘要，由 merge_shards.py 合并。
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+SUMMARY_PREFIX = "batch_summary"
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """解析 "i/N"（i 从0开始），返回 (i, N)"""
+    try:
+        index, total = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"分片格式应为 i/N，例如 0/4: {value}")
+    if total < 1 or not 0 <= index < total:
+        raise ValueError(f"分片编号超出范围（0 <= i < N）: {value}")
+    return index, total
+
+
+def shard_for(name: str, total: int) -> int:
+    """按文件名计算分片编号（与机器、目录和Python哈希随机化无关）"""
+    digest = hashlib.sha256(name.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % total
+
+
+def select_shard(paths: List[Path], index: int, total: int) -> List[Path]:
+    """选出属于第 index 个分片的文件（按文件名分配，保持原顺序）"""
+    return [path for path in paths if shard_for(path.name, total) == index]
+
+
+def summary_name(shard: Optional[Tuple[int, int]] = None) -> str:
+    """批次摘要文件名：未分片时为 batch_summary.json，分片时带上分片编号"""
+    if shard is None:
+        return f"{SUMMARY_PREFIX}.json"
+    index, total = shard
+    return f"{SUMMARY_PREFIX}_shard-{index}-of-{total}.json"
+
+
+def summary_report_path(report_path: Union[str, Path], summary_dir: Union[str, Path]) -> str:
+    """批次摘要中记录的报告路径：相对摘要所在的目录，分片的输出目录复制到别的机器后仍能找到
+
+    无法表示为相对路径时（例如Windows上不在同一个盘符）记录绝对路径
+    """
+    try:
+        return Path(os.path.relpath(Path(report_path).resolve(), Path(summary_dir).resolve())).as_posix()
+    except ValueError:
+        return str(Path(report_path).resolve())
+
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+html_extractor 单元测试
+用 ebooklib 在临时目录中生成小型EPUB，端到端运行提取并检查报告：
+
+    python test_html_extractor.py
+    python test_html_extractor.py -v
+"""
+
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from typing import Dict
+
+from ebooklib import epub
+
+import chapter_stats
+import rule_profiles
+from content_store import SharedContentStore
+from html_extractor import EPUBHTMLExtractor, compute_rules_fingerprint
+from noise_index import MinHashNoiseIndex, page_text
+from paragraphs import find_paragraph_spans
+
+CHAPTER_TEXT = ("The Count walked the length of the hotel lobby, greeting the doorman and the concierge "
+                "as he had every morning for thirty years, and paused by the window to watch the snow.")
+
+
+def chapter_html(title: str, text: str = CHAPTER_TEXT) -> str:
+    return f"<html><head><title>{title}</title></head><body><h2>{title}</h2><p>{text}</p><p>{text}</p></body></html>"
+
+
+def make_epub(path: Path, chapters: Dict[str, str]) -> Path:
+    """按 {文件名: 内容} 生成EPUB，spine 顺序与字典顺序一致"""
+    book = epub.EpubBook()
+    book.set_identifier(path.stem)
+    book.set_title(path.stem)
+    book.set_language('en')
+    items = []
+    for file_name, content in chapters.items():
+        item = epub.EpubHtml(title=file_name, file_name=file_name, content=content)
+        book.add_item(item)
+        items.append(item)
+    book.spine = items
+    book.toc = items
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    epub.write_epub(str(path), book)
+    return path
+
+
+def run_extraction(epub_path: Path, output_dir: Path, config: Dict = None, **kwargs) -> EPUBHTMLExtractor:
+    """完整提取一本书（不输出进度信息）"""
+    extractor = EPUBHTMLExtractor(str(epub_path), str(output_dir), config, **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert extractor.load_epub()
+        extractor.extract_metadata()
+        extractor.extract_toc_info()
+        extractor.extract_spine_info()
+        assert extractor.extract_all_html_files()
+    return extractor
+
+
+class TestSharedStoreNoiseDecisions(unittest.TestCase):
+    """共享存储的文档缓存不能让同样字节的页面共用不同的噪声判定"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_noise_filename_not_shared_with_normal_name(self):
+        content = chapter_html("Chapter One")
+        epub_path = make_epub(self.tmp / 'book.epub', {'chap01.xhtml': content, 'about.xhtml': content})
+        store = SharedContentStore(self.tmp / 'store', compute_rules_fingerprint({}))
+        for run in ('out1', 'out2'):
+            extractor = run_extraction(epub_path, self.tmp / run, content_store=store)
+            self.assertEqual([record['original_name'] for record in extractor.extracted_files], ['chap01.xhtml'])
+            self.assertEqual([record['file_name'] for record in extractor.skipped_files], ['about.xhtml'])
+            self.assertIn('about', extractor.skipped_files[0]['skip_reason'])
+
+    def test_noise_index_in_cache_key(self):
+        advert = chapter_html("More from the Publisher",
+                              "Discover more great novels from our spring catalogue at your local bookshop today.")
+        epub_path = make_epub(self.tmp / 'book.epub', {'chap01.xhtml': chapter_html("Chapter One"),
+                                                       'chap02.xhtml': advert})
+        store = SharedContentStore(self.tmp / 'store', compute_rules_fingerprint({}))
+        extractor = run_extraction(epub_path, self.tmp / 'out1', content_store=store)
+        self.assertEqual(len(extractor.extracted_files), 2)
+
+        index = MinHashNoiseIndex()
+        self.assertTrue(index.add(page_text(advert), 'other.epub:ad.xhtml'))
+        extractor = run_extraction(epub_path, self.tmp / 'out2', content_store=store, noise_index=index)
+        self.assertEqual([record['original_name'] for record in extractor.extracted_files], ['chap01.xhtml'])
+        self.assertIn('other.epub:ad.xhtml', extractor.skipped_files[0]['skip_reason'])
+
+
+class TestRuleProfileNoisePages(unittest.TestCase):
+    """配置档增删的噪声文件名/标题关键字同样作用于整页跳过（字节预分拣和DOM判定）"""
+
+    PROFILES = {
+        "keep_about": {"remove": {"noise_filenames": ["about", "About", "ABOUT"]}},
+        "guides": {"add": {"noise_titles": ["Reading Group Guide"]}},
+    }
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        patcher = mock.patch.dict(rule_profiles.RULE_PROFILES, self.PROFILES)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.epub_path = make_epub(self.tmp / 'book.epub', {
+            'chap01.xhtml': chapter_html("Chapter One"),
+            'about.xhtml': chapter_html("The Author"),
+            'guide.xhtml': chapter_html("Reading Group Guide"),
+        })
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def extracted(self, profile: str):
+        extractor = run_extraction(self.epub_path, self.tmp / profile, {'rule_profile': profile})
+        return [record['original_name'] for record in extractor.extracted_files]
+
+    def test_default_rules(self):
+        self.assertEqual(self.extracted('default'), ['chap01.xhtml', 'guide.xhtml'])
+
+    def test_profile_removes_noise_filename(self):
+        self.assertEqual(self.extracted('keep_about'), ['chap01.xhtml', 'about.xhtml', 'guide.xhtml'])
+
+    def test_profile_adds_noise_title(self):
+        self.assertEqual(self.extracted('guides'), ['chap01.xhtml'])
+
+
+class TestChapterStats(unittest.TestCase):
+
+    def test_nested_paragraphs_counted_once(self):
+        html = ("<html><body><p>outer <p>inner</p> tail</p>"
+                "<ul><li><p>item one</p></li><li>item two</li></ul><h2>Heading</h2></body></html>")
+        counts = chapter_stats.count_chapter(html)
+        self.assertEqual(counts['paragraph_count'], 4)
+        self.assertEqual(counts['paragraph_count'], len(find_paragraph_spans(html.encode('utf-8'))))
+        self.assertEqual(counts['paragraph_text_chars'], [len("outerinnertail"), len("item one"),
+                                                          len("item two"), len("Heading")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+收件目录监视守护进程
+持续监视收件目录（默认 epub-files/），新上传或内容变化的EPUB自动提取，不需要手动运行或交互选择：
+
+- Linux 上通过 inotify（ctypes 调用 libc）接收文件事件，不可用时退化为定时扫描
+- 去抖：文件大小和修改时间在 --settle 秒内不再变化、且zip中央目录完整，才视为上传完成
+- 就绪的书进入队列，由常驻的工作进程池提取（工作进程启动时预先导入依赖并编译规则）
+- 按内容哈希和规则指纹记录到断点续跑日志，重启后已完成且未变化的书不会重复提取
+- 状态文件（默认 输出目录/daemon_status.json）和可选的HTTP端点给出队列深度、进行中的书和吞吐量
+"""
+
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import io
+import json
+import os
+import select
+import signal
+import struct
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from config import DEFAULT_CONFIG
+from content_store import hash_file
+from checkpoint_journal import CheckpointJournal, JOURNAL_NAME
+
+STATUS_NAME = "daemon_status.json"
+DEFAULT_SETTLE_SECONDS = 2.0
+DEFAULT_POLL_INTERVAL = 1.0
+THROUGHPUT_WINDOW = 300  # 吞吐量统计窗口（秒）
+RECENT_LIMIT = 20
+
+# inotify 事件（<sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_candidate(path: Path) -> bool:
+    """收件目录中需要处理的文件：.epub 后缀，忽略隐藏文件（上传工具常用的临时文件名）"""
+    return path.suffix.lower() == '.epub' and not path.name.startswith('.')
+
+
+class PollingWatcher:
+    """定时扫描收件目录，返回新增或大小/修改时间变化的文件"""
+
+    kind = 'polling'
+
+    def __init__(self, directory: Path, interval: float = DEFAULT_POLL_INTERVAL):
+        self.directory = Path(directory)
+        self.interval = interval
+        self._seen: Dict[Path, tuple] = {}
+
+    def poll(self, timeout: float) -> Set[Path]:
+        time.sleep(min(timeout, self.interval))
+        changed = set()
+        current = {}
+        for path in self.directory.iterdir():
+            if not is_candidate(path):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            current[path] = (stat.st_size, stat.st_mtime_ns)
+            if self._seen.get(path) != current[path]:
+                changed.add(path)
+        self._seen = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """通过 libc 的 inotify 接口接收收件目录的文件事件（仅Linux）"""
+
+    kind = 'inotify'
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 失败: {os.strerror(error)}")
+        if libc.inotify_add_watch(self._fd, os.fsencode(str(self.directory)), self.MASK) < 0:
+            error = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(error, f"inotify_add_watch 失败: {os.strerror(error)}")
+        self.overflowed = False
+
+    def poll(self, timeout: float) -> Set[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # 事件队列溢出：由调用方重新扫描整个目录
+                self.overflowed = True
+                continue
+            path = self.directory / os.fsdecode(name)
+            if name and is_candidate(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(directory: Path, mode: str = 'auto', interval: float = DEFAULT_POLL_INTERVAL):
+    """mode 为 auto 时优先使用 inotify，失败（非Linux、监视数量超限等）时退化为定时扫描"""
+    if mode in ('auto', 'inotify'):
+        try:
+            return InotifyWatcher(directory)
+        except (OSError, AttributeError) as e:
+            if mode == 'inotify':
+                raise
+            print(f"⚠️ inotify 不可用（{e}），改为每 {interval} 秒扫描一次")
+    return PollingWatcher(directory, interval)
+
+
+def upload_complete(path: Path) -> bool:
+    """zip中央目录位于文件末尾，能完整读出说明上传已写完"""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return bool(archive.namelist())
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+
+class SettleTracker:
+    """上传去抖：记录每个候选文件的大小和修改时间，连续 settle 秒不变时才交给处理"""
+
+    def __init__(self, settle_seconds: float = DEFAULT_SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self._pending: Dict[Path, List[Any]] = {}   # 路径 -> [大小, 修改时间, 稳定起始时间]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, path: Path):
+        self._pending.setdefault(path, [None, None, time.monotonic()])
+
+    def ready(self) -> List[Path]:
+        now = time.monotonic()
+        ready = []
+        for path, state in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                del self._pending[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if (state[0], state[1]) != signature:
+                state[0], state[1], state[2] = signature[0], signature[1], now
+                continue
+            if now - state[2] >= self.settle_seconds:
+                del self._pending[path]
+                if upload_complete(path):
+                    ready.append(path)
+                else:
+                    # 大小暂时不变但zip不完整（上传中断或卡住）：继续等待
+                    self._pending[path] = [signature[0], signature[1], now]
+        return ready
+
+
+# ---- 工作进程 ----
+
+def _worker_init():
+    """工作进程启动时预先导入依赖并编译清理规则，之后每本书不再付出这部分开销"""
+    import html_extractor
+    # 访问属性触发延迟导入
+    html_extractor.epub.read_epub, html_extractor.bs4.BeautifulSoup
+    html_extractor.rule_engine.get_default_rules()
+
+
+def _worker_extract(epub_path: str, output_dir: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """在工作进程中提取一本书；提取器的逐章输出收集起来，失败时返回最后几行"""
+    from html_extractor import EPUBHTMLExtractor
+
+    start = time.perf_counter()
+    log = io.StringIO()
+    result = {'status': 'failed', 'report': None, 'extracted': 0, 'skipped': 0}
+    try:
+        with contextlib.redirect_stdout(log):
+            extractor = EPUBHTMLExtractor(epub_path, output_dir, config)
+            success = False
+            if extractor.load_epub():
+                extractor.extract_metadata()
+                extractor.extract_toc_info()
+                extractor.extract_spine_info()
+                success = extractor.extract_all_html_files()
+        if success:
+            result.update(status='extracted',
+                          report=str((extractor.base_output_path / 'extraction_report.json').resolve()),
+                          extracted=len(extractor.extracted_files), skipped=len(extractor.skipped_files))
+        elif extractor.archive_limited:
+            result.update(status='skipped', reason=extractor.load_error)
+        else:
+            result['reason'] = extractor.load_error or "未找到spine信息"
+    except Exception as e:
+        result['reason'] = f"{type(e).__name__}: {e}"
+    if result['status'] == 'failed':
+        result['log_tail'] = log.getvalue().splitlines()[-5:]
+    result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+# ---- 守护进程 ----
+
+class WatchDaemon:
+    def __init__(self, inbox: Path, output_dir: Path, config: Dict[str, Any], workers: int = 1,
+                 settle_seconds: float = DEFAULT_SETTLE_SECONDS, watcher_mode: str = 'auto',
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, status_file: Optional[Path] = None):
+        from html_extractor import compute_rules_fingerprint
+
+        self.inbox = Path(inbox)
+        self.output_dir = Path(output_dir).resolve()
+        self.config = config
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.status_file = Path(status_file) if status_file else self.output_dir / STATUS_NAME
+        self.fingerprint = compute_rules_fingerprint(config)
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.journal = CheckpointJournal(self.output_dir / JOURNAL_NAME)
+        self.watcher = create_watcher(self.inbox, watcher_mode, poll_interval)
+        self.tracker = SettleTracker(settle_seconds)
+        self.queue: Deque[tuple] = deque()   # (路径, 内容哈希)
+        self.in_flight: Dict[Any, Dict[str, Any]] = {}   # future -> {'path', 'output', 'sha256', 'started'}
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_worker_init)
+
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._monotonic_start = time.monotonic()
+        self.counts = {'extracted': 0, 'failed': 0, 'skipped': 0, 'unchanged': 0}
+        self._completions: Deque[float] = deque()   # 最近完成时间（单调时钟），用于吞吐量
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_LIMIT)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._status_dirty = True
+
+    # 队列
+
+    def _scan_inbox(self):
+        for path in sorted(self.inbox.iterdir()):
+            if is_candidate(path):
+                self.tracker.touch(path)
+
+    def _output_name(self, path: Path) -> str:
+        from html_extractor import output_dir_name
+        return output_dir_name(path.stem)
+
+    def _unchanged(self, path: Path, digest: str) -> bool:
+        """这本书的输出目录里已是同一内容、同一规则的结果（按报告路径查日志：同一内容以另一个文件名上传时输出目录不同，仍需提取）"""
+        report_path = self.output_dir / self._output_name(path) / "extraction_report.json"
+        if self.journal.reusable(digest, self.fingerprint, report_path):
+            with self._lock:
+                self.counts['unchanged'] += 1
+            return True
+        return False
+
+    def _enqueue(self, path: Path):
+        """就绪的文件：这本书的输出目录里已是同一内容、同一规则的结果时跳过，否则排队"""
+        digest = hash_file(path)
+        if self._unchanged(path, digest):
+            return
+        # 排队中的旧版本被新内容替换；正在提取的旧版本完成后新版本再提取一次（见 _dispatch）
+        self.queue = deque(entry for entry in self.queue if entry[0] != path)
+        self.queue.append((path, digest))
+        self._status_dirty = True
+
+    def _dispatch(self):
+        # 只向进程池提交与工作进程数相同的任务，其余留在队列中（队列深度可观测，变更的文件可以被替换）
+        # 同一输出目录的书正在提取时留在队列中，_collect 收回后再提交：同一本书不会并发写同一个输出目录
+        busy = {job['output'] for job in self.in_flight.values()}
+        waiting = []
+        while self.queue and len(self.in_flight) < self.workers:
+            path, digest = self.queue.popleft()
+            if not path.exists():
+                continue
+            output = self._output_name(path)
+            if output in busy:
+                waiting.append((path, digest))
+                continue
+            if self._unchanged(path, digest):
+                # 排队期间正在提取的同一内容已经完成
+                continue
+            self.journal.book_started(digest, path)
+            future = self.pool.submit(_worker_extract, str(path), str(self.output_dir), self.config)
+            self.in_flight[future] = {'path': path, 'output': output, 'sha256': digest, 'started': time.monotonic()}
+            busy.add(output)
+            print(f"▶️ 开始提取: {path.name}")
+            self._status_dirty = True
+        self.queue.extendleft(reversed(waiting))
+
+    def _collect(self):
+        for future in [f for f in self.in_flight if f.done()]:
+            job = self.in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:  # 工作进程异常退出
+                result = {'status': 'failed', 'reason': f"{type(e).__name__}: {e}", 'extracted': 0, 'skipped': 0}
+            if result['status'] == 'extracted':
+                self.journal.book_done(job['sha256'], self.fingerprint, result['report'],
+                                       result['extracted'], result['skipped'])
+                print(f"✅ 完成: {job['path'].name} ({result['extracted']} 个章节, {result['elapsed_ms']} ms)")
+            else:
+                self.journal.book_failed(job['sha256'], result.get('reason', ''))
+                marker = "⛔ 跳过" if result['status'] == 'skipped' else "❌ 失败"
+                print(f"{marker}: {job['path'].name} ({result.get('reason')})")
+            with self._lock:
+                self.counts[result['status']] += 1
+                self._completions.append(time.monotonic())
+                self._recent.appendleft(dict(result, name=job['path'].name, sha256=job['sha256'],
+                                             finished_at=time.strftime('%Y-%m-%dT%H:%M:%S')))
+            self._status_dirty = True
+
+    # 状态
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            while self._completions and now - self._completions[0] > THROUGHPUT_WINDOW:
+                self._completions.popleft()
+            window = min(THROUGHPUT_WINDOW, max(now - self._monotonic_start, 1e-9))
+            return {
+                'pid': os.getpid(),
+                'inbox': str(self.inbox),
+                'output_dir': str(self.output_dir),
+                'watcher': self.watcher.kind,
+                'workers': self.workers,
+                'started_at': self.started_at,
+                'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'settling': len(self.tracker),
+                'queue_depth': len(self.queue),
+                'in_flight': [{'name': job['path'].name, 'running_s': round(now - job['started'], 1)}
+                              for job in self.in_flight.values()],
+                'counts': dict(self.counts),
+                'books_per_minute': round(len(self._completions) * 60 / window, 2),
+                'recent': list(self._recent),
+            }
+
+    def _write_status(self):
+        status = self.status()
+        temp_path = self.status_file.with_name(f".{self.status_file.name}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(status, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.status_file)
+        self._status_dirty = False
+
+    # 主循环
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def run(self, once: bool = False):
+        """once 为True时处理完收件目录中已有的书后退出"""
+        print(f"👀 监视 {self.inbox} ({self.watcher.kind}), 输出到 {self.output_dir}, {self.workers} 个工作进程")
+        self._scan_inbox()
+        last_status = 0.0
+        try:
+            while not self._stop.is_set():
+                # 有提取进行中时缩短等待，尽快收集结果
+                for path in self.watcher.poll(0.2 if self.in_flight else self.poll_interval):
+                    self.tracker.touch(path)
+                if getattr(self.watcher, 'overflowed', False):
+                    self.watcher.overflowed = False
+                    self._scan_inbox()
+                for path in self.tracker.ready():
+                    self._enqueue(path)
+                self._collect()
+                self._dispatch()
+                if self._status_dirty or time.monotonic() - last_status > 5:
+                    self._write_status()
+                    last_status = time.monotonic()
+                if once and not (self.tracker or self.queue or self.in_flight):
+                    break
+        finally:
+            print("⏹️ 停止监视，等待进行中的提取完成…")
+            self.pool.shutdown(wait=True)
+            self._collect()
+            self._write_status()
+            self.watcher.close()
+            self.journal.close()
+
+
+def serve_status(daemon: WatchDaemon, port: int) -> ThreadingHTTPServer:
+    """在后台线程中提供 GET /status（JSON）"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/status'):
+                self.send_error(404)
+                return
+            body = json.dumps(daemon.status(), ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    threading.Thread(target=server.serve_forever, name='status-http', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='监视收件目录，自动提取新上传或变化的EPUB')
+    parser.add_argument('inbox', nargs='?', default='epub-files', help='收件目录（默认: epub-files）')
+    parser.add_argument('--output-dir', '-o', default='extracted_html', help='输出目录（默认: extracted_html）')
+    parser.add_argument('--workers', type=int, default=1, help='常驻工作进程数（默认: 1）')
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help=f'文件多少秒内不再变化才视为上传完成（默认: {DEFAULT_SETTLE_SECONDS}）')
+    parser.add_argument('--watcher', choices=('auto', 'inotify', 'polling'), default='auto',
+                        help='文件事件来源（默认: auto，inotify不可用时定时扫描）')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help='扫描间隔（秒）')
+    parser.add_argument('--status-file', help=f'状态文件（默认: 输出目录/{STATUS_NAME}）')
+    parser.add_argument('--status-port', type=int, help='在 127.0.0.1 的该端口提供 GET /status')
+    parser.add_argument('--once', action='store_true', help='处理完收件目录中已有的书后退出')
+    parser.add_argument('--reader-bundle', action='store_true', help='同时生成阅读端章节包')
+    parser.add_argument('--export-images', action='store_true', help='同时导出并转码章节引用的图片')
+    args = parser.parse_args()
+
+    inbox = Path(args.inbox)
+    if not inbox.is_dir():
+        print(f"错误: 收件目录不存在: {inbox}")
+        return 1
+
+    config = dict(DEFAULT_CONFIG, reader_bundle=args.reader_bundle, export_images=args.export_images,
+                  image_workers=1)  # 每本书已在独立的工作进程中，图片在进程内转码
+    daemon = WatchDaemon(inbox, Path(args.output_dir), config, args.workers, args.settle,
+                         args.watcher, args.poll_interval, args.status_file)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    signal.signal(signal.SIGINT, daemon.stop)
+    server = serve_status(daemon, args.status_port) if args.status_port else None
+    try:
+        daemon.run(once=args.once)
+    finally:
+        if server:
+            server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+EPUB压缩包资源限制
+上传的EPUB可以是任意zip文件：ebooklib 会把声明为数GB的条目、上百万个条目的压缩包照单全收地解压到内存，
+一个恶意文件就能拖垮工作进程。打开前后分两步检查：
+
+- 中央目录：先读末尾的目录结束记录（EOCD），条目数超限时不再解析中央目录；
+  再逐条检查路径层级、声明的解压大小（单个条目和总和）以及压缩比
+- 解压时：ebooklib 的每次成员读取都改为分块解压并按实际输出的字节数计数（声明的大小可以伪造），
+  超过单条目或总量限制立即中止，不会先把整个条目解压到内存
+
+超出任何限制都抛出 ArchiveLimitError，调用方把这本书记为跳过，批量运行继续处理下一本。
+ebooklib 不会展开压缩包内嵌套的压缩包，嵌套的压缩包只作为普通条目受大小限制。
+"""
+
+import io
+import os
+import posixpath
+import struct
+import zipfile
+from typing import Any, BinaryIO, Dict, Optional, Union
+
+from ebooklib import epub
+
+# 默认限制（配置文件中对应 archive_ 前缀的键）
+DEFAULT_ARCHIVE_LIMITS = {
+    'max_total_bytes': 1024 * 1024 * 1024,   # 全部条目解压后的总大小
+    'max_member_bytes': 128 * 1024 * 1024,   # 单个条目解压后的大小
+    'max_ratio': 200,                        # 单个条目的压缩比（解压后 / 压缩后）
+    'max_entries': 10000,                    # 条目数
+    'max_depth': 32,                         # 条目路径的层级数
+}
+# 小于该大小的条目不检查压缩比（几KB的空白页压缩比很高但无害）
+RATIO_MIN_BYTES = 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+_EOCD_SIZE = 22
+_MAX_COMMENT_SIZE = 0xFFFF
+
+
+class ArchiveLimitError(Exception):
+    """压缩包超出资源限制；limit 为触发的限制名（DEFAULT_ARCHIVE_LIMITS 的键）"""
+
+    def __init__(self, limit: str, message: str):
+        super().__init__(message)
+        self.limit = limit
+
+
+def limits_from_config(config: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """从提取配置中取出 archive_max_* 限制，未配置的使用默认值"""
+    limits = dict(DEFAULT_ARCHIVE_LIMITS)
+    for key in limits:
+        value = (config or {}).get(f"archive_{key}")
+        if value is not None:
+            limits[key] = value
+    return limits
+
+
+def _format_bytes(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} MB" if size >= 1024 * 1024 else f"{size} 字节"
+
+
+def read_entry_count(fp: BinaryIO) -> int:
+    """从目录结束记录读出条目总数（不解析中央目录）；找不到记录时抛出 zipfile.BadZipFile"""
+    fp.seek(0, io.SEEK_END)
+    size = fp.tell()
+    tail_size = min(size, _EOCD_SIZE + _MAX_COMMENT_SIZE)
+    fp.seek(size - tail_size)
+    tail = fp.read(tail_size)
+    position = tail.rfind(_EOCD_SIGNATURE)
+    if position < 0 or len(tail) - position < _EOCD_SIZE:
+        raise zipfile.BadZipFile("找不到zip目录结束记录")
+    entries = struct.unpack('<H', tail[position + 10:position + 12])[0]
+    if entries != 0xFFFF:
+        return entries
+    # ZIP64：目录结束记录之前的定位记录给出 ZIP64 目录结束记录的偏移
+    locator_offset = size - tail_size + position - 20
+    if locator_offset < 0:
+        raise zipfile.BadZipFile("ZIP64定位记录缺失")
+    fp.seek(locator_offset)
+    locator = fp.read(20)
+    if locator[:4] != _ZIP64_LOCATOR_SIGNATURE:
+        raise zipfile.BadZipFile("ZIP64定位记录缺失")
+    fp.seek(struct.unpack('<Q', locator[8:16])[0])
+    record = fp.read(56)
+    if record[:4] != _ZIP64_EOCD_SIGNATURE:
+        raise zipfile.BadZipFile("ZIP64目录结束记录损坏")
+    return struct.unpack('<Q', record[32:40])[0]
+
+
+class ArchiveGuard:
+    """一本书的压缩包检查：inspect 检查中央目录，read_member 分块解压并计数"""
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        self.limits = dict(DEFAULT_ARCHIVE_LIMITS)
+        self.limits.update(limits or {})
+        self.entries = 0
+        self.declared_bytes = 0
+        self.inflated_bytes = 0
+        self.max_ratio = 0.0
+
+    def inspect(self, source: Union[str, BinaryIO]):
+        """检查中央目录；source 为路径或可定位的二进制文件对象（检查后回到开头）"""
+        if isinstance(source, str):
+            if os.path.isdir(source):
+                return  # ebooklib 也接受解压后的目录，文件已在磁盘上，不需要检查
+            with open(source, 'rb') as fp:
+                self._inspect(fp)
+        else:
+            try:
+                self._inspect(source)
+            finally:
+                source.seek(0)
+
+    def _inspect(self, fp: BinaryIO):
+        entries = read_entry_count(fp)
+        if entries > self.limits['max_entries']:
+            raise ArchiveLimitError('max_entries', f"条目数 {entries} 超过限制 {self.limits['max_entries']}")
+        fp.seek(0)
+        with zipfile.ZipFile(fp) as archive:
+            infos = archive.infolist()
+        if len(infos) > self.limits['max_entries']:
+            raise ArchiveLimitError('max_entries', f"条目数 {len(infos)} 超过限制 {self.limits['max_entries']}")
+        self.entries = len(infos)
+        for info in infos:
+            depth = len([part for part in info.filename.split('/') if part])
+            if depth > self.limits['max_depth']:
+                raise ArchiveLimitError('max_depth', f"{info.filename}: 路径层级 {depth} 超过限制 {self.limits['max_depth']}")
+            self._check_member(info.filename, info.file_size, info.compress_size)
+            self.declared_bytes += info.file_size
+            if self.declared_bytes > self.limits['max_total_bytes']:
+                raise ArchiveLimitError('max_total_bytes', f"声明的解压总大小超过限制 "
+                                        f"{_format_bytes(self.limits['max_total_bytes'])}")
+
+    def _check_member(self, name: str, size: int, compressed_size: int):
+        if size > self.limits['max_member_bytes']:
+            raise ArchiveLimitError('max_member_bytes', f"{name}: 解压后 {_format_bytes(size)}，"
+                                    f"超过单个条目限制 {_format_bytes(self.limits['max_member_bytes'])}")
+        if size >= RATIO_MIN_BYTES:
+            ratio = size / max(compressed_size, 1)
+            self.max_ratio = max(self.max_ratio, ratio)
+            if ratio > self.limits['max_ratio']:
+                raise ArchiveLimitError('max_ratio', f"{name}: 压缩比 {ratio:.0f} 超过限制 {self.limits['max_ratio']}")
+
+    def read_member(self, archive: zipfile.ZipFile, name: str) -> bytes:
+        """分块解压一个条目，按实际输出的字节数检查限制（条目不存在时抛出 KeyError）"""
+        info = archive.getinfo(name)
+        chunks = []
+        size = 0
+        with archive.open(info) as stream:
+            while True:
+                chunk = stream.read(READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                self.inflated_bytes += len(chunk)
+                self._check_member(name, size, info.compress_size)
+                if self.inflated_bytes > self.limits['max_total_bytes']:
+                    raise ArchiveLimitError('max_total_bytes', f"解压总量超过限制 "
+                                            f"{_format_bytes(self.limits['max_total_bytes'])}")
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'entries': self.entries,
+            'declared_bytes': self.declared_bytes,
+            'inflated_bytes': self.inflated_bytes,
+            'max_ratio': round(self.max_ratio, 1),
+            'limits': dict(self.limits),
+        }
+
+
+class GuardedEpubReader(epub.EpubReader):
+    """成员读取经过 ArchiveGuard 的 EpubReader（ebooklib 读取容器、OPF 和清单条目都经过 read_file）"""
+
+    def __init__(self, epub_file_name, guard: ArchiveGuard, options=None):
+        super().__init__(epub_file_name, options)
+        self.guard = guard
+
+    def read_file(self, name):
+        name = posixpath.normpath(name)
+        if isinstance(self.zf, zipfile.ZipFile):
+            return self.guard.read_member(self.zf, name)
+        return super().read_file(name)
+
+
+def read_epub_guarded(source: Union[str, BinaryIO], limits: Optional[Dict[str, int]] = None):
+    """检查压缩包后读取EPUB，返回 (书籍对象, ArchiveGuard)
+
+    source 为 epub_source.open_epub_source 的返回值；超出限制时抛出 ArchiveLimitError
+    """
+    guard = ArchiveGuard(limits)
+    guard.inspect(source)
+    reader = GuardedEpubReader(source, guard)
+    book = reader.load()
+    reader.process()
+    return book, guard